@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# bench_array.py - serialization of numeric arrays, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Speed of repeated double and integer children given as lists, as
+    array.array and as NumPy arrays (if installed), written by the direct
+    serializer of osa.serializer. The element tree of to_xml is given as
+    the reference. The text of the values alone (repr and str) is timed
+    too: it is the lower limit for every way of writing.
+
+    Run from the top directory: python bench/bench_array.py [size]
+"""
+import array
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from osa import serializer
+from osa.message import Message
+from osa.xmlnamespace import NS_SOAP_ENV
+from osa.xmltypes import ComplexTypeMeta, XMLInteger, XMLDouble
+import xml.etree.cElementTree as etree
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ns = 'urn:bench'
+
+
+def child(name, type):
+    return {'name': name, 'type': type, 'min': 0, 'max': 'unbounded',
+            'fullname': name, 'nillable': False}
+
+
+Signal = ComplexTypeMeta('Signal', (), {
+    '_children': [child('time', XMLInteger), child('value', XMLDouble)],
+    '_namespace': ns})
+message = Message('{%s}Signal' % ns, [], [('parameters', Signal)])
+
+
+def make(kind, size):
+    time = [i * 1000 for i in range(size)]
+    value = [i / 7. for i in range(size)]
+    obj = Signal()
+    if kind == 'list':
+        obj.time, obj.value = time, value
+    elif kind == 'array':
+        obj.time, obj.value = array.array('l', time), array.array('d', value)
+    else:
+        obj.time, obj.value = numpy.array(time), numpy.array(value)
+    return obj
+
+
+def tree(obj):
+    env = etree.Element('{%s}Envelope' % NS_SOAP_ENV)
+    body = etree.SubElement(env, '{%s}Body' % NS_SOAP_ENV)
+    message.to_xml(obj, _body=body)
+    return etree.tostring(env)
+
+
+def direct(obj):
+    return serializer.write_envelope(message.wrap(obj))
+
+
+def text(obj):
+    return (','.join(map(str, obj.time)), ','.join(map(repr, obj.value)))
+
+
+def best(func, obj):
+    return min(timeit.repeat(lambda: func(obj), number=1, repeat=3))
+
+
+if __name__ == '__main__':
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    kinds = ['list', 'array'] + (['numpy'] if numpy is not None else [])
+    reference = make('list', size)
+    data = direct(reference)
+    print('%d doubles and %d integers, %d bytes' % (size, size, len(data)))
+    print('%-8s %8.3f s' % ('text', best(text, reference)))
+    print('%-8s %8.3f s' % ('tree', best(tree, reference)))
+    for kind in kinds:
+        obj = make(kind, size)
+        assert direct(obj) == data
+        print('%-8s %8.3f s' % (kind, best(direct, obj)))
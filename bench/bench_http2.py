@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# bench_http2.py - HTTP/2 against HTTP/1.1 pooling, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Throughput of concurrent calls over a local server:
+    pooled HTTP/1.1 transport against multiplexed HTTP/2 transport.
+
+    Run from the top directory: python bench/bench_http2.py
+"""
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from osa.client import Client
+from osa.transport import HTTPTransport
+from osa import http2
+from tests.base import BaseTest, LocalServer, H2Server
+
+calls = 2000
+wsdl = BaseTest.test_files['test.wsdl']
+
+
+def run(name, server, transport, concurrency):
+    client = Client(wsdl, transport=transport)
+    method = client.service.echoString
+    method.location = server.url
+    items = ['message %d' % i for i in range(calls)]
+    res = method.map(items, concurrency=concurrency)
+    for r in res:
+        if isinstance(r, Exception):
+            raise r
+    print('%-10s concurrency %3d: %8.0f calls/s, %3d connections' %
+          (name, concurrency, res.throughput, server.connections))
+    transport.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    if http2.h2 is None:
+        sys.exit("The h2 package is needed for this benchmark.")
+    for concurrency in (1, 8, 32):
+        run('HTTP/1.1', LocalServer(),
+            HTTPTransport(), concurrency)
+        run('HTTP/2', H2Server(),
+            http2.HTTP2Transport(), concurrency)
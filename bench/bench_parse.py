@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# bench_parse.py - response parsing speed, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Speed of parsing large array responses: osa.xmlparser.parse_qualified,
+    used for responses before, against osa.xmlparser.parse_response.
+    Responses with xsi:type on every item show the slow path of
+    parse_response, decode gives the time of parsing and decoding by
+    the output message together.
+
+    Run from the top directory: python bench/bench_parse.py
+"""
+import os
+import sys
+import timeit
+from io import BytesIO
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from osa import xmlparser
+from osa.message import Message
+from osa.xmltypes import ComplexTypeMeta, XMLDouble
+
+ns = 'http://example.com/services/measurements/types'
+envelope = ('<soap:Envelope xmlns:soap='
+            '"http://schemas.xmlsoap.org/soap/envelope/" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xmlns:xsd="http://www.w3.org/2001/XMLSchema"><soap:Body>'
+            '<m:Values xmlns:m="%s">%%s</m:Values></soap:Body>'
+            '</soap:Envelope>' % ns)
+
+
+def make(samples, typed):
+    """
+        Response with samples doubles, xsi:type given on every one or not.
+    """
+    item = '<value>%r</value>'
+    if typed:
+        item = '<value xsi:type="xsd:double">%r</value>'
+    return (envelope % ''.join(item % (0.5 * i) for i in range(samples))) \
+        .encode('utf-8')
+
+
+def decode(parse, message, data):
+    root = parse(BytesIO(data))
+    body = root.find('{http://schemas.xmlsoap.org/soap/envelope/}Body')
+    return message.from_xml(body[0])
+
+
+def best(func, number=3):
+    return min(timeit.repeat(func, number=1, repeat=number))
+
+
+if __name__ == '__main__':
+    Values = ComplexTypeMeta('Values', (), {
+        '_children': [{'name': 'value', 'type': XMLDouble, 'min': 0,
+                       'max': 'unbounded', 'fullname': 'value',
+                       'nillable': False}],
+        '_namespace': ns})
+    message = Message('{%s}Values' % ns, [], [('parameters', Values)])
+    for samples in (10000, 100000, 1000000):
+        for typed in (False, True):
+            data = make(samples, typed)
+            times = []
+            for parse in (xmlparser.parse_qualified,
+                          xmlparser.parse_response):
+                times.append(best(lambda: parse(BytesIO(data))))
+                times.append(best(lambda: decode(parse, message, data)))
+            print('%8d %-7s parse_qualified %7.3f s (decode %7.3f s), '
+                  'parse_response %7.3f s (decode %7.3f s), speedup %.1f' % (
+                      samples, 'typed' if typed else 'plain', times[0],
+                      times[1], times[2], times[3], times[0] / times[2]))
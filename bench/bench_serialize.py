@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# bench_serialize.py - request serialization speed, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Speed of envelope serialization: element tree built by to_xml and
+    etree.tostring against the direct serializer of osa.serializer, with
+    and without the constant envelope parts computed in advance, and
+    with all children but the first one serialized in advance by a
+    template.
+
+    Messages are deep (nested complex types) and wide (many repeated
+    values in one element).
+
+    Run from the top directory: python bench/bench_serialize.py
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from osa import serializer
+from osa.message import Message
+from osa.xmlnamespace import NS_SOAP_ENV
+from osa.xmltypes import ComplexTypeMeta, XMLInteger, XMLString, XMLDouble
+import xml.etree.cElementTree as etree
+
+ns = 'urn:bench'
+
+
+def child(name, type, max=1):
+    return {'name': name, 'type': type, 'min': 0, 'max': max,
+            'fullname': name, 'nillable': False}
+
+
+def make_deep(depth):
+    """
+        Message with depth nested levels, each with a few fields.
+    """
+    cls = None
+    for level in range(depth):
+        children = [child('id', XMLInteger), child('label', XMLString),
+                    child('value', XMLDouble)]
+        if cls is not None:
+            children.append(child('inner', cls, 'unbounded'))
+        cls = ComplexTypeMeta('Level%d' % level, (),
+                              {'_children': children, '_namespace': ns})
+
+    def instance(level, cls):
+        obj = cls()
+        obj.id, obj.label, obj.value = level, 'level <%d>' % level, level / 3.
+        if level > 0:
+            inner = cls._children[-1]['type']
+            obj.inner = [instance(level - 1, inner) for i in range(2)]
+        return obj
+    return cls, instance(depth - 1, cls)
+
+
+def make_wide(width):
+    """
+        Message with width repeated integers and strings.
+    """
+    cls = ComplexTypeMeta('Wide', (), {
+        '_children': [child('number', XMLInteger, 'unbounded'),
+                      child('text', XMLString, 'unbounded')],
+        '_namespace': ns})
+    obj = cls()
+    obj.number = list(range(width))
+    obj.text = ['item %d' % i for i in range(width)]
+    return cls, obj
+
+
+def tree(message, obj):
+    env = etree.Element('{%s}Envelope' % NS_SOAP_ENV)
+    body = etree.SubElement(env, '{%s}Body' % NS_SOAP_ENV)
+    message.to_xml(obj, _body=body)
+    return etree.tostring(env)
+
+
+def direct(message, obj):
+    return serializer.write_envelope(message.wrap(obj))
+
+
+def run(name, cls, obj, number):
+    message = Message('{%s}%s' % (ns, cls.__name__), [],
+                      [('parameters', cls)])
+    envelope = serializer.Envelope(message)
+
+    def framed(message, obj):
+        return envelope.serialize(message.wrap(obj))
+
+    first = cls._children[0]['name']
+    template = envelope.template(dict(
+        (child['name'], getattr(obj, child['name']))
+        for child in cls._children[1:]))
+
+    def templated(message, obj):
+        return template.serialize(getattr(obj, first))
+
+    data = tree(message, obj)
+    assert data == direct(message, obj)
+    assert framed(message, obj) == templated(message, obj)
+    times = []
+    for func in (tree, direct, framed, templated):
+        times.append(min(timeit.repeat(lambda: func(message, obj),
+                                       number=number, repeat=3)) / number)
+    print('%-6s %8d bytes: tree %8.3f ms, direct %8.3f ms, '
+          'framed %8.3f ms, template %8.3f ms, speedup %.1f/%.1f/%.1f' %
+          (name, len(data), times[0] * 1e3, times[1] * 1e3, times[2] * 1e3,
+           times[3] * 1e3, times[0] / times[1], times[0] / times[2],
+           times[0] / times[3]))
+
+
+if __name__ == '__main__':
+    run('deep', number=20, *make_deep(10))
+    run('wide', number=20, *make_wide(10000))
+    run('small', number=2000, *make_wide(3))
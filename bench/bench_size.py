@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# bench_size.py - request size, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Size of array-heavy requests: element tree serialization with
+    ElementTree prefixes against the compact namespace declarations of
+    osa.serializer.Envelope. Gzipped sizes are given as well.
+
+    Run from the top directory: python bench/bench_size.py
+"""
+import os
+import sys
+import zlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from osa import serializer
+from osa.message import Message
+from osa.xmltypes import ComplexTypeMeta, XMLInteger, XMLDouble, XMLString
+
+ns = 'http://example.com/services/measurements/types'
+
+
+def child(name, type, qualified, max=1):
+    fullname = name
+    if qualified:
+        fullname = '{%s}%s' % (ns, name)
+    return {'name': name, 'type': type, 'min': 0, 'max': max,
+            'fullname': fullname, 'nillable': False}
+
+
+def make(qualified, channels, samples):
+    """
+        Upload of channels with samples each, elements qualified or not
+        (elementFormDefault).
+    """
+    Channel = ComplexTypeMeta('Channel', (), {
+        '_children': [child('name', XMLString, qualified),
+                      child('time', XMLInteger, qualified, 'unbounded'),
+                      child('value', XMLDouble, qualified, 'unbounded')],
+        '_namespace': ns})
+    Upload = ComplexTypeMeta('Upload', (), {
+        '_children': [child('channel', Channel, qualified, 'unbounded')],
+        '_namespace': ns})
+    upload = Upload()
+    upload.channel = []
+    for i in range(channels):
+        channel = Channel()
+        channel.name = 'channel %d' % i
+        channel.time = list(range(samples))
+        channel.value = [0.5 * t for t in range(samples)]
+        upload.channel.append(channel)
+    message = Message('{%s}Upload' % ns, [], [('parameters', Upload)])
+    return message, upload
+
+
+def gzipped(data):
+    return len(zlib.compress(data, 6))
+
+
+if __name__ == '__main__':
+    for qualified in (True, False):
+        message, upload = make(qualified, 10, 1000)
+        tree = serializer.write_envelope(upload)
+        compact = serializer.Envelope(message).serialize(upload)
+        print('%-11s tree %8d bytes (gzip %6d), compact %8d bytes '
+              '(gzip %6d), %.0f%% smaller' % (
+                  'qualified' if qualified else 'unqualified',
+                  len(tree), gzipped(tree), len(compact), gzipped(compact),
+                  100.0 * (len(tree) - len(compact)) / len(tree)))
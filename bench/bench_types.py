@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# bench_types.py - complex type serialization speed, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Speed of writing single instances of the complex types of the test
+    WSDL: to_xml into an element tree, the plan of the type interpreted
+    by osa.serializer.interpret_children and the function generated for
+    the type by osa.serializer.write_children.
+
+    Run from the top directory: python bench/bench_types.py
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from osa import serializer
+from osa.client import Client
+from osa.transport import MemoryTransport
+import xml.etree.cElementTree as etree
+
+
+def tree(obj, tag):
+    root = etree.Element('root')
+    obj.to_xml(root, tag)
+    return etree.tostring(root[0])
+
+
+def writer_of(children):
+    names = {}  # name cache shared by calls as for envelopes
+
+    def write(obj, tag):
+        writer = serializer.XMLWriter(prefixes={}, names=names)
+        writer.start(tag)
+        children(writer, obj, tag)
+        writer.end()
+        return writer.getvalue()
+    return write
+
+
+def run(name, obj, number=20000):
+    tag = '{%s}%s' % (obj._namespace, obj.__class__.__name__)
+    interpreted = writer_of(serializer.interpret_children)
+    generated = writer_of(serializer.write_children)
+    assert interpreted(obj, tag) == generated(obj, tag)
+    times = []
+    for func in (tree, interpreted, generated):
+        times.append(min(timeit.repeat(lambda: func(obj, tag),
+                                       number=number, repeat=3)) / number)
+    print('%-9s tree %7.2f us, interpreted %7.2f us, generated %7.2f us, '
+          'speedup %.1f' % (name, times[0] * 1e6, times[1] * 1e6,
+                            times[2] * 1e6, times[1] / times[2]))
+
+
+if __name__ == '__main__':
+    wsdl = os.path.join(os.path.dirname(__file__), '..', 'tests', 'test.wsdl')
+    client = Client(wsdl, transport=MemoryTransport(None))
+    name = client.types.Name()
+    name.firstName, name.lastName = 'Sergey', 'Bozhenkov <boz>'
+    person = client.types.Person()
+    person.age, person.height, person.weight = 30, 180, 80
+    person.name = name
+    hello = client.service.sayHello.input.wrap(person, 3)
+    run('Name', name)
+    run('Person', person)
+    run('sayHello', hello)
@@ -0,0 +1,292 @@
+# aio.py - asyncio support, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Awaitable service calls for asyncio, Python 3.5 or newer.
+
+    Calls are available as::
+
+        >>> result = await client.service.MyOperationName.acall(arg1, ...)
+
+    The message is converted by the same `osa.message.Message` routines
+    as a normal call, only the network exchange is done by non-blocking
+    sockets of `AsyncHTTPTransport`. Operations with several addresses
+    are routed by their `osa.routing.Router` as normal calls are.
+"""
+from . import transport
+from .method import SOAPFault
+import asyncio
+import ssl
+import time
+from urllib.parse import urlsplit
+
+
+def _close(writer):
+    """
+        Close a connection, also one of a closed event loop.
+    """
+    try:
+        writer.close()
+    except RuntimeError:
+        # the loop is closed, the socket is closed when the transport
+        # is freed
+        pass
+
+
+class _Closed(ConnectionResetError):
+    """
+        Connection closed by the server before any byte of the response.
+    """
+
+
+class AsyncHTTPTransport(transport.Transport):
+    """
+        Non-blocking HTTP/1.1 transport with persistent connections.
+
+        Connections are kept per (scheme, host, port) and belong to the
+        event loop they were opened in. Connections of event loops that
+        were closed, e.g. by asyncio.run, are dropped on the next
+        request. The send method is a coroutine.
+
+        Parameters
+        ----------
+        size : int, optional - default 10
+            Maximal number of idle connections kept per host.
+        idle_timeout : float, optional - default 60
+            Idle connections older than this (in seconds) are closed
+            instead of being reused.
+        timeout : float, optional - default None
+            Timeout of a single request exchange, no timeout if None.
+        limit : int, optional - default 100
+            Maximal number of simultaneous requests per host, further
+            requests wait for a free connection.
+        ssl_context : ssl.SSLContext, optional
+            Context for https connections, ssl.create_default_context()
+            if None.
+    """
+    def __init__(self, size=10, idle_timeout=60.0, timeout=None, limit=100,
+                 ssl_context=None):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.limit = limit
+        if ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        self.ssl_context = ssl_context
+        self._idle = {}  # (loop, key) -> list of (last use, reader, writer)
+        self._slots = {}  # (loop, key) -> semaphore
+
+    async def _acquire(self, key):
+        """
+            Get an idle connection for the key or open a new one.
+
+            Returns
+            -------
+            out : (reader, writer, reused)
+        """
+        self._sweep()
+        idle = self._idle.get((asyncio.get_event_loop(), key), [])
+        now = time.time()
+        while idle:
+            used, reader, writer = idle.pop()
+            if now - used > self.idle_timeout or reader.at_eof():
+                writer.close()
+            else:
+                return reader, writer, True
+        scheme, host, port = key
+        context = None
+        if scheme == 'https':
+            context = self.ssl_context
+        reader, writer = await asyncio.open_connection(host, port,
+                                                       ssl=context)
+        return reader, writer, False
+
+    def _sweep(self):
+        """
+            Drop idle connections and request limits of closed event
+            loops.
+        """
+        for loop, key in list(self._slots):
+            if loop.is_closed():
+                del self._slots[(loop, key)]
+        for loop, key in list(self._idle):
+            if loop.is_closed():
+                for used, reader, writer in self._idle.pop((loop, key)):
+                    _close(writer)
+
+    def _release(self, key, reader, writer):
+        """
+            Put a connection back to the pool.
+        """
+        idle = self._idle.setdefault((asyncio.get_event_loop(), key), [])
+        if len(idle) < self.size:
+            idle.append((time.time(), reader, writer))
+        else:
+            writer.close()
+
+    @staticmethod
+    async def _read_response(reader):
+        """
+            Read one HTTP response.
+
+            Returns
+            -------
+            out : (code, body, keep_alive)
+        """
+        line = await reader.readline()
+        if not line:
+            raise _Closed("Connection closed by server")
+        version, code = line.split(None, 2)[:2]
+        code = int(code)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, value = line.decode('latin-1').split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == b'HTTP/1.1' and \
+            headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = await reader.readline()
+                size = int(size.split(b';', 1)[0], 16)
+                if size == 0:
+                    # skip trailers
+                    while (await reader.readline()) not in (b'\r\n', b'\n',
+                                                            b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        elif code in (204, 304) or 100 <= code < 200:
+            body = b''
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return code, body, keep_alive
+
+    async def send(self, location, data, action, headers=None):
+        """
+            Coroutine to post data to location.
+
+            Returns
+            -------
+            out : `osa.transport.BufferedResponse`
+        """
+        parts = urlsplit(location)
+        scheme = parts.scheme or 'http'
+        port = parts.port
+        if port is None:
+            port = 443 if scheme == 'https' else 80
+        key = (scheme, parts.hostname, port)
+        selector = parts.path or '/'
+        if parts.query:
+            selector = '%s?%s' % (selector, parts.query)
+        data = transport.body_bytes(data)
+        if headers is None:
+            headers = self.headers(action)
+        else:
+            headers = dict(headers)
+        headers['Host'] = parts.netloc
+        headers['Content-Length'] = str(len(data))
+        head = 'POST %s HTTP/1.1\r\n%s\r\n' % (
+            selector, ''.join('%s: %s\r\n' % (k, v)
+                              for k, v in headers.items()))
+        request = head.encode('latin-1') + data
+
+        slots = self._slots.get((asyncio.get_event_loop(), key))
+        if slots is None:
+            slots = asyncio.Semaphore(self.limit)
+            self._slots[(asyncio.get_event_loop(), key)] = slots
+        async with slots:
+            return await self._exchange(key, request)
+
+    async def _exchange(self, key, request):
+        """
+            Send the raw request over a pooled connection.
+
+            The request is repeated once if a reused connection is closed
+            before any byte of the response arrives, i.e. the server
+            dropped it while idle. Timeouts and other errors are never
+            retried, the request may have been processed already.
+        """
+        retried = False
+        while True:
+            reader, writer, reused = await self._acquire(key)
+            try:
+                writer.write(request)
+                exchange = self._read_response(reader)
+                if self.timeout is not None:
+                    exchange = asyncio.wait_for(exchange, self.timeout)
+                code, body, keep_alive = await exchange
+            except _Closed:
+                writer.close()
+                if reused and not retried:
+                    # idle connection closed by the server before it read
+                    # the request, try once more on a new one
+                    retried = True
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._release(key, reader, writer)
+            else:
+                writer.close()
+            return transport.BufferedResponse(code, body)
+
+    def close(self):
+        """
+            Close all idle connections.
+        """
+        idle = self._idle
+        self._idle = {}
+        self._slots = {}
+        for conns in idle.values():
+            for used, reader, writer in conns:
+                _close(writer)
+
+
+async def call(method, *arg, **kw):
+    """
+        Coroutine doing the rpc-call of a `osa.method.Method`.
+
+        The method's async_transport is used, it is created on first use
+        if not set.
+    """
+    if method.async_transport is None:
+        method.async_transport = AsyncHTTPTransport()
+    if method.mtom:
+        text_msg, headers = method._encode_mtom(*arg, **kw)
+    else:
+        text_msg, headers = method._encode(*arg, **kw), None
+    endpoint = None
+    location = method.location
+    if method.router is not None:
+        endpoint = method.router.acquire()
+        location = endpoint.location
+    start = time.time()
+    ok = False
+    try:
+        response = await method.async_transport.send(location, text_msg,
+                                                     method.action, headers)
+        try:
+            res = method._process(response, location)
+        finally:
+            response.close()
+        ok = True
+        return res
+    except SOAPFault:
+        ok = True  # the address works, the call does not
+        raise
+    finally:
+        if endpoint is not None:
+            method.router.release(endpoint, time.time() - start, ok)
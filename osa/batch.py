@@ -0,0 +1,139 @@
+# batch.py - concurrent calls, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Running many calls concurrently on a pool of threads.
+"""
+import threading
+import time
+
+
+class BatchResult(object):
+    """
+        Iterator over results of concurrent calls in input order.
+
+        Calls are made by a pool of threads, at most concurrency calls
+        are in flight at the same time. A failed call does not stop the
+        batch, its exception instance is yielded instead of the result.
+
+        The achieved throughput is available during and after the
+        iteration in the following attributes:
+            - count - number of finished calls
+            - failures - number of failed calls
+            - elapsed - seconds since the start of the batch
+            - throughput - finished calls per second.
+
+        Parameters
+        ----------
+        func : callable
+            Called with every item of items.
+        items : iterable
+            Arguments for func.
+        concurrency : int
+            Number of worker threads.
+    """
+    def __init__(self, func, items, concurrency):
+        if concurrency < 1:
+            raise ValueError("Concurrency must be positive: %s" %
+                             concurrency)
+        self.count = 0
+        self.failures = 0
+        self._func = func
+        self._items = enumerate(iter(items))
+        self._results = {}
+        self._next = 0  # index of the next result to yield
+        self._issued = 0  # number of items taken from the input
+        self._total = None  # number of items, known when exhausted
+        self._window = 4 * concurrency  # limit of buffered results
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._start = time.time()
+        self._stop = None
+        self._workers = []
+        for i in range(concurrency):
+            worker = threading.Thread(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    @property
+    def elapsed(self):
+        stop = self._stop
+        if stop is None:
+            stop = time.time()
+        return stop - self._start
+
+    @property
+    def throughput(self):
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return self.count / elapsed
+
+    def _work(self):
+        """
+            Worker thread loop.
+        """
+        while True:
+            with self._cond:
+                while not self._stopped and \
+                        len(self._results) >= self._window:
+                    self._cond.wait()
+                if self._stopped or self._total is not None:
+                    return
+                try:
+                    index, item = next(self._items)
+                except StopIteration:
+                    self._total = self._issued
+                    self._cond.notify_all()
+                    return
+                except Exception as e:
+                    # broken input iterator, finish the batch with its error
+                    self._results[self._issued] = e
+                    self.failures += 1
+                    self._total = self._issued + 1
+                    self._cond.notify_all()
+                    return
+                self._issued = index + 1
+            failed = False
+            try:
+                res = self._func(item)
+            except Exception as e:
+                res = e
+                failed = True
+            with self._cond:
+                self._results[index] = res
+                self.count += 1
+                if failed:
+                    self.failures += 1
+                self._cond.notify_all()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._cond:
+            while True:
+                if self._next in self._results:
+                    res = self._results.pop(self._next)
+                    self._next += 1
+                    self._cond.notify_all()
+                    return res
+                if self._total is not None and self._next >= self._total:
+                    if self._stop is None:
+                        self._stop = time.time()
+                    raise StopIteration
+                self._cond.wait()
+
+    next = __next__  # python 2
+
+    def close(self):
+        """
+            Stop issuing new calls. Calls in flight are finished.
+        """
+        with self._cond:
+            self._stopped = True
+            if self._total is None:
+                self._total = self._issued
+            self._cond.notify_all()
@@ -8,6 +8,14 @@
 
 from . import xmlnamespace
 from . import wsdl
+from . import pool
+from . import transport as transports
+from . import routing
+import sys
+if sys.version_info >= (3, 5):
+    from . import aio
+else:
+    aio = None
 
 
 def str_for_containers(self):
@@ -96,16 +104,70 @@ class Client(object):
         service and finally decodes the response from XML by
         Method.output.
 
+        All operations send their messages through one transport,
+        available as client.transport. By default this is
+        `osa.transport.HTTPTransport` with a pool of persistent HTTP/1.1
+        connections `osa.pool.ConnectionPool`. If a proxy is configured
+        (http_proxy, https_proxy environment variables) or an opener was
+        installed by install_opener, the default is
+        `osa.transport.UrllibTransport` instead, which uses them but
+        opens a new connection for every call. Awaitable calls
+        Method.acall share one `osa.aio.AsyncHTTPTransport`, available as
+        client.async_transport, with the same pool settings and
+        ssl_context.
+
         Parameters
         ----------
         wsdl_url : str
             Address of wsdl document to consume.
+        transport : `osa.transport.Transport`, optional
+            Transport to be used by all operations.
+        pool_size : int, optional - default 10
+            Maximal number of idle connections kept per host. Used only
+            if transport is not given.
+        idle_timeout : float, optional - default 60
+            Idle connections older than this (in seconds) are not reused.
+            Used only if transport is not given.
+        ssl_context : ssl.SSLContext, optional
+            Context for https connections of the pool, TLS sessions made
+            with it are resumed. Used by the default transport and by
+            client.async_transport.
+        routing_policy : str, optional - default 'ewma'
+            Policy of `osa.routing.Router` used for operations available
+            at several ports of the WSDL. Operations with the same set of
+            addresses share one router.
     """
-    def __init__(self, wsdl_url):
+    def __init__(self, wsdl_url, transport=None, pool_size=10,
+                 idle_timeout=60.0, ssl_context=None,
+                 routing_policy='ewma'):
         #create parser and download the WSDL document
         self.wsdl_url = wsdl_url
         parser = wsdl.WSDLParser(wsdl_url)
         self._types, self._services = parser.parse()
+        if transport is None and transports.uses_urlopen_setup():
+            transport = transports.UrllibTransport()
+        elif transport is None:
+            transport = transports.HTTPTransport(
+                pool.ConnectionPool(size=pool_size,
+                                    idle_timeout=idle_timeout,
+                                    ssl_context=ssl_context))
+        self.transport = transport
+        self.async_transport = None
+        if aio is not None:
+            self.async_transport = aio.AsyncHTTPTransport(
+                size=pool_size, idle_timeout=idle_timeout,
+                ssl_context=ssl_context)
+        routers = {}
+        for methods in self._services.values():
+            for method in methods.values():
+                method.transport = transport
+                method.async_transport = self.async_transport
+                if len(method.locations) > 1:
+                    key = tuple(method.locations)
+                    if key not in routers:
+                        routers[key] = routing.Router(
+                            method.locations, policy=routing_policy)
+                    method.router = routers[key]
         self.names = []
         self.create_types_container()
         self.create_services_containers()
@@ -176,6 +238,18 @@ class Client(object):
                 counter += 1
                 create(k, attr_name, v)
 
+    def set_header(self, *blocks):
+        """
+            Set SOAP header blocks sent with calls of all operations,
+            e.g. session or security tokens.
+
+            See `osa.method.Method.set_header`, the header is serialized
+            once per operation and again after blocks changed in place.
+        """
+        for methods in self._services.values():
+            for name in methods['_container']:
+                methods[name].set_header(*blocks)
+
     def __str__(self):
         res = ''
         for name in self.names:
@@ -0,0 +1,212 @@
+# download.py - streamed decoding of binary responses, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Decoding of base64Binary values while the response is parsed.
+
+    A normal response is parsed into a tree first, so that the base64
+    text of a large value, its decoded bytes and the tree are all held
+    in memory at the same time. `parse` instead feeds the text of every
+    base64Binary element through `Base64Decoder` as it arrives from the
+    network and passes the bytes to a sink, e.g. a file. Such elements
+    get the number of bytes written as their text, which is what
+    `osa.xmltypes.decode_base64` returns for them then.
+
+    The elements to decode are found by the output message type: the
+    children of complex types are followed from the message element
+    down, only base64Binary children are streamed.
+"""
+from . import xmlnamespace
+from . import xmlparser
+from . import xmltypes
+import xml.etree.cElementTree as etree
+from xml.parsers import expat
+import base64
+
+BODY = '{%s}Body' % xmlnamespace.NS_SOAP_ENV
+# bytes read from the response at once and maximal size of text pieces
+CHUNK_SIZE = 65536
+
+# attribute of a complex type holding {local name: (type, streamed)} of
+# its children, kept on the class itself as it refers to the type of
+# recursive types
+_CHILDREN = '_osa_download_children'
+
+
+class Base64Decoder(object):
+    """
+        Incremental base64 decoder.
+
+        Text is accepted in pieces of any length, white space is
+        ignored. Every complete group of characters is decoded at once
+        and passed on.
+
+        Parameters
+        ----------
+        write : callable
+            Receives the decoded bytes.
+    """
+    def __init__(self, write):
+        self.write = write
+        self.size = 0  # bytes written
+        self._rest = ''
+
+    def feed(self, text):
+        """
+            Decode a piece of base64 text.
+        """
+        text = self._rest + ''.join(text.split())
+        cut = len(text) - len(text) % 4
+        self._rest = text[cut:]
+        if cut:
+            data = base64.b64decode(text[:cut])
+            self.size += len(data)
+            self.write(data)
+
+    def close(self):
+        """
+            Check that the text is complete.
+
+            Returns
+            -------
+            out : int
+                Number of bytes written.
+        """
+        if self._rest:
+            raise ValueError("Incomplete base64 data")
+        return self.size
+
+
+def _qualified(name):
+    """
+        Name reported by expat as namespace}local in ElementTree form.
+    """
+    if '}' in name:
+        return '{' + name
+    return name
+
+
+def children(cls):
+    """
+        Children of a complex type by local name: (type, streamed), where
+        streamed is True for base64Binary children.
+    """
+    res = cls.__dict__.get(_CHILDREN)
+    if res is None:
+        res = {}
+        for child in cls._children:
+            codec = xmltypes.get_codec(child['type'])
+            streamed = codec is not None and \
+                codec[1] is xmltypes.decode_base64
+            res[child['name']] = (child['type'], streamed)
+        setattr(cls, _CHILDREN, res)
+    return res
+
+
+class _Builder(object):
+    """
+        Expat handlers building the tree with streamed base64Binary
+        values.
+    """
+    def __init__(self, cls, write):
+        self.builder = etree.TreeBuilder()
+        self.cls = cls
+        self.write = write
+        self.bindings = {}  # prefix -> namespace in scope
+        self.saved = []  # stack of (prefix, previous namespace)
+        # types of open elements: complex type, BODY or None
+        self.types = []
+        self.decoder = None
+        self.depth = 0  # of the streamed element
+
+    def start_ns(self, prefix, uri):
+        prefix = prefix or ''
+        self.saved.append((prefix, self.bindings.get(prefix)))
+        self.bindings[prefix] = uri
+
+    def end_ns(self, prefix):
+        prefix, ns = self.saved.pop()
+        if ns is None:
+            del self.bindings[prefix]
+        else:
+            self.bindings[prefix] = ns
+
+    def start(self, name, attrs):
+        tag = _qualified(name)
+        attrib = {}
+        for key, value in attrs.items():
+            key = _qualified(key)
+            if key == xmlparser.XSI_TYPE:
+                # as by parse_response
+                value = xmlparser.qualify(value, self.bindings)
+            attrib[key] = value
+        self.builder.start(tag, attrib)
+        types = self.types
+        parent = types[-1] if types else None
+        ctype = None
+        if parent is BODY:
+            ctype = self.cls
+        elif parent is not None:
+            child = children(parent).get(tag[tag.find('}') + 1:])
+            if child is not None:
+                if child[1]:
+                    self.decoder = Base64Decoder(self.write)
+                    self.depth = len(types)
+                elif hasattr(child[0], '_children'):
+                    ctype = child[0]
+        elif tag == BODY and len(types) == 1 and self.cls is not None:
+            ctype = BODY
+        types.append(ctype)
+
+    def data(self, text):
+        if self.decoder is not None:
+            self.decoder.feed(text)
+        else:
+            self.builder.data(text)
+
+    def end(self, name):
+        self.types.pop()
+        element = self.builder.end(_qualified(name))
+        if self.decoder is not None and len(self.types) == self.depth:
+            element.text = self.decoder.close()
+            self.decoder = None
+
+
+def parse(f, cls, sink):
+    """
+        Parse a response, writing base64Binary values to a sink.
+
+        Parameters
+        ----------
+        f : file-like object
+            Response envelope, read in chunks.
+        cls : class
+            Type of the message element in the body, None to stream
+            nothing.
+        sink : file-like object or callable
+            Receives the decoded bytes of all base64Binary values in
+            document order, by its write method if it has one.
+
+        Returns
+        -------
+        root : xml node
+            Root of the envelope as by `osa.xmlparser.parse_response`.
+            Streamed elements have the number of bytes written as text.
+    """
+    handler = _Builder(cls, getattr(sink, 'write', sink))
+    parser = expat.ParserCreate(None, '}')
+    parser.buffer_text = True
+    parser.buffer_size = CHUNK_SIZE
+    parser.StartNamespaceDeclHandler = handler.start_ns
+    parser.EndNamespaceDeclHandler = handler.end_ns
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.data
+    while True:
+        data = f.read(CHUNK_SIZE)
+        if not data:
+            break
+        parser.Parse(data, False)
+    parser.Parse(b'', True)
+    return handler.builder.close()
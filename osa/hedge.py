@@ -0,0 +1,153 @@
+# hedge.py - hedged requests, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Hedged requests to cut the tail latency of idempotent operations.
+"""
+from collections import deque
+import threading
+import time
+import sys
+if sys.version_info[0] < 3:
+    from Queue import Queue, Empty
+else:
+    from queue import Queue, Empty
+
+
+class Attempt(object):
+    """
+        Token of a single attempt. An attempt which lost the race is
+        cancelled and should drop its response as soon as it can.
+    """
+    def __init__(self):
+        self.cancelled = False
+
+
+class Hedger(object):
+    """
+        Sends a second copy of a slow request and takes the first answer.
+
+        If the first attempt did not finish after delay, a second attempt
+        is started, provided the budget allows it. The first successful
+        result is returned and the other attempt is cancelled. Only use
+        it for idempotent operations.
+
+        Counters are kept in self.counters:
+            - calls - number of calls
+            - hedged - number of calls with a second attempt
+            - hedge_wins - number of calls answered by the second attempt
+            - budget_denied - hedges not sent because of the budget.
+
+        Parameters
+        ----------
+        delay : float, optional - default None
+            Seconds to wait before hedging. If None, the given percentile
+            of the observed latencies is used, and nothing is hedged until
+            min_samples latencies are known.
+        percentile : float, optional - default 95
+            Percentile of latency used if delay is None.
+        budget : float, optional - default 0.05
+            Maximal fraction of calls which may be hedged.
+        min_samples : int, optional - default 20
+            Number of latencies needed to estimate the delay.
+        window : int, optional - default 1000
+            Number of most recent latencies kept.
+    """
+    def __init__(self, delay=None, percentile=95, budget=0.05,
+                 min_samples=20, window=1000):
+        self.delay = delay
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.counters = {'calls': 0, 'hedged': 0, 'hedge_wins': 0,
+                         'budget_denied': 0}
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def current_delay(self):
+        """
+            Delay before hedging, None if it is not known yet.
+        """
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            values = sorted(self._latencies)
+        index = int(len(values) * self.percentile / 100.0)
+        return values[min(index, len(values) - 1)]
+
+    def _allow(self):
+        """
+            Take a hedge from the budget if possible.
+        """
+        with self._lock:
+            if self.counters['hedged'] + 1 > \
+                    self.budget * self.counters['calls']:
+                self.counters['budget_denied'] += 1
+                return False
+            self.counters['hedged'] += 1
+            return True
+
+    def call(self, func):
+        """
+            Do the call with hedging.
+
+            Parameters
+            ----------
+            func : callable
+                Called as func(attempt) with an `Attempt` token, must
+                do one complete request and return its result.
+        """
+        with self._lock:
+            self.counters['calls'] += 1
+        delay = self.current_delay()
+        results = Queue()
+        attempts = []
+
+        def run(attempt, start):
+            try:
+                res = func(attempt)
+            except Exception as e:
+                results.put((attempt, False, e))
+            else:
+                with self._lock:
+                    self._latencies.append(time.time() - start)
+                results.put((attempt, True, res))
+
+        def launch():
+            attempt = Attempt()
+            attempts.append(attempt)
+            t = threading.Thread(target=run, args=(attempt, time.time()))
+            t.daemon = True
+            t.start()
+
+        launch()
+        error = None
+        finished = 0
+        while True:
+            wait = None
+            if len(attempts) == 1 and delay is not None:
+                wait = delay
+            try:
+                attempt, ok, res = results.get(timeout=wait)
+            except Empty:
+                # the first attempt is slow
+                delay = None
+                if self._allow():
+                    launch()
+                continue
+            finished += 1
+            if ok:
+                for other in attempts:
+                    if other is not attempt:
+                        other.cancelled = True
+                if attempt is not attempts[0]:
+                    with self._lock:
+                        self.counters['hedge_wins'] += 1
+                return res
+            if error is None:
+                error = res
+            if finished == len(attempts):
+                raise error
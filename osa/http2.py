@@ -0,0 +1,340 @@
+# http2.py - HTTP/2 transport, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    HTTP/2 transport multiplexing concurrent calls over one connection.
+
+    This transport needs the h2 package (https://python-hyper.org/h2).
+    Plain http locations are spoken as h2c with prior knowledge, https
+    locations negotiate h2 by TLS ALPN.
+"""
+from . import transport
+import socket
+import ssl
+import threading
+import time
+import sys
+if sys.version_info[0] < 3:
+    from urlparse import urlsplit
+else:
+    from urllib.parse import urlsplit
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+except ImportError:
+    h2 = None
+try:
+    ConnectionError
+except NameError:
+    ConnectionError = socket.error  # python 2
+
+
+class ConnectionClosed(ConnectionError):
+    """
+        Connection was closed before the request was sent.
+    """
+    pass
+
+
+def _h2_context(base=None):
+    """
+        Private TLS context offering only h2 by ALPN.
+
+        ALPN is a setting of the whole context, so the context of the
+        caller is copied rather than changed: it may be shared with
+        HTTP/1.1 connections. Protocol, options, verification settings
+        and CA certificates are copied, a client certificate is not.
+    """
+    if base is None:
+        context = ssl.create_default_context()
+    else:
+        context = ssl.SSLContext(base.protocol)
+        context.options = base.options
+        context.verify_flags = base.verify_flags
+        context.check_hostname = False
+        context.verify_mode = base.verify_mode
+        context.check_hostname = base.check_hostname
+        for cert in base.get_ca_certs(binary_form=True):
+            context.load_verify_locations(cadata=cert)
+    context.set_alpn_protocols(['h2'])
+    return context
+
+
+class _Stream(object):
+    """
+        State of a single request stream.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.status = None
+        self.data = []
+        self.error = None
+
+
+class HTTP2Connection(object):
+    """
+        A single HTTP/2 connection shared by many threads.
+
+        Every request is a separate stream. A background thread reads
+        the socket and dispatches the received frames to the streams.
+
+        Parameters
+        ----------
+        key : tuple
+            (scheme, host, port) of the endpoint.
+        ssl_context : ssl.SSLContext
+            Context for https endpoints, it must offer h2 by ALPN, see
+            `_h2_context`.
+        timeout : float
+            Socket timeout for connecting and waiting for responses.
+
+        New streams wait while the number of open streams is at the
+        limit set by the server.
+    """
+    def __init__(self, key, ssl_context=None, timeout=None):
+        scheme, host, port = key
+        self.key = key
+        self.timeout = timeout
+        sock = socket.create_connection((host, port), timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if scheme == 'https':
+            if ssl_context is None:
+                ssl_context = _h2_context()
+            sock = ssl_context.wrap_socket(sock, server_hostname=host)
+            if sock.selected_alpn_protocol() != 'h2':
+                sock.close()
+                raise RuntimeError("Server %s:%d does not speak HTTP/2" %
+                                   (host, port))
+        sock.settimeout(None)  # the reader thread blocks on it
+        self.sock = sock
+        config = h2.config.H2Configuration(client_side=True,
+                                           header_encoding='utf-8')
+        self.conn = h2.connection.H2Connection(config=config)
+        self.streams = {}  # stream id -> _Stream
+        self.closed = False
+        # protects h2 state machine and socket writes
+        self._cond = threading.Condition()
+        with self._cond:
+            self.conn.initiate_connection()
+            self._flush()
+        self._reader = threading.Thread(target=self._read_loop)
+        self._reader.daemon = True
+        self._reader.start()
+
+    def _flush(self):
+        """
+            Write pending frames, the lock must be held.
+        """
+        data = self.conn.data_to_send()
+        if data:
+            self.sock.sendall(data)
+
+    def _read_loop(self):
+        """
+            Background thread: receive frames and dispatch them.
+        """
+        error = None
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                with self._cond:
+                    for event in self.conn.receive_data(data):
+                        self._dispatch(event)
+                    self._flush()
+                    self._cond.notify_all()
+        except Exception as e:
+            error = e
+        with self._cond:
+            self.closed = True
+            for stream in self.streams.values():
+                if stream.error is None:
+                    stream.error = error or \
+                        ConnectionError("HTTP/2 connection closed")
+                stream.done.set()
+            self.streams = {}
+            self._cond.notify_all()
+
+    def _dispatch(self, event):
+        """
+            Handle single h2 event, the lock must be held.
+        """
+        stream = self.streams.get(getattr(event, 'stream_id', None))
+        if isinstance(event, h2.events.ResponseReceived):
+            if stream is not None:
+                for name, value in event.headers:
+                    if name == ':status':
+                        stream.status = int(value)
+        elif isinstance(event, h2.events.DataReceived):
+            # give the window back immediately, data is buffered anyway
+            self.conn.acknowledge_received_data(
+                event.flow_controlled_length, event.stream_id)
+            if stream is not None:
+                stream.data.append(event.data)
+        elif isinstance(event, h2.events.StreamEnded):
+            if stream is not None:
+                del self.streams[event.stream_id]
+                stream.done.set()
+        elif isinstance(event, h2.events.StreamReset):
+            if stream is not None:
+                del self.streams[event.stream_id]
+                stream.error = RuntimeError("HTTP/2 stream reset, code %s" %
+                                            event.error_code)
+                stream.done.set()
+        elif isinstance(event, h2.events.ConnectionTerminated):
+            self.closed = True
+
+    def request(self, selector, authority, headers, body):
+        """
+            Post body and wait for the response.
+
+            Returns
+            -------
+            out : (status, body)
+        """
+        stream = _Stream()
+        deadline = None
+        if self.timeout is not None:
+            deadline = time.time() + self.timeout
+        with self._cond:
+            # the server limits the number of concurrent streams
+            while not self.closed and self.conn.open_outbound_streams >= \
+                    self.conn.remote_settings.max_concurrent_streams:
+                wait = None
+                if deadline is not None:
+                    wait = deadline - time.time()
+                    if wait <= 0:
+                        raise socket.timeout("No free HTTP/2 stream")
+                self._cond.wait(wait)
+            if self.closed:
+                raise ConnectionClosed("HTTP/2 connection closed")
+            stream_id = self.conn.get_next_available_stream_id()
+            request_headers = [(':method', 'POST'),
+                               (':scheme', self.key[0]),
+                               (':authority', authority),
+                               (':path', selector),
+                               ('content-length', str(len(body)))]
+            request_headers.extend((k.lower(), v) for k, v in headers.items())
+            self.conn.send_headers(stream_id, request_headers)
+            # registered only now, so that a failed stream is not kept
+            self.streams[stream_id] = stream
+            try:
+                # send body respecting flow control windows
+                view = memoryview(body)
+                while len(view):
+                    window = min(
+                        self.conn.local_flow_control_window(stream_id),
+                        self.conn.max_outbound_frame_size)
+                    if window <= 0:
+                        self._flush()
+                        self._cond.wait(self.timeout)
+                        if self.closed:
+                            break
+                        continue
+                    self.conn.send_data(stream_id, view[:window].tobytes())
+                    view = view[window:]
+                if not self.closed:
+                    self.conn.end_stream(stream_id)
+                    self._flush()
+            except BaseException:
+                self.streams.pop(stream_id, None)
+                raise
+        if not stream.done.wait(self.timeout):
+            with self._cond:
+                self.streams.pop(stream_id, None)
+                self.conn.reset_stream(stream_id)
+                self._flush()
+            raise socket.timeout("HTTP/2 response timed out")
+        if stream.error is not None:
+            raise stream.error
+        return stream.status, b''.join(stream.data)
+
+    def close(self):
+        with self._cond:
+            if not self.closed:
+                self.conn.close_connection()
+                try:
+                    self._flush()
+                except socket.error:
+                    pass
+            self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.sock.close()
+
+
+class HTTP2Transport(transport.Transport):
+    """
+        Transport multiplexing all calls to an endpoint over one HTTP/2
+        connection.
+
+        Concurrent calls from many threads (e.g. `osa.method.Method.map`)
+        are sent as parallel streams, so there is no head-of-line blocking
+        between them and no per-call connection overhead.
+
+        Parameters
+        ----------
+        ssl_context : ssl.SSLContext, optional
+            Settings for https endpoints. The transport uses a private
+            copy offering h2 by ALPN, the given context is not changed.
+        timeout : float, optional - default None
+            Timeout for connecting and for every response.
+    """
+    def __init__(self, ssl_context=None, timeout=None):
+        if h2 is None:
+            raise ImportError("HTTP2Transport needs the h2 package")
+        self.ssl_context = ssl_context
+        self._h2_context = None  # private copy, made on first use
+        self.timeout = timeout
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def _connection(self, key):
+        """
+            Get open connection to the endpoint or make a new one.
+        """
+        with self._lock:
+            conn = self._connections.get(key)
+            if conn is None or conn.closed:
+                context = None
+                if key[0] == 'https':
+                    if self._h2_context is None:
+                        self._h2_context = _h2_context(self.ssl_context)
+                    context = self._h2_context
+                conn = HTTP2Connection(key, context, self.timeout)
+                self._connections[key] = conn
+            return conn
+
+    def send(self, location, data, action, headers=None):
+        parts = urlsplit(location)
+        scheme = parts.scheme or 'http'
+        port = parts.port
+        if port is None:
+            port = 443 if scheme == 'https' else 80
+        key = (scheme, parts.hostname, port)
+        selector = parts.path or '/'
+        if parts.query:
+            selector = '%s?%s' % (selector, parts.query)
+        data = transport.body_bytes(data)
+        if headers is None:
+            headers = self.headers(action)
+        try:
+            conn = self._connection(key)
+            status, body = conn.request(selector, parts.netloc, headers, data)
+        except ConnectionClosed:
+            # connection was closed by the server (e.g. GOAWAY), retry once
+            conn = self._connection(key)
+            status, body = conn.request(selector, parts.netloc, headers, data)
+        return transport.BufferedResponse(status, body)
+
+    def close(self):
+        with self._lock:
+            connections = self._connections
+            self._connections = {}
+        for conn in connections.values():
+            conn.close()
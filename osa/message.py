@@ -8,6 +8,133 @@
 # from . import xmlnamespace
 from . import xmltypes
 # import xml.etree.cElementTree as etree
+import keyword
+import re
+try:
+    from inspect import Signature, Parameter
+except ImportError:  # python 2
+    Signature = Parameter = None
+
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _assign(name, var):
+    """
+        Statement setting attribute name of p to var.
+    """
+    if _identifier.match(name) and not keyword.iskeyword(name):
+        return 'p.%s = %s' % (name, var)
+    return 'setattr(p, %r, %s)' % (name, var)
+
+
+def make_binder(cls, fallback):
+    """
+        Generate a function making an instance of cls from call arguments.
+
+        The function is specialized to the children of cls, its result
+        is the same as that of `Message.wrap`. Calls with positional
+        arguments only or with keyword arguments only run straight-line
+        code, mixed calls are passed to fallback.
+
+        Parameters
+        ----------
+        cls : class
+            Message type.
+        fallback : callable
+            Called with the arguments in the mixed case.
+
+        Returns
+        -------
+        out : function
+            The binder, with __signature__ if inspect.Signature is
+            available.
+    """
+    children = getattr(cls, '_children', [])
+    lines = ['def bind(*arg, **kw):',
+             '    n = len(arg)',
+             '    if kw:',
+             '        if n:',
+             '            return fallback(*arg, **kw)',
+             '        p = cls()']
+    checks = []
+    for child in children:
+        name = child['name']
+        if child.get('nillable', False):
+            checks.append([_assign(name, 'v')])
+        elif child['min'] == 0:
+            checks.append(['if v is not None:', '    ' + _assign(name, 'v')])
+        else:
+            checks.append(['if v is None:',
+                           '    raise ValueError(%r)' % (
+                               "Non-nillable parameter %s is not present" %
+                               name),
+                           _assign(name, 'v')])
+    for child, check in zip(children, checks):
+        lines.append('        v = kw.get(%r)' % child['name'])
+        lines.extend('        ' + line for line in check)
+    lines.append('        return p')
+    if children:
+        # a single argument of the message type is used as it is
+        lines.extend(['    if n == 1 and isinstance(arg[0], cls):',
+                      '        return arg[0]'])
+    lines.extend(['    if n < %d:' % len(children),
+                  '        arg = arg + (None, ) * (%d - n)' % len(children),
+                  '    p = cls()'])
+    for i, check in enumerate(checks):
+        lines.append('    v = arg[%d]' % i)
+        lines.extend('    ' + line for line in check)
+    lines.append('    return p')
+    namespace = {'cls': cls, 'fallback': fallback}
+    exec(compile('\n'.join(lines), '<binder %s>' % cls.__name__, 'exec'),
+         namespace)
+    bind = namespace['bind']
+    bind.__name__ = str(cls.__name__)
+    if Signature is not None:
+        bind.__signature__ = signature(cls)
+    return bind
+
+
+def signature(cls):
+    """
+        Call signature of a message type.
+
+        Children are positional or keyword parameters annotated with
+        their type, optional ones default to None. Such a signature can
+        not describe children whose names are not identifiers or
+        required children after optional ones, which are still given
+        by position. The signature is (*args, **kwargs) then, so that
+        it accepts all calls the binder accepts.
+
+        Parameters
+        ----------
+        cls : class
+            Message type.
+
+        Returns
+        -------
+        out : inspect.Signature
+    """
+    params = []
+    optional = False
+    for child in getattr(cls, '_children', []):
+        name = child['name']
+        if not _identifier.match(name) or keyword.iskeyword(name):
+            return _any_signature
+        default = Parameter.empty
+        if child['min'] == 0 or child.get('nillable', False):
+            default = None
+            optional = True
+        elif optional:
+            return _any_signature
+        params.append(Parameter(name, Parameter.POSITIONAL_OR_KEYWORD,
+                                default=default, annotation=child['type']))
+    return Signature(params)
+
+
+if Signature is not None:
+    _any_signature = Signature([
+        Parameter('args', Parameter.VAR_POSITIONAL),
+        Parameter('kwargs', Parameter.VAR_KEYWORD)])
 
 
 class Message(object):
@@ -42,6 +169,39 @@ class Message(object):
         if use_parts is None:
             use_parts = []
         self.use_parts = use_parts
+        self._binder = None  # (message type, its children, binder)
+
+    def compile(self):
+        """
+            Generate the argument binder of the message, see
+            `make_binder`.
+
+            This is done by the WSDL parser once the parts are known and
+            again on use if the message type has changed.
+
+            Returns
+            -------
+            out : function
+                Binder with the arguments of `wrap`, None if the message
+                has no parts.
+        """
+        if len(self.use_parts) < 1:
+            self._binder = None
+            return None
+        cls = self.use_parts[0][1]
+        bind = make_binder(cls, self._wrap)
+        self._binder = (cls, getattr(cls, '_children', None), bind)
+        return bind
+
+    @property
+    def signature(self):
+        """
+            Call signature of the message as inspect.Signature, None if
+            it has no parts or inspect.Signature is not available.
+        """
+        if Signature is None or len(self.use_parts) < 1:
+            return None
+        return signature(self.use_parts[0][1])
 
     def __str__(self, switch="wrap"):
         """
@@ -100,24 +260,42 @@ class Message(object):
 
         return res
 
-    def to_xml(self, *arg, **kw):
+    def wrap(self, *arg, **kw):
         """
-            Convert from Python into xml message.
+            Make the message instance from call arguments.
 
-            This function accepts parameters as they are supplied
-            to the method call and tries to convert it to a message.
             Arguments can be in one of  four forms:
                 - 1 argument of proper message type for this operation
                 - positional arguments - members of the proper message type
                 - keyword arguments - members of the message type.
                 - a mixture of positional and keyword arguments.
 
-            Keyword arguments must have at least one member: _body which
-            contains etree.Element to append the conversion result to.
+            The binding is done by a function generated for the message
+            type, see `compile`.
+
+            Returns
+            -------
+            out : object
+                Instance of the message type, None if the message has
+                no parts.
+        """
+        binder = self._binder
+        if binder is None or len(self.use_parts) < 1 or \
+                binder[0] is not self.use_parts[0][1] or \
+                binder[1] is not getattr(binder[0], '_children', None):
+            bind = self.compile()
+            if bind is None:
+                return None
+            return bind(*arg, **kw)
+        return binder[2](*arg, **kw)
+
+    def _wrap(self, *arg, **kw):
+        """
+            Make the message instance by interpreting the children of the
+            message type, see `wrap`.
         """
         if len(self.use_parts) < 1:
-            # etree.SubElement(kw["_body"], self.name)
-            return
+            return None
         # assumed wrapped convention
         cl = self.use_parts[0][1]  # class
         p = cl()  # encoding instance
@@ -146,13 +324,30 @@ class Message(object):
                             raise ValueError("Non-nillable parameter %s is "
                                              "not present" % name)
                 setattr(p, name, val)
+        return p
+
+    def to_xml(self, *arg, **kw):
+        """
+            Convert from Python into xml message.
+
+            This function accepts parameters as they are supplied
+            to the method call and tries to convert it to a message,
+            see `wrap` for the allowed forms.
+
+            Keyword arguments must have at least one member: _body which
+            contains etree.Element to append the conversion result to.
+        """
+        body = kw.pop("_body", None)
+        p = self.wrap(*arg, **kw)
+        if p is None:
+            # etree.SubElement(body, self.name)
+            return
 
-        # set default ns to save space
-        # this does not work with xml qualified/unqualified, need a hack
-        # etree.register_namespace("", xmlnamespace.get_ns(self.name))
+        # namespaces are not compacted here, calls are serialized by
+        # osa.serializer.Envelope which uses a default namespace
         # the real conversion is done by ComplexType
         # messages always refer to a top level element => qualified
-        p.to_xml(kw["_body"], "{%s}%s" % (p._namespace, p.__class__.__name__))
+        p.to_xml(body, "{%s}%s" % (p._namespace, p.__class__.__name__))
 
     def from_xml(self, body, header=None):
         """
@@ -7,12 +7,19 @@
 """
 from . import xmlnamespace
 from . import xmlparser
-import sys
-if sys.version_info[0] < 3:
-    from urllib2 import urlopen, Request, HTTPError
-else:
-    from urllib.request import urlopen, Request, HTTPError
+from . import transport as transports
+from . import batch
+from . import serializer
+from . import mtom
+from . import download
 import xml.etree.cElementTree as etree
+from io import BytesIO
+import threading
+import time
+try:
+    from urllib2 import HTTPError
+except ImportError:
+    from urllib.request import HTTPError
 
 # some standard stuff
 SOAP_BODY = '{%s}Body' % xmlnamespace.NS_SOAP_ENV
@@ -20,6 +27,201 @@ SOAP_FAULT = '{%s}Fault' % xmlnamespace.NS_SOAP_ENV
 SOAP_HEADER = '{%s}Header' % xmlnamespace.NS_SOAP_ENV
 
 
+class SOAPFault(RuntimeError):
+    """
+        Fault reported by the service.
+    """
+    pass
+
+
+def _snapshot(value):
+    """
+        Copy of the state of a header block to find changes made in
+        place, see `Method.set_header`.
+    """
+    if etree.iselement(value):
+        return (value.tag, sorted(value.attrib.items()), value.text,
+                value.tail, [_snapshot(child) for child in value])
+    if isinstance(value, (list, tuple)):
+        return [_snapshot(item) for item in value]
+    state = getattr(value, '__dict__', None)
+    if state is None:
+        return value
+    return (value.__class__,
+            sorted((k, _snapshot(v)) for k, v in state.items()))
+
+
+class _Signature(object):
+    """
+        Call signature of a method for inspect.signature and help, see
+        `osa.message.Message.signature`. None on the class, so that the
+        class itself is inspected as usual.
+    """
+    def __get__(self, method, cls=None):
+        if method is None:
+            return None
+        return method.input.signature
+
+
+class ResponseHeader(object):
+    """
+        SOAP header of a response, decoded on demand.
+
+        Nothing is looked up in the response before a header block is
+        asked for.
+
+        Parameters
+        ----------
+        envelope : etree.Element
+            Parsed response envelope.
+    """
+    def __init__(self, envelope):
+        self._envelope = envelope
+        self._element = False  # not looked up yet
+
+    @property
+    def element(self):
+        """
+            Header element of the response, None if there is none.
+        """
+        if self._element is False:
+            self._element = self._envelope.find(SOAP_HEADER)
+        return self._element
+
+    def __iter__(self):
+        element = self.element
+        if element is None:
+            return iter(())
+        return iter(element)
+
+    def __len__(self):
+        element = self.element
+        if element is None:
+            return 0
+        return len(element)
+
+    def get(self, cls):
+        """
+            Decode a header block.
+
+            Parameters
+            ----------
+            cls : class
+                Complex type of the block, the block element is named
+                after it.
+
+            Returns
+            -------
+            out : object
+                Instance of cls, None if there is no such block.
+        """
+        element = self.element
+        if element is None:
+            return None
+        block = element.find('{%s}%s' % (cls._namespace, cls.__name__))
+        if block is None:
+            return None
+        return cls().from_xml(block)
+
+
+class PreparedCall(object):
+    """
+        Call of a method with fixed arguments.
+
+        The request envelope and headers are made once, so that every
+        call costs only the network exchange and decoding of the
+        response. Routing, hedging and the transport of the method
+        apply as for normal calls. A prepared call can be used from
+        many threads at the same time.
+
+        Parameters
+        ----------
+        method : `Method`
+            Method to call.
+        arg, kw :
+            Call arguments as for a normal call.
+    """
+    def __init__(self, method, *arg, **kw):
+        self.method = method
+        self.refresh(*arg, **kw)
+
+    def refresh(self, *arg, **kw):
+        """
+            Prepare the request again, e.g. for new arguments.
+        """
+        method = self.method
+        if method.mtom:
+            data, headers = method._encode_mtom(*arg, **kw)
+            data = transports.body_bytes(data)
+        else:
+            data = method._encode(*arg, **kw)
+            headers = None
+            if hasattr(method.transport, 'headers'):
+                headers = method.transport.headers(method.action)
+        # replaced at once, concurrent calls see old or new request
+        self._request = (data, headers)
+
+    @property
+    def data(self):
+        """
+            Serialized request envelope.
+        """
+        return self._request[0]
+
+    @property
+    def headers(self):
+        """
+            Request headers, None if the transport does not tell them.
+        """
+        return self._request[1]
+
+    def __call__(self):
+        data, headers = self._request
+        return self.method._send(data, headers=headers)
+
+
+class TemplateCall(object):
+    """
+        Call of a method with some arguments fixed.
+
+        The fixed arguments are serialized once with the constant
+        envelope parts, see `osa.serializer.Template`, every call only
+        writes the remaining ones.
+
+        Parameters
+        ----------
+        method : `Method`
+            Method to call.
+        fixed : dict
+            Fixed arguments by name.
+    """
+    def __init__(self, method, **fixed):
+        self.method = method
+        self.template = method._envelope().template(fixed)
+
+    def __call__(self, *arg, **kw):
+        method = self.method
+        template = self.template
+        header = method._header_text()
+        if method.mtom:
+            chunk_size = method.chunk_size
+
+            def serialize(sink, attachments):
+                template.serialize(_sink=sink, _chunk_size=chunk_size,
+                                   _header=header, _attachments=attachments,
+                                   *arg, **kw)
+            data, headers = method._package(serialize)
+            return method._send(data, headers=headers)
+        if method.streaming:
+            chunk_size = method.chunk_size
+
+            def produce(write):
+                template.serialize(_sink=write, _chunk_size=chunk_size,
+                                   _header=header, *arg, **kw)
+            return method._send(produce)
+        return method._send(template.serialize(_header=header, *arg, **kw))
+
+
 class Method(object):
     """
         Definition of a single SOAP method, including location, action, name
@@ -39,17 +241,115 @@ class Method(object):
             Soap action string.
         location : str
             Location as found in service part of WSDL.
+        locations : list of str, optional
+            All addresses of the operation if it is available at several
+            ports.
+        transport : `osa.transport.Transport`, optional
+            Transport to deliver messages. If None, every call opens a new
+            connection by urlopen.
+
+        After a call, last_stats holds `osa.transport.CallStats` of the
+        exchange if the transport reports them and last_header holds
+        `ResponseHeader` of the response. Both are kept per thread, so
+        that concurrent calls from several threads do not mix them up;
+        calls made by `map` and `broadcast` run in worker threads and
+        leave them unchanged. After Method.acall last_header must be
+        read before the next await, coroutines of one thread share it.
+
+        SOAP header blocks to send with every call are set by
+        `set_header`.
+
+        Calls of operations marked idempotent can be hedged to cut tail
+        latency: set self.idempotent to True and self.hedger to an
+        `osa.hedge.Hedger` instance.
+
+        If self.router is set to an `osa.routing.Router`, every call goes
+        to the address chosen by it. Setting location switches routing off.
+
+        If self.streaming is True, the request is serialized while it is
+        being sent, in chunks of about self.chunk_size written parts.
+        Repeated arguments may then be generators and are consumed
+        lazily, so that large requests need no memory for the complete
+        envelope. Streamed requests are not hedged.
+
+        If self.mtom is True, requests are sent as MTOM messages: the
+        base64Binary values given as bytes, bytearray, memoryview or
+        file-like objects travel as raw MIME parts instead of base64
+        text, see `osa.mtom`. MTOM responses are accepted then, their
+        base64Binary values are decoded to memoryview slices of the
+        response without copying. The service must support MTOM.
+
+        If self.binary_sink is set, base64Binary values of responses
+        are decoded while the response is being parsed and passed on in
+        chunks, so that large downloads are never held in memory. The
+        sink is a file-like object, its write method is used, or a
+        callable receiving bytes. All values of a response go to it in
+        document order, the result has the number of bytes written in
+        their place. MTOM responses are not streamed. Responses of
+        concurrent calls are written to the sink one after another,
+        calls with a sink are not hedged.
     """
+    # call signature for inspect.signature and help
+    __signature__ = _Signature()
+
     def __init__(self, name, input, output, doc=None,
-                 action=None, location=None):
+                 action=None, location=None, transport=None,
+                 locations=None):
         self.name = name
         self.input = input
         self.output = output
+        self.router = None
         self.location = location
+        if locations is None:
+            locations = []
+        self.locations = locations
         self.action = action
+        if transport is None:
+            transport = transports.UrllibTransport()
+        self.transport = transport
+        self.async_transport = None
+        # response header and stats of the last call in every thread
+        self._last = threading.local()
+        self.idempotent = False
+        self.hedger = None
+        self.streaming = False
+        self.chunk_size = 4096
+        self.mtom = False
+        self.binary_sink = None
+        self._sink_lock = threading.Lock()
+        self._frame = None
+        # (header blocks, serialized header or None if not done yet,
+        #  snapshot of the blocks when serialized)
+        self._header = ((), '', None)
         self._doc = doc
         self._redoc()
 
+    @property
+    def last_header(self):
+        """
+            `ResponseHeader` of the last call in this thread, None if
+            there is none.
+        """
+        return getattr(self._last, 'header', None)
+
+    @property
+    def last_stats(self):
+        """
+            `osa.transport.CallStats` of the last call in this thread,
+            None if the transport does not report them.
+        """
+        return getattr(self._last, 'stats', None)
+
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        # explicit address pins the method
+        self._location = value
+        self.router = None
+
     def _redoc(self):
         """
             Add call signatures to doc.
@@ -83,77 +383,412 @@ class Method(object):
         """
             Process rpc-call.
         """
-        # create soap-wrap around our message
-        env = etree.Element('{%s}Envelope' % xmlnamespace.NS_SOAP_ENV)
-        # header = etree.SubElement(env, '{%s}Header' % xmlnamespace.NS_SOAP_ENV)
-        body = etree.SubElement(env, '{%s}Body' % xmlnamespace.NS_SOAP_ENV)
+        if self.mtom:
+            text_msg, headers = self._encode_mtom(*arg, **kw)
+            return self._send(text_msg, headers=headers)
+        if self.streaming:
+            text_msg = self._encode_stream(*arg, **kw)
+        else:
+            text_msg = self._encode(*arg, **kw)  # message to send
+
+        # real rpc
+        return self._send(text_msg)
+
+    def _send(self, text_msg, location=None, headers=None):
+        """
+            Send serialized envelope and decode the response.
 
-        # compose call message - convert all parameters and encode the call
-        kw["_body"] = body
-        self.input.to_xml(*arg, **kw)
+            Parameters
+            ----------
+            text_msg : bytes or callable
+                Serialized envelope or body producer.
+            location : str, optional
+                Service address, chosen by `_exchange` if None.
+            headers : dict, optional
+                Request headers prepared in advance.
+        """
+        if self.idempotent and self.hedger is not None and \
+                not callable(text_msg) and self.binary_sink is None:
+            def attempt_call(attempt):
+                res = self._exchange(text_msg, location, attempt, headers)
+                return res, self.last_header, self.last_stats
 
-        text_msg = etree.tostring(env)  # message to send
-        del env
+            # attempts run in their own threads, the response header and
+            # stats of the winner are passed on to this one
+            res, self._last.header, self._last.stats = \
+                self.hedger.call(attempt_call)
+            return res
+        return self._exchange(text_msg, location, headers=headers)
 
-        # http stuff
-        request = Request(self.location, text_msg,
-                          {'Content-Type': 'text/xml; charset=utf-8',
-                           'SOAPAction': self.action})
-        del text_msg
+    def _exchange(self, text_msg, location=None, attempt=None,
+                  headers=None):
+        """
+            Do a single request/response exchange.
 
-        # real rpc
+            Parameters
+            ----------
+            text_msg : bytes or callable
+                Serialized envelope or body producer.
+            location : str, optional
+                Service address. If None, the address chosen by the router
+                or self.location is used.
+            attempt : `osa.hedge.Attempt`, optional
+                If the attempt gets cancelled while waiting for the
+                response, the response is dropped without decoding.
+            headers : dict, optional
+                Request headers prepared in advance, the transport makes
+                them if None.
+        """
+        endpoint = None
+        if location is None:
+            if self.router is None:
+                location = self.location
+            else:
+                endpoint = self.router.acquire()
+                location = endpoint.location
+        start = time.time()
+        ok = False
         try:
-            response = urlopen(request)
-            del request
-            # check http code returned
-            if response.code == 200:
-                if self.output is None:
-                    return None
-                # string to xml
-                # use qualified parsing to get the anyType
-                # type properly, unless it hits the performance heavily
-                xml = xmlparser.parse_qualified(response)
-                # response = response.read()
-                # xml = etree.fromstring(response)
-                del response
-                # find soap body
-                body = xml.find(SOAP_BODY)
-                if body is None:
-                    raise RuntimeError("No SOAP body found in response")
-                body = body[0]
-                return self.output.from_xml(body)
-            elif response.code == 202 or response.code == 204 \
-                    and self.output is None:
+            if headers is None:
+                response = self.transport.send(location, text_msg,
+                                               self.action)
+            else:
+                response = self.transport.send(location, text_msg,
+                                               self.action, headers)
+            try:
+                if attempt is not None and attempt.cancelled:
+                    res = None
+                else:
+                    res = self._process(response, location)
+            finally:
+                response.close()
+                # sizes of the exchange, if supported by the transport
+                self._last.stats = getattr(response, 'stats', None)
+            ok = True
+            return res
+        except SOAPFault:
+            ok = True  # the address works, the call does not
+            raise
+        finally:
+            if endpoint is not None:
+                self.router.release(endpoint, time.time() - start, ok)
+
+    def set_header(self, *blocks):
+        """
+            Set SOAP header blocks sent with every call.
+
+            The blocks are serialized once on the next call and the
+            text is reused for later calls. Blocks changed in place are
+            found by comparing a copy of their state taken then, the
+            text is made again for them.
+
+            Parameters
+            ----------
+            blocks :
+                Complex type instances or etree elements, see
+                `osa.serializer.Envelope.header`. Nothing to send no
+                header.
+        """
+        self._header = (blocks, None, None)
+
+    def _header_text(self):
+        """
+            Serialized SOAP header, made again if the blocks changed.
+        """
+        header = self._header
+        blocks, text, state = header
+        if not blocks:
+            return ''
+        current = _snapshot(blocks)
+        try:
+            changed = text is None or current != state
+        except Exception:  # values without plain comparison, e.g. arrays
+            changed = True
+        if changed:
+            text = self._envelope().header(blocks)
+            if self._header is header:
+                self._header = (blocks, text, current)
+        return text
+
+    def prepare(self, *arg, **kw):
+        """
+            Serialize a call once to send it many times.
+
+            Arguments are the same as for a normal call.
+
+            Returns
+            -------
+            out : `PreparedCall`
+                Calling it does the call with the prepared request.
+        """
+        return PreparedCall(self, *arg, **kw)
+
+    def template(self, **fixed_args):
+        """
+            Serialize the fixed arguments once for many calls.
+
+            Parameters
+            ----------
+            fixed_args :
+                Message children that are the same for every call.
+
+            Returns
+            -------
+            out : `TemplateCall`
+                Called with the remaining arguments, positionally in
+                the order of the message children or by name.
+        """
+        return TemplateCall(self, **fixed_args)
+
+    def acall(self, *arg, **kw):
+        """
+            Awaitable rpc-call, Python 3.5 or newer.
+
+            Arguments are the same as for a normal call. The request goes
+            through self.async_transport, see `osa.aio`.
+        """
+        from . import aio
+        return aio.call(self, *arg, **kw)
+
+    def map(self, items, concurrency=4):
+        """
+            Call the method for many argument sets concurrently.
+
+            Parameters
+            ----------
+            items : iterable
+                Arguments of the calls. Every item is either a tuple of
+                positional arguments, a dict of keyword arguments or a
+                single argument.
+            concurrency : int, optional - default 4
+                Number of calls in flight at the same time.
+
+            Returns
+            -------
+            out : `osa.batch.BatchResult`
+                Iterator over results in input order. For failed calls the
+                exception instance is yielded. The achieved throughput is
+                available in its throughput attribute.
+        """
+        return batch.BatchResult(self._call_item, items, concurrency)
+
+    def broadcast(self, locations, *arg, **kw):
+        """
+            Make the same call to many service locations concurrently.
+
+            The request is serialized only once and the same envelope
+            is sent to every location. This is useful for many identical
+            services sharing one WSDL document.
+
+            Parameters
+            ----------
+            locations : iterable of str
+                Service addresses.
+            arg, kw :
+                Call arguments as for a normal call. The special keyword
+                _concurrency (default 8) sets the number of calls in
+                flight at the same time.
+
+            Returns
+            -------
+            out : dict
+                Map location -> result, or the exception instance if the
+                call to this location failed.
+        """
+        concurrency = kw.pop('_concurrency', 8)
+        locations = list(locations)
+        headers = None
+        if self.mtom:
+            text_msg, headers = self._encode_mtom(*arg, **kw)
+            text_msg = transports.body_bytes(text_msg)
+        else:
+            text_msg = self._encode(*arg, **kw)
+        results = batch.BatchResult(
+            lambda loc: self._send(text_msg, loc, headers),
+            locations, concurrency)
+        return dict(zip(locations, results))
+
+    def _call_item(self, item):
+        """
+            Call with a single item of `map`.
+        """
+        if isinstance(item, tuple):
+            return self(*item)
+        elif isinstance(item, dict):
+            return self(**item)
+        return self(item)
+
+    def _encode(self, *arg, **kw):
+        """
+            Serialize call arguments into a SOAP envelope.
+
+            The envelope is written directly as text by `osa.serializer`.
+            The text around the message children is the same for every
+            call and is computed only once.
+
+            Returns
+            -------
+            out : bytes
+                The envelope to send.
+        """
+        return self._envelope().serialize(self.input.wrap(*arg, **kw),
+                                          header=self._header_text())
+
+    def _envelope(self):
+        """
+            Constant parts of the request envelope, made on first use.
+
+            Returns
+            -------
+            out : `osa.serializer.Envelope`
+        """
+        if self._frame is None:
+            self._frame = serializer.Envelope(self.input)
+        return self._frame
+
+    def _encode_stream(self, *arg, **kw):
+        """
+            Prepare streamed serialization of call arguments.
+
+            Returns
+            -------
+            out : callable
+                Body producer writing the envelope in chunks, see
+                `osa.transport`.
+        """
+        instance = self.input.wrap(*arg, **kw)
+        chunk_size = self.chunk_size
+        header = self._header_text()
+
+        envelope = self._envelope()
+
+        def produce(write):
+            envelope.serialize(instance, write, chunk_size, header)
+        return produce
+
+    def _encode_mtom(self, *arg, **kw):
+        """
+            Serialize call arguments into an MTOM request.
+
+            Returns
+            -------
+            out : (bytes or callable, dict)
+                Request body, a body producer if self.streaming, and
+                the request headers.
+        """
+        instance = self.input.wrap(*arg, **kw)
+        chunk_size = self.chunk_size
+        header = self._header_text()
+        envelope = self._envelope()
+
+        def serialize(sink, attachments):
+            envelope.serialize(instance, sink, chunk_size, header,
+                               attachments)
+        return self._package(serialize)
+
+    def _package(self, serialize):
+        """
+            Package an envelope with its attachments as MTOM request.
+
+            Parameters
+            ----------
+            serialize : callable
+                Envelope writer, see `osa.mtom.producer`.
+
+            Returns
+            -------
+            out : (bytes or callable, dict)
+                Request body, a body producer if self.streaming, and
+                the request headers.
+        """
+        if hasattr(self.transport, 'headers'):
+            headers = self.transport.headers(self.action)
+        else:
+            headers = transports.Transport().headers(self.action)
+        produce, headers = mtom.request(serialize, headers)
+        if self.streaming:
+            return produce, headers
+        return transports.body_bytes(produce), headers
+
+    def _process(self, response, location=None):
+        """
+            Decode the response or raise the service fault.
+
+            Parameters
+            ----------
+            response : file-like object
+                Response as returned by the transport.
+            location : str, optional
+                Service address used in fault messages, self.location
+                if None.
+
+            A SOAP fault in a 500 response is raised as `SOAPFault`. A 500
+            response without a fault, XML or not, raises HTTPError with
+            the body readable from the error.
+        """
+        self._last.header = None
+        if location is None:
+            location = self.location
+        # check http code returned
+        if response.code == 200:
+            if self.output is None:
                 return None
+            # string to xml, xsi:type values are qualified for the
+            # anyType
+            if self.mtom:
+                xml = mtom.parse(response)
+            elif self.binary_sink is not None:
+                cls = None
+                if self.output.use_parts:
+                    cls = self.output.use_parts[0][1]
+                # one response at a time, so that the values of
+                # concurrent calls do not interleave in the sink
+                with self._sink_lock:
+                    xml = download.parse(response, cls, self.binary_sink)
             else:
-                raise RuntimeError("Bad HTTP status code: %d" % response.code)
-        except HTTPError as e:
-            if e.code == 500:
-                # read http error body and make xml from it
-                try:
-                    xml = etree.fromstring(e.fp.read())
-                except Exception:
-                    print(e)
-                    return None
+                xml = xmlparser.parse_response(response)
+            # find soap body
+            body = xml.find(SOAP_BODY)
+            if body is None:
+                raise RuntimeError("No SOAP body found in response")
+            self._last.header = ResponseHeader(xml)
+            body = body[0]
+            return self.output.from_xml(body)
+        elif response.code == 202 or response.code == 204 \
+                and self.output is None:
+            return None
+        elif response.code == 500:
+            # read http error body and make xml from it
+            data = b''
+            fault = None
+            try:
+                if self.mtom:
+                    xml = mtom.parse(response)
+                else:
+                    data = response.read()
+                    xml = etree.fromstring(data)
+            except Exception:
+                xml = None
+            if xml is not None:
                 body = xml.find(SOAP_BODY)
-                if body is None:
-                    raise
                 # process service fault
-                fault = body.find(SOAP_FAULT)
-                if fault is not None:
-                    code = fault.find('faultcode')
-                    if code is not None:
-                        code = code.text or ''
-                    string = fault.find('faultstring')
-                    if string is not None:
-                        string = string.text or ''
-                    detail = fault.find('detail')
-                    if detail is not None:
-                        detail = detail.text or ''
-                    raise RuntimeError("SOAP Fault %s: %s <%s> %s %s" %
-                                       (self.location, self.name, code,
-                                        string, detail))
-                else:
-                    raise
-            else:
-                raise
+                if body is not None:
+                    fault = body.find(SOAP_FAULT)
+            if fault is None:
+                raise HTTPError(location, 500, "Internal Server Error",
+                                getattr(response, 'headers', None),
+                                BytesIO(data))
+            code = fault.find('faultcode')
+            if code is not None:
+                code = code.text or ''
+            string = fault.find('faultstring')
+            if string is not None:
+                string = string.text or ''
+            detail = fault.find('detail')
+            if detail is not None:
+                detail = detail.text or ''
+            raise SOAPFault("SOAP Fault %s: %s <%s> %s %s" %
+                               (location, self.name, code,
+                                string, detail))
+        else:
+            raise RuntimeError("Bad HTTP status code: %d" % response.code)
@@ -0,0 +1,257 @@
+# mtom.py - MTOM/XOP packaging of messages, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    MTOM/XOP packaging of SOAP messages.
+
+    With MTOM base64Binary values are not encoded into the envelope.
+    Every value is sent as a raw part of a multipart/related message
+    and the envelope refers to it by an xop:Include element. This
+    saves the third of the size added by base64 and the encoding and
+    decoding work on both ends.
+
+    Requests are packaged by `request`: the envelope is written by
+    `osa.serializer` with base64Binary values collected as attachments,
+    which follow the envelope as MIME parts. Responses are unpacked by
+    `parse`: the attachments are memoryview slices of the received
+    body, nothing is copied. They replace the xop:Include elements as
+    the text of their parents, where `osa.xmltypes.decode_base64` picks
+    them up unchanged.
+
+    MTOM is switched on per method by its mtom attribute, see
+    `osa.method.Method`.
+"""
+from . import xmlparser
+from io import BytesIO
+import uuid
+import sys
+if sys.version_info[0] < 3:
+    from urllib import unquote
+else:
+    from urllib.parse import unquote
+
+NS_XOP = 'http://www.w3.org/2004/08/xop/include'
+XOP_INCLUDE = '{%s}Include' % NS_XOP
+# content id of the envelope part
+ROOT_ID = 'root.message@osa'
+# bytes read at once from file-like attachments
+CHUNK_SIZE = 65536
+
+
+def make_boundary():
+    """
+        New MIME boundary, unique for every message.
+    """
+    return 'MIMEBoundary_%s' % uuid.uuid4().hex
+
+
+def content_id(index):
+    """
+        Content id of the attachment with the index in a request.
+    """
+    return '%d.attachment@osa' % index
+
+
+def _parts(value):
+    """
+        Raw data of an attachment in chunks.
+    """
+    if hasattr(value, 'read'):
+        while True:
+            data = value.read(CHUNK_SIZE)
+            if not data:
+                break
+            yield data
+    elif isinstance(value, bytes):
+        yield value
+    elif sys.version_info[0] < 3:
+        yield memoryview(value).tobytes()
+    else:
+        view = memoryview(value)
+        if view.itemsize != 1 or view.ndim != 1:
+            # sizes of chunks are taken by len, which counts items
+            if view.c_contiguous:
+                view = view.cast('B')
+            else:
+                view = memoryview(view.tobytes())
+        yield view
+
+
+def producer(serialize, boundary, envelope_type='text/xml'):
+    """
+        Body producer of an MTOM request, see `osa.transport`.
+
+        Parameters
+        ----------
+        serialize : callable
+            Called as serialize(sink, attachments), writes the envelope
+            to sink and appends (content id, value) of every attachment
+            to the list attachments, e.g. by
+            `osa.serializer.Envelope.serialize`.
+        boundary : str
+            MIME boundary, the same as in the request headers.
+        envelope_type : str, optional - default 'text/xml'
+            Media type of the envelope.
+    """
+    def produce(write):
+        attachments = []
+        write(('--%s\r\nContent-Type: application/xop+xml; charset=utf-8; '
+               'type="%s"\r\nContent-Transfer-Encoding: binary\r\n'
+               'Content-ID: <%s>\r\n\r\n' %
+               (boundary, envelope_type, ROOT_ID)).encode('ascii'))
+        serialize(write, attachments)
+        for cid, value in attachments:
+            write(('\r\n--%s\r\nContent-Type: application/octet-stream\r\n'
+                   'Content-Transfer-Encoding: binary\r\n'
+                   'Content-ID: <%s>\r\n\r\n' % (boundary, cid))
+                  .encode('ascii'))
+            for data in _parts(value):
+                write(data)
+        write(('\r\n--%s--\r\n' % boundary).encode('ascii'))
+    return produce
+
+
+def request(serialize, headers):
+    """
+        MTOM request of an envelope.
+
+        Parameters
+        ----------
+        serialize : callable
+            Envelope writer, see `producer`.
+        headers : dict
+            HTTP headers of a plain request, Content-Type gives the
+            type of the envelope.
+
+        Returns
+        -------
+        out : (callable, dict)
+            Body producer and the HTTP headers with multipart
+            Content-Type.
+    """
+    boundary = make_boundary()
+    headers = dict(headers)
+    envelope_type = headers.get('Content-Type', 'text/xml')
+    envelope_type = envelope_type.split(';', 1)[0].strip()
+    headers['Content-Type'] = (
+        'multipart/related; type="application/xop+xml"; '
+        'boundary="%s"; start="<%s>"; start-info="%s"' %
+        (boundary, ROOT_ID, envelope_type))
+    return producer(serialize, boundary, envelope_type), headers
+
+
+def _header_value(headers, name):
+    """
+        Value of a MIME part header, None if not present.
+    """
+    for line in headers.split(b'\r\n'):
+        key, sep, value = line.partition(b':')
+        if sep and key.strip().lower() == name:
+            return value.strip().decode('latin-1')
+    return None
+
+
+def unpack(data):
+    """
+        Split a multipart/related message into its parts.
+
+        The boundary is taken from the first line of the message, so
+        that no HTTP headers are needed.
+
+        Parameters
+        ----------
+        data : bytes
+            Complete message body.
+
+        Returns
+        -------
+        out : (memoryview, dict)
+            The first part, which is the envelope, and the map content
+            id -> memoryview of the other parts. The views refer to
+            data, which is not copied.
+    """
+    start = data.find(b'--')
+    end = data.find(b'\r\n', start)
+    if start < 0 or end < 0 or data[:start].strip():
+        raise RuntimeError("Bad multipart message")
+    delimiter = b'\r\n' + data[start:end].rstrip()
+    view = memoryview(data)
+    root = None
+    parts = {}
+    pos = end + 2
+    while True:
+        body = data.find(b'\r\n\r\n', pos)
+        stop = data.find(delimiter, pos)
+        if body < 0 or stop < 0 or body > stop:
+            raise RuntimeError("Bad multipart message")
+        value = view[body + 4:stop]
+        if root is None:
+            root = value
+        else:
+            cid = _header_value(data[pos:body], b'content-id')
+            if cid is not None:
+                parts[cid.strip('<>')] = value
+        pos = stop + len(delimiter)
+        if data[pos:pos + 2] == b'--':
+            return root, parts
+        pos = data.find(b'\r\n', pos)
+        if pos < 0:
+            raise RuntimeError("Bad multipart message")
+        pos += 2
+
+
+def include(root, attachments):
+    """
+        Replace xop:Include elements by the attachments they refer to.
+
+        The attachment becomes the text of the parent element of the
+        xop:Include element, which is removed.
+
+        Parameters
+        ----------
+        root : etree.Element
+            Parsed envelope.
+        attachments : dict
+            Map content id -> attachment.
+    """
+    found = [(parent, child) for parent in root.iter()
+             for child in parent if child.tag == XOP_INCLUDE]
+    for parent, child in found:
+        href = child.get('href', '')
+        if href[:4] == 'cid:':
+            href = href[4:]
+        value = attachments.get(href)
+        if value is None:
+            # content ids in cid URLs may be %-escaped, RFC 2392
+            value = attachments.get(unquote(href))
+        if value is None:
+            raise RuntimeError("MTOM attachment not found: %s" % href)
+        parent.remove(child)
+        parent.text = value
+
+
+def parse(f):
+    """
+        Parse a response that may be an MTOM message.
+
+        Parameters
+        ----------
+        f : file-like object
+            Response, read completely.
+
+        Returns
+        -------
+        root : xml node
+            Root of the envelope, base64Binary elements sent as
+            attachments have them as their text.
+    """
+    data = f.read()
+    if data[:256].lstrip()[:2] != b'--':
+        # plain envelope
+        return xmlparser.parse_response(BytesIO(data))
+    envelope, attachments = unpack(data)
+    root = xmlparser.parse_response(BytesIO(envelope.tobytes()))
+    if attachments:
+        include(root, attachments)
+    return root
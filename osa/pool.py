@@ -0,0 +1,357 @@
+# pool.py - HTTP connection pool, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Pool of persistent HTTP/1.1 connections.
+"""
+import errno
+import select
+import socket
+import ssl
+import threading
+import time
+import sys
+if sys.version_info[0] < 3:
+    import httplib
+    from urlparse import urlsplit
+else:
+    import http.client as httplib
+    from urllib.parse import urlsplit
+
+
+class PooledResponse(object):
+    """
+        File-like HTTP response which gives its connection back to the pool.
+
+        The connection is returned to the pool on `close`, if the
+        response was read completely and the server did not ask to
+        close it. Otherwise the connection is closed.
+
+        Parameters
+        ----------
+        pool : `ConnectionPool`
+            Owner of the connection.
+        key : tuple
+            Pool key (scheme, host, port) of the connection.
+        conn : httplib.HTTPConnection
+            Connection used for the request.
+        response : httplib.HTTPResponse
+            Response to wrap.
+    """
+    def __init__(self, pool, key, conn, response):
+        self.code = response.status
+        self.headers = response.msg
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self._response.read()
+        return self._response.read(size)
+
+    def getheader(self, name, default=None):
+        return self._response.getheader(name, default)
+
+    def close(self):
+        conn = self._conn
+        if conn is None:
+            return
+        self._conn = None
+        if self._response.isclosed() and not self._response.will_close:
+            self._pool.release(self._key, conn)
+        else:
+            self._response.close()
+            conn.close()
+
+
+def _not_received(error, sent):
+    """
+        Check if a request failed because the connection was closed
+        before the server read it, so that it is safe to repeat.
+
+        Parameters
+        ----------
+        error : Exception
+            Error of the exchange.
+        sent : bool
+            The request was sent completely.
+    """
+    if isinstance(error, socket.timeout):
+        return False
+    if isinstance(error, httplib.BadStatusLine):
+        # empty status line: closed without any response, told apart
+        # by RemoteDisconnected, a subclass, on py3 and by the message
+        # on late py2
+        return error.line in ('', "''") or \
+            error.__class__.__name__ == 'RemoteDisconnected' or \
+            str(error.line).startswith('No status line received')
+    if not sent and isinstance(error, socket.error):
+        return getattr(error, 'errno', None) in (
+            errno.EPIPE, errno.ECONNRESET, errno.EBADF)
+    return False
+
+
+class HTTPSConnection(httplib.HTTPSConnection):
+    """
+        HTTPS connection resuming TLS sessions stored in the pool.
+
+        Parameters
+        ----------
+        pool : `ConnectionPool`
+            Owner of the TLS sessions and the ssl context.
+        key : tuple
+            Pool key (scheme, host, port) of the connection.
+    """
+    def __init__(self, pool, key, timeout):
+        httplib.HTTPSConnection.__init__(self, key[1], key[2],
+                                         timeout=timeout,
+                                         context=pool.ssl_context)
+        self._pool = pool
+        self._key = key
+
+    def connect(self):
+        # plain tcp connection, including a proxy tunnel
+        httplib.HTTPConnection.connect(self)
+        server_hostname = getattr(self, '_tunnel_host', None) or self.host
+        kw = {'server_hostname': server_hostname}
+        session = self._pool.get_session(self._key)
+        if session is not None:
+            kw['session'] = session
+        self.sock = self._context.wrap_socket(self.sock, **kw)
+        self._pool.handshake_done(self._key, self.sock)
+
+
+class ConnectionPool(object):
+    """
+        Thread safe pool of persistent HTTP/1.1 connections.
+
+        Connections are kept per (scheme, host, port) of the request
+        location, so that all operations of a service share them.
+        Idle connections older than idle_timeout are dropped. If a reused
+        connection turns out to be closed by the server before it read
+        the request, the request is repeated once over a fresh
+        connection. Other errors, timeouts in particular, are raised, as
+        the server may have processed the request already.
+
+        Parameters
+        ----------
+        size : int, optional - default 10
+            Maximal number of idle connections kept per host.
+        idle_timeout : float, optional - default 60
+            Idle connections older than this (in seconds) are closed
+            instead of being reused.
+        timeout : float, optional - default None
+            Socket timeout, the global socket default if None.
+        ssl_context : ssl.SSLContext, optional
+            Context for https connections, ssl.create_default_context()
+            if None.
+
+        For https the context is shared by all connections and TLS
+        sessions are resumed on new connections to the same host (this
+        needs Python 3.6 or newer). The number of full and resumed
+        handshakes is counted in self.handshakes.
+    """
+    def __init__(self, size=10, idle_timeout=60.0, timeout=None,
+                 ssl_context=None):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        if ssl_context is None:
+            ssl_context = ssl.create_default_context()
+        self.ssl_context = ssl_context
+        self.handshakes = {'full': 0, 'resumed': 0}
+        self._sessions = {}  # key -> last TLS session
+        self._idle = {}  # key -> list of (last use time, connection)
+        self._lock = threading.Lock()
+
+    def _connect(self, key):
+        """
+            Open a new connection for the pool key.
+        """
+        scheme, host, port = key
+        timeout = self.timeout
+        if timeout is None:
+            timeout = socket._GLOBAL_DEFAULT_TIMEOUT
+        if scheme == 'https':
+            return HTTPSConnection(self, key, timeout)
+        return httplib.HTTPConnection(host, port, timeout=timeout)
+
+    def get_session(self, key):
+        """
+            TLS session to resume for the key or None.
+        """
+        with self._lock:
+            return self._sessions.get(key)
+
+    def handshake_done(self, key, sock):
+        """
+            Count the handshake of a new TLS socket and keep its session.
+        """
+        with self._lock:
+            if getattr(sock, 'session_reused', False):
+                self.handshakes['resumed'] += 1
+            else:
+                self.handshakes['full'] += 1
+        self.store_session(key, sock)
+
+    def store_session(self, key, sock):
+        """
+            Keep the TLS session of sock for new connections to key.
+        """
+        session = getattr(sock, 'session', None)
+        if session is not None:
+            with self._lock:
+                self._sessions[key] = session
+
+    def acquire(self, key):
+        """
+            Get an idle connection for the key or open a new one.
+
+            Returns
+            -------
+            out : (connection, reused)
+                reused is True if the connection was taken from the pool.
+        """
+        now = time.time()
+        stale = []
+        conn = None
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                used, c = idle.pop()
+                if now - used > self.idle_timeout:
+                    stale.append(c)
+                else:
+                    conn = c
+                    break
+        for c in stale:
+            c.close()
+        if conn is not None:
+            return conn, True
+        return self._connect(key), False
+
+    def release(self, key, conn):
+        """
+            Put a connection back to the pool.
+        """
+        if key[0] == 'https' and conn.sock is not None:
+            # TLS 1.3 tickets arrive after the handshake, keep the latest
+            self.store_session(key, conn.sock)
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append((time.time(), conn))
+                return
+        conn.close()
+
+    @staticmethod
+    def _dropped(conn):
+        """
+            Check if an idle connection was closed by the server.
+        """
+        if conn.sock is None:
+            return True
+        try:
+            readable = select.select([conn.sock], [], [], 0)[0]
+        except (socket.error, ValueError):
+            return True
+        # an idle connection is readable only at EOF
+        return bool(readable)
+
+    @staticmethod
+    def _send_chunked(conn, selector, produce, headers):
+        """
+            Send the request with chunked transfer encoding.
+        """
+        names = [k.lower() for k in headers]
+        conn.putrequest('POST', selector,
+                        skip_accept_encoding='accept-encoding' in names)
+        for k, v in headers.items():
+            conn.putheader(k, v)
+        conn.putheader('Transfer-Encoding', 'chunked')
+        conn.endheaders()
+
+        def write(data):
+            if data:  # empty chunk would end the body
+                conn.send(('%x\r\n' % len(data)).encode('ascii') +
+                          data + b'\r\n')
+        produce(write)
+        conn.send(b'0\r\n\r\n')
+
+    def request(self, location, body, headers):
+        """
+            POST body to location.
+
+            A body producer (see `osa.transport`) is sent with chunked
+            transfer encoding. It can not be repeated, so a reused
+            connection is checked before and no retry is done. Bytes
+            are repeated at most once and only if the server closed the
+            connection without reading the request.
+
+            Parameters
+            ----------
+            location : str
+                Full url of the request.
+            body : bytes or callable
+                Request body or body producer.
+            headers : dict
+                Request headers.
+
+            Returns
+            -------
+            out : `PooledResponse`
+                Response, must be closed after reading.
+        """
+        parts = urlsplit(location)
+        scheme = parts.scheme or 'http'
+        port = parts.port
+        if port is None:
+            port = 443 if scheme == 'https' else 80
+        key = (scheme, parts.hostname, port)
+        selector = parts.path or '/'
+        if parts.query:
+            selector = '%s?%s' % (selector, parts.query)
+
+        streamed = callable(body)
+        retried = False
+        while True:
+            conn, reused = self.acquire(key)
+            if streamed and reused and self._dropped(conn):
+                conn.close()
+                continue
+            sent = False
+            try:
+                if streamed:
+                    self._send_chunked(conn, selector, body, headers)
+                else:
+                    conn.request('POST', selector, body, headers)
+                sent = True
+                response = conn.getresponse()
+            except (socket.error, httplib.HTTPException) as e:
+                conn.close()
+                if reused and not streamed and not retried and \
+                        _not_received(e, sent):
+                    # stale socket closed by the server, try again
+                    retried = True
+                    continue
+                raise
+            except Exception:
+                # failed body producer, the request is incomplete
+                conn.close()
+                raise
+            return PooledResponse(self, key, conn, response)
+
+    def clear(self):
+        """
+            Close all idle connections.
+        """
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+            self._sessions = {}
+        for conns in idle.values():
+            for used, conn in conns:
+                conn.close()
@@ -0,0 +1,149 @@
+# routing.py - routing calls across service ports, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Spreading calls over several equivalent service addresses.
+"""
+import threading
+import time
+
+
+class Endpoint(object):
+    """
+        Routing state of a single address.
+    """
+    def __init__(self, location):
+        self.location = location
+        self.outstanding = 0  # requests in flight
+        self.latency = None  # exponentially weighted moving average
+        self.failures = 0  # consecutive failures
+        self.down_until = 0.0  # out of rotation until this time
+
+    def __repr__(self):
+        return 'Endpoint(%s, outstanding %d, latency %s, failures %d)' % (
+            self.location, self.outstanding, self.latency, self.failures)
+
+
+class Router(object):
+    """
+        Chooses one of several equivalent addresses for every call.
+
+        Two policies are available:
+            - least_outstanding - address with fewest requests in flight,
+            - ewma - address with the lowest moving average of latency
+              weighted by the number of requests in flight.
+        Addresses without known latency are tried first.
+
+        A failing address is taken out of rotation for penalty seconds,
+        doubled for every consecutive failure up to max_penalty. An
+        address whose average latency is more than slow_factor times
+        that of the fastest one is taken out of rotation as well and
+        its latency is forgotten when it comes back.
+
+        Parameters
+        ----------
+        locations : list of str
+            Service addresses.
+        policy : str, optional - default 'ewma'
+            'ewma' or 'least_outstanding'.
+        decay : float, optional - default 0.3
+            Weight of the newest latency in the moving average.
+        penalty : float, optional - default 10
+            Seconds a failed address is out of rotation.
+        max_penalty : float, optional - default 300
+            Upper limit of the penalty.
+        slow_factor : float, optional - default 5
+            Latency ratio to the fastest address to be considered slow,
+            None to never take slow addresses out.
+    """
+    def __init__(self, locations, policy='ewma', decay=0.3, penalty=10.0,
+                 max_penalty=300.0, slow_factor=5.0):
+        if policy not in ('ewma', 'least_outstanding'):
+            raise ValueError("Unknown routing policy: %s" % policy)
+        if not locations:
+            raise ValueError("No locations to route to")
+        self.policy = policy
+        self.decay = decay
+        self.penalty = penalty
+        self.max_penalty = max_penalty
+        self.slow_factor = slow_factor
+        self.endpoints = [Endpoint(loc) for loc in locations]
+        self._lock = threading.Lock()
+        self._next = 0  # round robin start for ties
+
+    @property
+    def locations(self):
+        return [e.location for e in self.endpoints]
+
+    def _score(self, endpoint):
+        if self.policy == 'least_outstanding':
+            return (endpoint.outstanding, endpoint.latency or 0.0)
+        if endpoint.latency is None:
+            return (-1.0, endpoint.outstanding)
+        return (endpoint.latency * (endpoint.outstanding + 1), 0)
+
+    def acquire(self):
+        """
+            Choose an address for a new call.
+
+            Returns
+            -------
+            out : `Endpoint`
+                Must be given back by `release` when the call is done.
+        """
+        now = time.time()
+        with self._lock:
+            n = len(self.endpoints)
+            order = self.endpoints[self._next:] + self.endpoints[:self._next]
+            self._next = (self._next + 1) % n
+            candidates = []
+            for e in order:
+                if e.down_until <= now:
+                    if e.down_until:
+                        # back in rotation, measure it again
+                        e.down_until = 0.0
+                        e.latency = None
+                    candidates.append(e)
+            if candidates:
+                best = min(candidates, key=self._score)
+            else:
+                # everything is down, take the one back first
+                best = min(order, key=lambda e: e.down_until)
+            best.outstanding += 1
+            return best
+
+    def release(self, endpoint, latency=None, ok=True):
+        """
+            Report the end of a call.
+
+            Parameters
+            ----------
+            endpoint : `Endpoint`
+                As returned by `acquire`.
+            latency : float
+                Duration of the call in seconds.
+            ok : bool
+                False if the address failed.
+        """
+        now = time.time()
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not ok:
+                endpoint.failures += 1
+                penalty = min(self.penalty * 2 ** (endpoint.failures - 1),
+                              self.max_penalty)
+                endpoint.down_until = now + penalty
+                return
+            endpoint.failures = 0
+            if endpoint.latency is None:
+                endpoint.latency = latency
+            else:
+                endpoint.latency += self.decay * (latency - endpoint.latency)
+            if self.slow_factor is None:
+                return
+            known = [e.latency for e in self.endpoints
+                     if e.latency is not None and e.down_until <= now]
+            if len(known) > 1 and \
+                    endpoint.latency > self.slow_factor * min(known):
+                endpoint.down_until = now + self.penalty
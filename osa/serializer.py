@@ -0,0 +1,1217 @@
+# serializer.py - XML serialization without element trees, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Serialization of messages without building an element tree.
+
+    Complex types are walked by their _children description and written
+    directly as text, known primitive types are converted to text
+    without creating their instances. Other types serialize themselves
+    by to_xml into a small scratch element.
+
+    Two modes are available:
+        - the complete envelope is returned as bytes, identical to
+          etree.tostring of the tree built by to_xml,
+        - the text is passed to a sink in chunks while the message is
+          still being serialized, so that a large request is never held
+          in memory as a whole.
+"""
+from . import xmlnamespace
+from . import xmltypes
+from . import mtom
+from datetime import date, datetime
+import xml.etree.cElementTree as etree
+import xml.etree.ElementTree as ElementTree
+import base64
+import keyword
+import re
+import sys
+import weakref
+if sys.version_info[0] > 2:
+    unicode = str
+
+ENVELOPE = '{%s}Envelope' % xmlnamespace.NS_SOAP_ENV
+BODY = '{%s}Body' % xmlnamespace.NS_SOAP_ENV
+HEADER = '{%s}Header' % xmlnamespace.NS_SOAP_ENV
+XSI_NIL = '{%s}nil' % xmlnamespace.NS_XSI
+XSI_TYPE = '{%s}type' % xmlnamespace.NS_XSI
+NS_XML = 'http://www.w3.org/XML/1998/namespace'
+# bytes read and encoded at once for base64Binary, multiple of 3
+BASE64_CHUNK = 3 * 16384
+
+# prefixes for well-known namespaces as used by ElementTree
+_well_known = getattr(ElementTree, '_namespace_map', {})
+# ElementTree before 3.8 writes attributes sorted
+_sort_attrib = sys.version_info < (3, 8)
+
+
+def escape_text(text):
+    """
+        Escape element text the same way as ElementTree.
+    """
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def escape_attrib(text):
+    """
+        Escape attribute value. White space other than blanks is written
+        as character references, which keeps it from being normalized
+        to blanks by the parser.
+    """
+    text = escape_text(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    if '\t' in text:
+        text = text.replace('\t', '&#09;')
+    return text
+
+
+def encode(text):
+    """
+        Encode serialized text like etree.tostring: ascii with character
+        references.
+    """
+    return text.encode('ascii', 'xmlcharrefreplace')
+
+
+def _func(method):
+    return getattr(method, '__func__', method)
+
+
+def is_complex(cls):
+    """
+        Check if instances of cls are serialized by their _children.
+    """
+    return _func(cls.to_xml) is _func(xmltypes.XMLType.to_xml)
+
+
+def namespaces(cls, found=None, seen=None):
+    """
+        Namespaces which may appear in a serialized instance of cls.
+
+        Parameters
+        ----------
+        cls : class
+            Complex type.
+
+        Returns
+        -------
+        out : list
+            Namespaces in the order of appearance.
+    """
+    if found is None:
+        found = []
+    if seen is None:
+        seen = set()
+    seen.add(cls)
+    for child in getattr(cls, '_children', []):
+        ns = xmlnamespace.get_ns(child['fullname'])
+        if ns and ns not in found:
+            found.append(ns)
+        if (child.get('nillable', False) or
+                child['type'] is xmltypes.XMLAny) and \
+                xmlnamespace.NS_XSI not in found:
+            found.append(xmlnamespace.NS_XSI)
+        if child['type'] not in seen and \
+                hasattr(child['type'], '_children'):
+            namespaces(child['type'], found, seen)
+    return found
+
+
+def dominant_namespace(cls, repeated=10):
+    """
+        Namespace of most elements of a serialized instance of cls.
+
+        Elements are counted once per declaration in the type, repeated
+        elements (maxOccurs > 1) count as repeated times. Unqualified
+        elements count against all namespaces, as they would need
+        xmlns="" if a default namespace were declared.
+
+        Returns
+        -------
+        out : str or None
+            The namespace, None if no namespace dominates.
+    """
+    counts = {cls._namespace: 1}
+    seen = set()
+
+    def count(cls):
+        seen.add(cls)
+        for child in getattr(cls, '_children', []):
+            ns = xmlnamespace.get_ns(child['fullname']) or ''
+            weight = 1
+            if child['max'].__class__.__name__ != 'int' or child['max'] > 1:
+                weight = repeated
+            counts[ns] = counts.get(ns, 0) + weight
+            if child['type'] not in seen and \
+                    hasattr(child['type'], '_children'):
+                count(child['type'])
+    count(cls)
+    unqualified = counts.pop('', 0)
+    if not counts:
+        return None
+    ns = max(sorted(counts), key=counts.get)
+    if counts[ns] <= unqualified:
+        return None
+    return ns
+
+
+class XMLWriter(object):
+    """
+        Writer of XML text with namespace prefixes.
+
+        Prefixes are chosen like ElementTree does: well-known ones or
+        ns0, ns1, ... in the order of appearance.
+
+        Parameters
+        ----------
+        sink : callable, optional
+            If given, the serialized text is passed to it as bytes in
+            chunks of about chunk_size parts. A namespace not declared
+            yet is then declared on the element where it is used first
+            and is valid within it. Without sink the text is kept and
+            returned by `getvalue`, all namespaces are declared on the
+            root element like ElementTree does.
+        chunk_size : int, optional - default 4096
+            Number of written parts to collect before calling the sink.
+        prefixes : dict, optional
+            Map namespace -> prefix of namespaces declared by the caller
+            in advance. Other namespaces are declared locally as with a
+            sink.
+        names : dict, optional
+            Cache of prefixed names to share between writers with the
+            same prefixes and default namespace.
+        default : str, optional
+            Namespace to write without prefix. It is declared as the
+            default namespace on the root, unqualified elements get
+            xmlns="" then.
+    """
+    def __init__(self, sink=None, chunk_size=4096, prefixes=None,
+                 names=None, default=None):
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self.default = default
+        self.parts = []
+        # namespace -> prefix of declared namespaces
+        self.prefixes = dict(prefixes or {})
+        self._hoist = sink is None and prefixes is None
+        # current default namespace -> {tag: name valid without
+        # declarations}
+        self._contexts = {} if names is None else names
+        self._current = ''
+        self._qnames = self._contexts.setdefault('', {})
+        self._fixed = set(self.prefixes)  # namespaces declared on the root
+        self._root = None  # (index in parts, name, attributes)
+        # (qualified name, declared namespaces, saved default namespace)
+        self._stack = []
+        self._open = False  # start tag is not closed yet
+        self._counter = len(self.prefixes)
+        # (content id, value) of base64Binary values sent as MTOM
+        # attachments, None to write them as text
+        self.attachments = None
+
+    def _prefix(self, ns):
+        prefix = _well_known.get(ns)
+        if prefix is None or prefix in self.prefixes.values():
+            while True:
+                prefix = 'ns%d' % self._counter
+                self._counter += 1
+                if prefix not in self.prefixes.values():
+                    break
+        else:
+            self._counter += 1
+        return prefix
+
+    def _prefixed(self, ns, local, declared):
+        if ns == NS_XML:
+            return 'xml:%s' % local
+        prefix = self.prefixes.get(ns)
+        if prefix is None:
+            prefix = self._prefix(ns)
+            self.prefixes[ns] = prefix
+            declared.append(ns)
+        return '%s:%s' % (prefix, local)
+
+    def _qname(self, tag, declared):
+        """
+            Name of element tag and the default namespace to declare on
+            it, None if the default is not changed.
+        """
+        qname = self._qnames.get(tag)
+        if qname is not None:
+            return qname, None
+        if tag[:1] == '{':
+            ns, local = tag[1:].split('}', 1)
+        else:
+            ns, local = '', tag
+        if ns == self._current:
+            self._qnames[tag] = local
+            return local, None
+        if not ns or ns == self.default:
+            return local, ns
+        qname = self._prefixed(ns, local, declared)
+        if self._hoist or ns in self._fixed:
+            self._qnames[tag] = qname
+        return qname, None
+
+    def _attr_name(self, key, declared):
+        if key[:1] != '{':
+            return key
+        ns, local = key[1:].split('}', 1)
+        return self._prefixed(ns, local, declared)
+
+    def resume(self, qname, default):
+        """
+            Continue inside an element written before, e.g. as a
+            constant text.
+
+            Parameters
+            ----------
+            qname : str
+                Name of the element as written.
+            default : str
+                Default namespace valid inside the element.
+        """
+        self._stack.append((qname, [], None))
+        self._current = default
+        self._qnames = self._contexts.setdefault(default, {})
+
+    def start(self, tag, attrib=None, declare=()):
+        """
+            Write start tag.
+
+            Parameters
+            ----------
+            tag : str
+                Namespace qualified name.
+            attrib : dict, optional
+                Attributes with qualified names.
+            declare : list, optional
+                Namespaces to declare on this element in any case.
+        """
+        parts = self.parts
+        if self._open:
+            parts.append('>')
+        declared = []
+        for ns in declare:
+            if ns not in self.prefixes:
+                self.prefixes[ns] = self._prefix(ns)
+                declared.append(ns)
+        qname, default = self._qname(tag, declared)
+        if default is None and not self._stack and self.default:
+            default = self.default  # declared on the root
+        attrs = ''
+        if attrib:
+            items = attrib.items()
+            if _sort_attrib:
+                items = sorted(items)
+            attrs = ''.join([' %s="%s"' % (self._attr_name(k, declared),
+                                           escape_attrib(v))
+                             for k, v in items])
+        saved = None
+        if default is not None:
+            saved = (self._current, self._qnames)
+            self._current = default
+            self._qnames = self._contexts.setdefault(default, {})
+            attrs = ' xmlns="%s"%s' % (escape_attrib(default), attrs)
+        if not self._stack and self._hoist:
+            # root, namespaces are added by getvalue
+            self._root = (len(parts), qname, attrs)
+        elif declared and not self._hoist:
+            attrs = self._declarations(declared) + attrs
+            if not self._stack:
+                self._fixed.update(declared)
+        parts.append('<%s%s' % (qname, attrs))
+        self._stack.append((qname, declared, saved))
+        self._open = True
+
+    def _declarations(self, namespaces):
+        decls = sorted((self.prefixes[ns], ns) for ns in namespaces)
+        return ''.join([' xmlns:%s="%s"' % (p, escape_attrib(ns))
+                        for p, ns in decls])
+
+    def data(self, text):
+        """
+            Write element text.
+        """
+        if not text:
+            return
+        if self._open:
+            self.parts.append('>')
+            self._open = False
+        self.parts.append(escape_text(text))
+
+    def end(self):
+        """
+            Close the current element.
+        """
+        qname, declared, saved = self._stack.pop()
+        if not self._hoist:
+            for ns in declared:
+                del self.prefixes[ns]
+        if saved is not None:
+            self._current, self._qnames = saved
+        if self._open:
+            self.parts.append(' />')
+            self._open = False
+        else:
+            self.parts.append('</%s>' % qname)
+        if self.sink is not None and len(self.parts) >= self.chunk_size:
+            self.flush()
+
+    def leaf(self, tag, text):
+        """
+            Write a complete element with text only.
+        """
+        qname = self._qnames.get(tag)
+        if qname is None:
+            self.start(tag)
+            self.data(text)
+            self.end()
+            return
+        parts = self.parts
+        if self._open:
+            parts.append('>')
+            self._open = False
+        if text:
+            if '&' in text or '<' in text or '>' in text:
+                text = escape_text(text)
+            parts.append('<%s>%s</%s>' % (qname, text, qname))
+        else:
+            parts.append('<%s />' % qname)
+
+    def element(self, elem):
+        """
+            Write an etree element with its children.
+        """
+        self.start(elem.tag, elem.attrib)
+        if elem.text:
+            self.data(elem.text)
+        for sub in elem:
+            self.element(sub)
+            if sub.tail:
+                self.data(sub.tail)
+        self.end()
+
+    def flush(self):
+        """
+            Pass the collected text to the sink.
+        """
+        if self.parts:
+            data = encode(''.join(self.parts))
+            del self.parts[:]
+            self.sink(data)
+
+    def getvalue(self):
+        """
+            Serialized text as bytes.
+        """
+        parts = self.parts
+        if self._root is not None:
+            index, qname, attrs = self._root
+            parts[index] = '<%s%s%s' % (
+                qname, self._declarations(list(self.prefixes)), attrs)
+            self._root = None
+        return encode(''.join(parts))
+
+
+# plain Python values converted by the declared type of their element
+_plain = set([int, float, bool, str, bytes, unicode, xmltypes.Decimal,
+              date, datetime])
+if sys.version_info[0] < 3:
+    _plain.add(long)
+# plain values that are written as a single value, not iterated
+_scalar = set([t for t in _plain
+               if not hasattr(t, '__iter__') or t.__name__ == 'str'])
+
+_identifier = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# xml type -> function writing its values, weak so that generated
+# types can be freed
+_writers = weakref.WeakKeyDictionary()
+# attributes of a complex type holding the description of its children
+# and the function writing them, kept on the class itself as they refer
+# to the type of recursive types
+_PLAN = '_osa_plan'
+_COMPILED = '_osa_compiled'
+
+# write children by functions generated for every complex type, the
+# plan of the type is interpreted if False
+generate = True
+
+
+def _codec(cls):
+    """
+        Text conversion of a primitive type for writing:
+        (encode, text may need escaping), None if there is none.
+    """
+    codec = xmltypes.get_codec(cls)
+    if codec is None:
+        return None
+    return codec[0], codec[2]
+
+
+def _primitive_writer(codec):
+    text = codec[0]
+
+    def write(writer, value, tag, cls, attrib):
+        if attrib:
+            writer.start(tag, attrib)
+            writer.data(text(cls, value))
+            writer.end()
+        else:
+            writer.leaf(tag, text(cls, value))
+    return write
+
+
+# binary data encoded in chunks for base64Binary
+_buffers = (bytes, bytearray, memoryview)
+
+
+def _base64_chunks(value):
+    """
+        Bytes of a file-like object or buffer in chunks of BASE64_CHUNK,
+        all but the last one a multiple of 3 bytes long.
+    """
+    if hasattr(value, 'read'):
+        rest = b''
+        while True:
+            data = value.read(BASE64_CHUNK)
+            if not data:
+                break
+            if rest:
+                data = rest + data
+            cut = len(data) - len(data) % 3
+            rest = data[cut:]
+            if cut:
+                yield data[:cut]
+        if rest:
+            yield rest
+        return
+    view = memoryview(value)
+    if view.itemsize != 1 or view.ndim != 1:
+        view = memoryview(view.tobytes())
+    for i in range(0, len(view), BASE64_CHUNK):
+        yield view[i:i + BASE64_CHUNK].tobytes()
+
+
+def write_base64(writer, value, tag, cls=None, attrib=None):
+    """
+        Write a base64Binary value.
+
+        File-like objects (anything with read) and buffers (bytes,
+        bytearray, memoryview) are read and encoded in chunks of
+        BASE64_CHUNK bytes. With a sink every chunk is passed on at
+        once, so that memory use does not depend on the size of the
+        data. Other values are converted as by to_xml.
+
+        If the writer collects MTOM attachments, the value is appended
+        to them and only an xop:Include reference is written, see
+        `osa.mtom`.
+    """
+    attachments = writer.attachments
+    if attachments is not None and \
+            (hasattr(value, 'read') or isinstance(value, _buffers)):
+        cid = mtom.content_id(len(attachments))
+        attachments.append((cid, value))
+        writer.start(tag, attrib)
+        writer.start(mtom.XOP_INCLUDE, {'href': 'cid:' + cid})
+        writer.end()
+        writer.end()
+        return
+    if not (hasattr(value, 'read') or isinstance(value, _buffers)):
+        _base64_text(writer, value, tag, cls, attrib)
+        return
+    writer.start(tag, attrib)
+    parts = writer.parts
+    for chunk in _base64_chunks(value):
+        if writer._open:
+            parts.append('>')
+            writer._open = False
+        text = base64.b64encode(chunk)
+        if not isinstance(text, str):
+            text = text.decode('ascii')
+        if writer.sink is not None:
+            writer.flush()  # preceding markup, keeps chunks bounded
+            parts.append(text)
+            writer.flush()
+        else:
+            parts.append(text)
+    writer.end()
+
+
+_base64_text = _primitive_writer(_codec(xmltypes.XMLBase64Binary))
+
+
+def _writer_for(cls):
+    """
+        Function writing values of the xml type cls.
+    """
+    writer = _writers.get(cls)
+    if writer is None:
+        codec = _codec(cls)
+        if is_complex(cls):
+            writer = write_complex
+        elif codec is not None and codec[0] is xmltypes.encode_base64:
+            writer = write_base64
+        elif codec is not None:
+            writer = _primitive_writer(codec)
+        else:
+            writer = write_tree
+        _writers[cls] = writer
+    return writer
+
+
+def _plan(cls):
+    """
+        Children of a complex type prepared for writing:
+        (name, fullname, type, text codec or None, min, max, nillable).
+    """
+    plan = cls.__dict__.get(_PLAN)
+    if plan is not None:
+        return plan
+    plan = []
+    for child in cls._children:
+        ctype = child['type']
+        codec = _codec(ctype)
+        if codec is not None and codec[0] is xmltypes.encode_base64:
+            codec = None  # written in chunks by write_base64
+        max_occurs = child['max']
+        if max_occurs.__class__.__name__ != 'int':
+            max_occurs = float('inf')  # unbounded
+        plan.append((child['name'], child['fullname'], ctype, codec,
+                     child['min'], max_occurs, child.get('nillable', False)))
+    setattr(cls, _PLAN, plan)
+    return plan
+
+
+def write_value(writer, value, tag, cls=None, attrib=None):
+    """
+        Write a single value.
+
+        Parameters
+        ----------
+        writer : `XMLWriter`
+        value : object
+            Value to write, converted by cls if it is not an xml type.
+        tag : str
+            Qualified element name.
+        cls : class, optional
+            Declared type of the value.
+        attrib : dict, optional
+            Extra attributes of the element.
+    """
+    func = _writers.get(value.__class__)
+    if func is not None:
+        cls = value.__class__
+    elif hasattr(value, 'to_xml'):
+        cls = value.__class__
+        func = _writer_for(cls)
+    else:
+        func = _writer_for(cls)
+    func(writer, value, tag, cls, attrib)
+
+
+def write_tree(writer, value, tag, cls=None, attrib=None):
+    """
+        Write a value by its own to_xml into a scratch element.
+    """
+    if not hasattr(value, 'to_xml'):
+        value = cls(value)
+    scratch = etree.Element('scratch')
+    value.to_xml(scratch, tag)
+    elem = scratch[0]
+    if attrib:
+        for k, v in attrib.items():
+            elem.set(k, v)
+    writer.element(elem)
+
+
+def write_complex(writer, obj, tag, cls=None, attrib=None):
+    """
+        Write a complex type instance child by child.
+
+        Repeated children may be given by iterators and generators,
+        they are consumed while being written. Plain values of
+        primitive children are converted to text directly.
+    """
+    if not hasattr(obj, 'to_xml'):
+        obj = cls(obj)
+    writer.start(tag, attrib)
+    write_children(writer, obj, tag)
+    writer.end()
+
+
+def write_children(writer, obj, tag):
+    """
+        Write the children of a complex type instance, see
+        `write_complex`. `interpret_children` is used if generation is
+        switched off by the module variable generate.
+    """
+    if not generate:
+        interpret_children(writer, obj, tag)
+        return
+    func = obj.__class__.__dict__.get(_COMPILED)
+    if func is None:
+        func = _compile(obj.__class__)
+    func(writer, obj, tag)
+
+
+def interpret_children(writer, obj, tag):
+    """
+        Write the children of a complex type instance by walking its
+        plan, see `_plan`.
+    """
+    plan = _plan(obj.__class__)
+    for entry in plan:
+        write_child(writer, entry, getattr(obj, entry[0], None), tag)
+
+
+def _compile(cls):
+    """
+        Function writing the children of complex type cls.
+
+        The function is generated from the plan of cls with names,
+        occurrence checks and text codecs as constants. Single plain
+        values of primitive children and values of the exact declared
+        complex type are written inline, all other values by
+        `write_child`.
+    """
+    plan = _plan(cls)
+    namespace = {'write_child': write_child, 'write_value': write_value,
+                 'write_children': write_children,
+                 'escape_text': escape_text, '_scalar': _scalar}
+    lines = ['def write(writer, obj, tag):',
+             '    parts = writer.parts',
+             '    qnames = writer._qnames']
+    for i, entry in enumerate(plan):
+        name, fullname, ctype, codec, min_occurs, max_occurs, nillable = \
+            entry
+        namespace['E%d' % i] = entry
+        namespace['T%d' % i] = ctype
+        if _identifier.match(name) and not keyword.iskeyword(name):
+            lines.append('    val = obj.%s' % name)
+        else:
+            lines.append('    val = getattr(obj, %r, None)' % name)
+        single = max_occurs >= 1 and (min_occurs <= 1 or nillable)
+        if codec is not None and single:
+            text, escape = codec
+            namespace['C%d' % i] = text
+            lines.extend([
+                '    if val.__class__ in _scalar and %r in qnames:' % fullname,
+                '        qname = qnames[%r]' % fullname,
+                '        if writer._open:',
+                '            parts.append(">")',
+                '            writer._open = False',
+                '        data = C%d(T%d, val)' % (i, i),
+                '        if not data:',
+                '            parts.append("<%s />" % qname)',
+                '        else:'])
+            if escape:
+                lines.extend([
+                    '            if "&" in data or "<" in data or '
+                    '">" in data:',
+                    '                data = escape_text(data)'])
+            lines.extend([
+                '            parts.append("<%s>%s</%s>" % '
+                '(qname, data, qname))',
+                '    else:',
+                '        write_child(writer, E%d, val, tag)' % i])
+        elif codec is None and single and ctype is not xmltypes.XMLAny \
+                and is_complex(ctype):
+            lines.extend([
+                '    if val.__class__ is T%d:' % i,
+                '        writer.start(%r)' % fullname,
+                '        write_children(writer, val, %r)' % fullname,
+                '        writer.end()',
+                '    else:',
+                '        write_child(writer, E%d, val, tag)' % i])
+        else:
+            lines.append('    write_child(writer, E%d, val, tag)' % i)
+    lines.extend(['    if writer.sink is not None and '
+                  'len(parts) >= writer.chunk_size:',
+                  '        writer.flush()'])
+    exec(compile('\n'.join(lines), '<writer %s>' % cls.__name__, 'exec'),
+         namespace)
+    func = namespace['write']
+    setattr(cls, _COMPILED, func)
+    return func
+
+
+def write_child(writer, entry, val, tag):
+    """
+        Write the values of one child of a complex type.
+
+        Parameters
+        ----------
+        writer : `XMLWriter`
+        entry : tuple
+            Description of the child as made by `_plan`.
+        val : object
+            Value of the child: None, a single value or an iterable of
+            values.
+        tag : str
+            Qualified name of the parent element, for error messages.
+    """
+    name, fullname, ctype, codec, min_occurs, max_occurs, nillable = entry
+    if val is None:
+        if min_occurs > 0 and not nillable:
+            raise ValueError("Number of values for %s is less than "
+                             "min_occurs: %s" % (tag, str(val)))
+        if nillable:
+            writer.start(fullname, {XSI_NIL: 'true'})
+            writer.end()
+        return
+
+    if codec is not None and hasattr(val, 'tolist') and \
+            getattr(val, 'ndim', 1) == 1:
+        if codec[0] in _bulk:
+            write_array(writer, entry, val, tag)
+            return
+        val = val.tolist()
+    if (hasattr(val, 'read') or isinstance(val, _buffers)) and \
+            _writer_for(ctype) is write_base64:
+        values = (val, )  # a single binary value
+    elif hasattr(val, '__iter__') and val.__class__.__name__ != 'str':
+        values = val
+    else:
+        values = (val, )
+    n = 0
+    if codec is not None:
+        parts = writer.parts
+        qnames = writer._qnames
+        sink = writer.sink
+        text, escape = codec
+        qname = qnames.get(fullname)
+        for single in values:
+            n += 1
+            if n > max_occurs:
+                raise ValueError("Number of values for %s is more than "
+                                 "max_occurs: %s" % (tag, str(val)))
+            if qname is None or single.__class__ not in _plain:
+                write_value(writer, single, fullname, ctype)
+                qname = qnames.get(fullname)
+                continue
+            if writer._open:
+                parts.append('>')
+                writer._open = False
+            data = text(ctype, single)
+            if not data:
+                parts.append('<%s />' % qname)
+                continue
+            if escape and ('&' in data or '<' in data or '>' in data):
+                data = escape_text(data)
+            parts.append('<%s>%s</%s>' % (qname, data, qname))
+            if sink is not None and len(parts) >= writer.chunk_size:
+                writer.flush()
+    else:
+        for single in values:
+            n += 1
+            if n > max_occurs:
+                raise ValueError("Number of values for %s is more than "
+                                 "max_occurs: %s" % (tag, str(val)))
+            if ctype is xmltypes.XMLAny:
+                if not hasattr(single, 'to_xml'):
+                    single = ctype(single)
+                write_value(writer, single, fullname, ctype,
+                            {XSI_TYPE: '{%s}%s' % (
+                                single._namespace,
+                                single.__class__.__name__)})
+            else:
+                write_value(writer, single, fullname, ctype)
+    if n < min_occurs and not nillable:
+        raise ValueError("Number of values for %s is less than "
+                         "min_occurs: %s" % (tag, str(val)))
+
+
+def _bulk_integer(values):
+    return map(str, map(int, values))
+
+
+def _bulk_double(values):
+    return map(repr, map(float, values))
+
+
+# text conversion of a primitive type -> conversion of a list of values
+_bulk = {
+    xmltypes.encode_integer: _bulk_integer,
+    xmltypes.encode_double: _bulk_double,
+}
+
+
+def write_array(writer, entry, val, tag):
+    """
+        Write the values of a repeated numeric child given as a one
+        dimensional array.
+
+        Arrays are array.array, memoryview or NumPy arrays, anything
+        with tolist, slicing and len. The values are turned into Python
+        numbers by tolist and into text by map in blocks of chunk_size
+        values, each block is joined into one written part. The text is
+        the same as for single values.
+
+        The formatting itself is not vectorized: the shortest text that
+        reads back as the same double costs about a microsecond per value
+        in repr and in NumPy alike, so a million doubles still take about
+        a second. The gain over lists is in skipping the per value calls
+        of `write_value`, see bench/bench_array.py.
+
+        Parameters
+        ----------
+        writer : `XMLWriter`
+        entry : tuple
+            Description of the child as made by `_plan`, its codec must
+            have a bulk conversion.
+        val : object
+            The array.
+        tag : str
+            Qualified name of the parent element, for error messages.
+    """
+    name, fullname, ctype, codec, min_occurs, max_occurs, nillable = entry
+    n = len(val)
+    if n > max_occurs:
+        raise ValueError("Number of values for %s is more than "
+                         "max_occurs: %s" % (tag, str(val)))
+    if n < min_occurs and not nillable:
+        raise ValueError("Number of values for %s is less than "
+                         "min_occurs: %s" % (tag, str(val)))
+    if not n:
+        return
+    qnames = writer._qnames
+    start = 0
+    if fullname not in qnames:
+        # the first value makes the name known
+        write_value(writer, val[:1].tolist()[0], fullname, ctype)
+        start = 1
+    qname = qnames.get(fullname)
+    if qname is None:
+        # names with local declarations are not reused
+        for single in val[start:].tolist():
+            write_value(writer, single, fullname, ctype)
+        return
+    parts = writer.parts
+    if writer._open:
+        parts.append('>')
+        writer._open = False
+    convert = _bulk[codec[0]]
+    opening, closing = '<%s>' % qname, '</%s>' % qname
+    between = closing + opening
+    block = max(writer.chunk_size, 1)
+    for i in range(start, n, block):
+        parts.append(opening + between.join(
+            convert(val[i:i + block].tolist())) + closing)
+        if writer.sink is not None:
+            writer.flush()
+
+
+def write_envelope(instance, sink=None, chunk_size=4096):
+    """
+        Serialize a message instance into a SOAP envelope.
+
+        Parameters
+        ----------
+        instance : object
+            Complex type instance to put into the body, nothing if None.
+        sink : callable, optional
+            Receives the envelope in chunks of bytes. All namespaces
+            known from the type of instance are declared on the
+            envelope in advance.
+        chunk_size : int, optional
+            See `XMLWriter`.
+
+        Returns
+        -------
+        out : bytes or None
+            The envelope if no sink is given, the same as etree.tostring
+            of the tree built by to_xml.
+    """
+    writer = XMLWriter(sink, chunk_size)
+    declare = ()
+    if instance is not None:
+        cls = instance.__class__
+        if sink is not None:
+            declare = [xmlnamespace.NS_SOAP_ENV, cls._namespace]
+            declare.extend(namespaces(cls))
+    writer.start(ENVELOPE, declare=declare)
+    writer.start(BODY)
+    if instance is not None:
+        write_value(writer, instance, '{%s}%s' % (cls._namespace,
+                                                  cls.__name__))
+    writer.end()
+    writer.end()
+    if sink is None:
+        return writer.getvalue()
+    writer.flush()
+
+
+class Envelope(object):
+    """
+        Constant parts of the envelopes of a message.
+
+        The text before and after the children of the message element
+        (envelope and body start tags, namespace declarations and the
+        message element itself) is the same for every call. It is
+        computed once, so that serialization of a call only writes its
+        arguments.
+
+        To keep requests small, all namespaces known from the message
+        type are declared once on the envelope and the dominant one,
+        see `dominant_namespace`, is made the default namespace.
+
+        SOAP header blocks are serialized separately by `header`, the
+        result is inserted between the envelope and body start tags.
+
+        Parameters
+        ----------
+        message : `osa.message.Message`
+            Input message of an operation.
+    """
+    def __init__(self, message):
+        self.cls = None
+        if message.use_parts:
+            self.cls = message.use_parts[0][1]
+        self.names = {}
+        self.default = None
+        declare = [xmlnamespace.NS_SOAP_ENV]
+        if self.cls is not None:
+            self.default = dominant_namespace(self.cls)
+            declare.append(self.cls._namespace)
+            declare.extend(namespaces(self.cls))
+            declare = [ns for ns in declare if ns != self.default]
+        writer = XMLWriter(prefixes={}, names=self.names,
+                           default=self.default)
+        writer.start(ENVELOPE, declare=declare)
+        writer.parts.append('>')
+        writer._open = False
+        # envelope start tag, header blocks go after it
+        self.start = ''.join(writer.parts)
+        self._root = (writer._stack[-1][0], writer._current)
+        self.prefixes = writer.prefixes
+        writer.start(BODY)
+        if self.cls is None:
+            writer.end()
+            writer.end()
+            self.head, self.tail = ''.join(writer.parts), ''
+            self.body = self.head[len(self.start):]
+            return
+        self.tag = '{%s}%s' % (self.cls._namespace, self.cls.__name__)
+        writer.start(self.tag)
+        writer.parts.append('>')
+        self.head = ''.join(writer.parts)
+        # body and message start tags
+        self.body = self.head[len(self.start):]
+        self.tail = ''.join('</%s>' % entry[0]
+                            for entry in writer._stack[::-1])
+        self._wrapper = (writer._stack[-1][0], writer._current)
+
+    def header(self, blocks):
+        """
+            Serialize SOAP header blocks for envelopes of this message.
+
+            Parameters
+            ----------
+            blocks : list
+                Complex type instances, written as elements named after
+                their type like message instances, or etree elements.
+
+            Returns
+            -------
+            out : str
+                Header element to pass to `serialize`, empty if there
+                are no blocks.
+        """
+        if not blocks:
+            return ''
+        writer = XMLWriter(None, 4096, self.prefixes, self.names,
+                           self.default)
+        writer.resume(*self._root)
+        writer.start(HEADER)
+        for block in blocks:
+            if etree.iselement(block):
+                writer.element(block)
+            else:
+                cls = block.__class__
+                write_value(writer, block,
+                            '{%s}%s' % (cls._namespace, cls.__name__))
+        writer.end()
+        return ''.join(writer.parts)
+
+    def serialize(self, instance, sink=None, chunk_size=4096, header='',
+                  attachments=None):
+        """
+            Serialize a message instance.
+
+            Parameters
+            ----------
+            instance : object
+                Instance of the message type or None.
+            sink : callable, optional
+                Receives the envelope in chunks of bytes.
+            chunk_size : int, optional
+                See `XMLWriter`.
+            header : str, optional
+                SOAP header made by `header`.
+            attachments : list, optional
+                If given, base64Binary values are appended to it as
+                MTOM attachments instead of being written as text, see
+                `osa.mtom`.
+
+            Returns
+            -------
+            out : bytes or None
+                The envelope if no sink is given.
+        """
+        writer = XMLWriter(sink, chunk_size, self.prefixes, self.names,
+                           self.default)
+        writer.attachments = attachments
+        parts = writer.parts
+        if header:
+            parts.append(self.start)
+            parts.append(header)
+            parts.append(self.body)
+        else:
+            parts.append(self.head)
+        if instance is not None and instance.__class__ is not self.cls:
+            # derived type, only the envelope start tag is constant
+            del parts[:]
+            parts.append(self.start)
+            parts.append(header)
+            writer.resume(*self._root)
+            writer.start(BODY)
+            cls = instance.__class__
+            write_value(writer, instance,
+                        '{%s}%s' % (cls._namespace, cls.__name__))
+            writer.end()
+            writer.end()
+        else:
+            if instance is not None:
+                # continue inside the message element
+                writer.resume(*self._wrapper)
+                write_children(writer, instance, self.tag)
+            parts.append(self.tail)
+        if sink is None:
+            return writer.getvalue()
+        writer.flush()
+
+    def template(self, fixed):
+        """
+            Serialize the children with fixed values in advance.
+
+            Parameters
+            ----------
+            fixed : dict
+                Values of message children by name, the same for every
+                call.
+
+            Returns
+            -------
+            out : `Template`
+        """
+        return Template(self, fixed)
+
+
+class Template(object):
+    """
+        Envelope of a message with some children fixed.
+
+        The children with fixed values are serialized once together
+        with the constant envelope parts. The remaining children are
+        slots, only they are written for every call, by the same code
+        as in `Envelope.serialize`, so that the result is byte equal to
+        serialization of the full instance.
+
+        Parameters
+        ----------
+        envelope : `Envelope`
+            Envelope of the message.
+        fixed : dict
+            Values of message children by name.
+    """
+    def __init__(self, envelope, fixed):
+        cls = envelope.cls
+        self.envelope = envelope
+        plan = []
+        if cls is not None:
+            plan = _plan(cls)
+        unknown = set(fixed) - set(entry[0] for entry in plan)
+        if unknown:
+            raise TypeError("Unknown message children: %s" %
+                            ', '.join(sorted(unknown)))
+        self.slots = []  # plan entries of the variable children
+        # constant text before every slot and after the last one, the
+        # envelope start tag and header are not included
+        self.texts = []
+        writer = XMLWriter(None, 4096, envelope.prefixes, envelope.names,
+                           envelope.default)
+        writer.parts.append(envelope.body)
+        if cls is not None:
+            writer.resume(*envelope._wrapper)
+        for entry in plan:
+            if entry[0] in fixed:
+                write_child(writer, entry, fixed[entry[0]], envelope.tag)
+            else:
+                self.texts.append(''.join(writer.parts))
+                del writer.parts[:]
+                self.slots.append(entry)
+        writer.parts.append(envelope.tail)
+        self.texts.append(''.join(writer.parts))
+        self.variables = [entry[0] for entry in self.slots]
+
+    def serialize(self, *arg, **kw):
+        """
+            Serialize a call with the values of the variable children.
+
+            Values are given positionally in the order of the children
+            or by name, as for `osa.message.Message.wrap`. The keyword
+            arguments _sink, _chunk_size, _header and _attachments are
+            used as sink, chunk_size, header and attachments in
+            `Envelope.serialize`. Fixed values are always written as
+            text.
+
+            Returns
+            -------
+            out : bytes or None
+                The envelope if no sink is given.
+        """
+        sink = kw.pop('_sink', None)
+        chunk_size = kw.pop('_chunk_size', 4096)
+        header = kw.pop('_header', '')
+        attachments = kw.pop('_attachments', None)
+        unknown = set(kw) - set(self.variables)
+        if unknown:
+            raise TypeError("Unknown or fixed message children: %s" %
+                            ', '.join(sorted(unknown)))
+        envelope = self.envelope
+        writer = XMLWriter(sink, chunk_size, envelope.prefixes,
+                           envelope.names, envelope.default)
+        writer.attachments = attachments
+        parts = writer.parts
+        parts.append(envelope.start)
+        if header:
+            parts.append(header)
+        texts = self.texts
+        if self.slots:
+            writer.resume(*envelope._wrapper)
+        counter = 0
+        for i, entry in enumerate(self.slots):
+            parts.append(texts[i])
+            val = kw.get(entry[0])
+            if val is None and counter < len(arg):
+                val = arg[counter]
+                counter += 1
+            write_child(writer, entry, val, envelope.tag)
+        parts.append(texts[-1])
+        if sink is None:
+            return writer.getvalue()
+        writer.flush()
@@ -0,0 +1,397 @@
+# transport.py - transports for SOAP messages, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+"""
+    Transports deliver serialized SOAP envelopes to the service.
+
+    A transport has a single obligatory method send(location, data, action),
+    which posts the envelope bytes and returns the response as a
+    file-like object. The response must have the HTTP status code in its
+    code attribute and must be closed after reading.
+
+    Instead of bytes data can be a body producer: a callable which is
+    called with a write function and passes the envelope to it in
+    chunks of bytes. Transports which cannot stream collect the chunks
+    by `body_bytes`.
+"""
+from .pool import ConnectionPool
+from io import BytesIO
+import zlib
+import sys
+if sys.version_info[0] < 3:
+    import urllib2 as urllib_request
+    from urllib import getproxies
+    from urllib2 import urlopen, Request, HTTPError
+else:
+    import urllib.request as urllib_request
+    from urllib.request import urlopen, Request, HTTPError, getproxies
+
+
+def body_bytes(data):
+    """
+        Request body as bytes, collecting the chunks of a body producer.
+    """
+    if callable(data):
+        parts = []
+        data(parts.append)
+        return b''.join(parts)
+    return data
+
+
+def uses_urlopen_setup():
+    """
+        Check if urlopen is configured not to connect directly.
+
+        This is the case if a proxy is set, e.g. by the http_proxy or
+        https_proxy environment variables, or if an opener was installed
+        by install_opener. `HTTPTransport` connects directly and would
+        ignore both.
+    """
+    proxies = getproxies()
+    if proxies.get('http') or proxies.get('https'):
+        return True
+    # urlopen installs a default opener on first use, look for handlers
+    # it would not have
+    opener = getattr(urllib_request, '_opener', None)
+    if opener is None:
+        return False
+    default = set(type(h) for h in urllib_request.build_opener().handlers)
+    for handler in opener.handlers:
+        if type(handler) not in default:
+            return True
+        if isinstance(handler, urllib_request.ProxyHandler) and \
+                handler.proxies != proxies:
+            return True
+    return False
+
+
+class BufferedResponse(BytesIO):
+    """
+        Response fully held in memory.
+
+        Parameters
+        ----------
+        code : int
+            HTTP status code.
+        data : bytes
+            Response body.
+    """
+    def __init__(self, code, data):
+        BytesIO.__init__(self, data)
+        self.code = code
+
+
+class CallStats(object):
+    """
+        Sizes of a single request/response exchange in bytes.
+
+        The wire sizes are those sent over the network, i.e. after
+        compression. Response sizes are final only after the response
+        was read completely.
+    """
+    def __init__(self, request_size=0, request_wire_size=0):
+        self.request_size = request_size
+        self.request_wire_size = request_wire_size
+        self.response_size = 0
+        self.response_wire_size = 0
+
+    @staticmethod
+    def _ratio(size, wire_size):
+        if not wire_size:
+            return 1.0
+        return float(size) / wire_size
+
+    @property
+    def request_ratio(self):
+        """
+            Compression ratio of the request, 1 if not compressed.
+        """
+        return self._ratio(self.request_size, self.request_wire_size)
+
+    @property
+    def response_ratio(self):
+        """
+            Compression ratio of the response, 1 if not compressed.
+        """
+        return self._ratio(self.response_size, self.response_wire_size)
+
+    def __repr__(self):
+        return ('CallStats(request %d/%d bytes, response %d/%d bytes)' %
+                (self.request_size, self.request_wire_size,
+                 self.response_size, self.response_wire_size))
+
+
+class DecodedResponse(object):
+    """
+        File-like response decompressed on the fly.
+
+        The content is decompressed while being read, so that the parser
+        never sees the complete compressed or decompressed body. Sizes
+        are counted in stats.
+
+        Parameters
+        ----------
+        response : file-like object
+            Raw response with the code attribute.
+        encoding : str
+            Value of Content-Encoding header: gzip, deflate or identity.
+        stats : `CallStats`
+            Statistics to update.
+    """
+    chunk_size = 16384
+
+    def __init__(self, response, encoding, stats):
+        self.code = response.code
+        self.stats = stats
+        self._raw = response
+        self._pending = b''
+        self._buffer = b''
+        self._eof = False
+        encoding = (encoding or 'identity').strip().lower()
+        if encoding in ('gzip', 'x-gzip'):
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self._decompressor = zlib.decompressobj()
+        elif encoding == 'identity':
+            self._decompressor = None
+        else:
+            raise RuntimeError("Unsupported Content-Encoding: %s" % encoding)
+        self._first = True
+
+    def _decompress(self, data, size):
+        try:
+            return self._decompressor.decompress(data, size)
+        except zlib.error:
+            if not self._first:
+                raise
+            # some servers send raw deflate stream without zlib header
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(data, size)
+        finally:
+            self._first = False
+
+    def _read_raw(self, size):
+        if size < 0:
+            data = self._raw.read()
+        else:
+            data = self._raw.read(size)
+        if data:
+            self.stats.response_wire_size += len(data)
+        else:
+            self._eof = True
+        return data
+
+    def _inflate(self, size):
+        """
+            Decompress at most size bytes, all if size is negative.
+
+            Compressed input not needed yet is kept as unconsumed tail of
+            the decompressor, so that no decompressed data is buffered.
+        """
+        parts = []
+        n = 0
+        while size < 0 or n < size:
+            if self._buffer:
+                # output of the final flush
+                if size < 0:
+                    data = self._buffer
+                else:
+                    data = self._buffer[:size - n]
+                self._buffer = self._buffer[len(data):]
+            elif self._pending:
+                data = self._decompress(self._pending, max(size - n, 0))
+                self._pending = self._decompressor.unconsumed_tail
+            elif self._eof:
+                break
+            else:
+                self._pending = self._read_raw(self.chunk_size)
+                if not self._pending:
+                    self._buffer = self._decompressor.flush()
+                continue
+            parts.append(data)
+            n += len(data)
+        return b''.join(parts)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = -1
+        if self._decompressor is not None:
+            data = self._inflate(size)
+        elif self._eof:
+            data = b''
+        else:
+            data = self._read_raw(size)
+        self.stats.response_size += len(data)
+        return data
+
+    def close(self):
+        self._raw.close()
+
+
+class Transport(object):
+    """
+        Base class of transports.
+    """
+    def headers(self, action):
+        """
+            Default HTTP headers of a SOAP 1.1 request.
+        """
+        return {'Content-Type': 'text/xml; charset=utf-8',
+                'SOAPAction': action}
+
+    def send(self, location, data, action, headers=None):
+        """
+            Send a message.
+
+            Parameters
+            ----------
+            location : str
+                Service address.
+            data : bytes or callable
+                Serialized envelope or body producer.
+            action : str
+                Soap action string.
+            headers : dict, optional
+                Request headers prepared in advance by `headers`.
+
+            Returns
+            -------
+            out : file-like object
+                Response with the HTTP status in the code attribute.
+        """
+        raise NotImplementedError("%s does not implement send" %
+                                  self.__class__.__name__)
+
+    def close(self):
+        """
+            Release resources held by the transport.
+        """
+        pass
+
+
+class UrllibTransport(Transport):
+    """
+        Opens a new connection by urlopen for every message.
+    """
+    def send(self, location, data, action, headers=None):
+        data = body_bytes(data)
+        if headers is None:
+            headers = self.headers(action)
+        try:
+            return urlopen(Request(location, data, headers))
+        except HTTPError as e:
+            if e.code == 500:
+                return e  # has the fault in its body
+            raise
+
+
+class HTTPTransport(Transport):
+    """
+        Sends messages over persistent connections of a pool.
+
+        Compressed responses are negotiated by Accept-Encoding and
+        decompressed while being parsed. Requests can be gzipped as well,
+        but this must be supported by the service. Sizes of every
+        exchange are returned in stats attribute of the response.
+
+        Parameters
+        ----------
+        pool : `osa.pool.ConnectionPool`, optional
+            Pool to use, a new one with default settings if None.
+        accept_encoding : str, optional - default 'gzip, deflate'
+            Value of Accept-Encoding header, None to ask for
+            uncompressed responses.
+        compress_threshold : int, optional - default None
+            Requests of this size or larger (in bytes) are gzipped.
+            None switches request compression off.
+        compress_level : int, optional - default 6
+            zlib compression level for requests.
+
+        Body producers are sent with chunked transfer encoding while the
+        envelope is being serialized. As their size is not known in
+        advance, they are gzipped whenever compress_threshold is set.
+
+        Connections are made directly, proxies and openers of urlopen
+        are not used, see `uses_urlopen_setup`.
+    """
+    def __init__(self, pool=None, accept_encoding='gzip, deflate',
+                 compress_threshold=None, compress_level=6):
+        if pool is None:
+            pool = ConnectionPool()
+        self.pool = pool
+        self.accept_encoding = accept_encoding
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+
+    def send(self, location, data, action, headers=None):
+        if headers is None:
+            headers = self.headers(action)
+        else:
+            headers = dict(headers)
+        if self.accept_encoding:
+            headers['Accept-Encoding'] = self.accept_encoding
+        if callable(data):
+            stats = CallStats()
+            data = self._stream(data, headers, stats)
+        else:
+            stats = CallStats(len(data), len(data))
+            if self.compress_threshold is not None and \
+                    len(data) >= self.compress_threshold:
+                compressor = zlib.compressobj(self.compress_level,
+                                              zlib.DEFLATED,
+                                              16 + zlib.MAX_WBITS)
+                data = compressor.compress(data) + compressor.flush()
+                headers['Content-Encoding'] = 'gzip'
+                stats.request_wire_size = len(data)
+        response = self.pool.request(location, data, headers)
+        return DecodedResponse(response,
+                               response.getheader('Content-Encoding'), stats)
+
+    def _stream(self, produce, headers, stats):
+        """
+            Wrap a body producer to count and possibly gzip its chunks.
+        """
+        compressor = None
+        if self.compress_threshold is not None:
+            compressor = zlib.compressobj(self.compress_level, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            headers['Content-Encoding'] = 'gzip'
+
+        def producer(write):
+            def counted(chunk):
+                stats.request_size += len(chunk)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                stats.request_wire_size += len(chunk)
+                write(chunk)
+            produce(counted)
+            if compressor is not None:
+                chunk = compressor.flush()
+                stats.request_wire_size += len(chunk)
+                write(chunk)
+        return producer
+
+    def close(self):
+        self.pool.clear()
+
+
+class MemoryTransport(Transport):
+    """
+        Delivers messages to a Python callable instead of the network.
+
+        Useful for tests and for benchmarking serialization without
+        network costs.
+
+        Parameters
+        ----------
+        handler : callable
+            Called as handler(location, data, action), must return
+            (HTTP code, response bytes).
+    """
+    def __init__(self, handler):
+        self.handler = handler
+
+    def send(self, location, data, action, headers=None):
+        code, data = self.handler(location, body_bytes(data), action)
+        return BufferedResponse(code, data)
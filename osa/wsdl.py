@@ -245,6 +245,7 @@ class WSDLParser(object):
                                     break
                 # rebuild __doc__ after messing with messages
                 ops[op_name]._redoc()
+                ops[op_name].input.compile()
 
                 if all_literal:
                     ops[op_name].action = s_action
@@ -256,7 +257,10 @@ class WSDLParser(object):
             Find all services an make final list of
             operations.
 
-            This also sets location to all operations.
+            This also sets location to all operations. If a binding
+            is available at several ports, all addresses are kept
+            in the locations list of its operations and location is
+            the first of them.
 
             Parameters
             ----------
@@ -281,7 +285,9 @@ class WSDLParser(object):
                 loc = xaddr[0].get("location", "")
                 if b in bindings:
                     for k, v in bindings[b].items():
-                        v.location = loc
+                        if loc not in v.locations:
+                            v.locations.append(loc)
+                        v.location = v.locations[0]
                     services[s_name] = bindings[b]
         return services
 
@@ -5,6 +5,7 @@
 """
     Help functions for dealing with xml.
 """
+from . import xmlnamespace
 import xml.etree.cElementTree as etree
 import sys
 if sys.version_info[0] < 3:
@@ -13,6 +14,9 @@ else:
     from urllib.request import urlopen, HTTPError
 
 default_attr = ["type", "base", "element", "message", "binding", "ref"]
+XSI_TYPE = '{%s}type' % xmlnamespace.NS_XSI
+# bytes read at once by parse_response
+CHUNK_SIZE = 65536
 
 
 def parse_qualified(f, attr=None):
@@ -72,6 +76,137 @@ def parse_qualified(f, attr=None):
     return root
 
 
+def qualify(value, bindings):
+    """
+        Qualified name {namespace}local of a prefixed value.
+
+        Parameters
+        ----------
+        value : str
+            Value like prefix:local or local.
+        bindings : dict
+            Map prefix -> namespace of the prefixes in scope, the
+            default namespace under the empty prefix.
+
+        Returns
+        -------
+        out : str
+            The qualified name, value as it is if the prefix is unknown.
+    """
+    if value[:1] == '{':
+        return value
+    prefix, sep, local = value.rpartition(':')
+    ns = bindings.get(prefix)
+    if not ns:
+        return value
+    return '{%s}%s' % (ns, local)
+
+
+def _qualify_types(events, bindings, saved, names):
+    """
+        Qualify xsi:type values of started elements by the namespace
+        events before them, see `parse_response`.
+    """
+    for event, value in events:
+        if event == "start":
+            xsi_type = value.get(XSI_TYPE)
+            if xsi_type is not None:
+                name = names.get(xsi_type)
+                if name is None:
+                    name = names[xsi_type] = qualify(xsi_type, bindings)
+                value.set(XSI_TYPE, name)
+        elif event == "start-ns":
+            names.clear()
+            saved.append((value[0], bindings.get(value[0])))
+            bindings[value[0]] = value[1]
+        else:
+            names.clear()
+            prefix, ns = saved.pop()
+            if ns is None:
+                del bindings[prefix]
+            else:
+                bindings[prefix] = ns
+
+
+def parse_response(f):
+    """
+        Parse a SOAP response.
+
+        The document is built by the C parser without Python work per
+        element. Only values of xsi:type attributes are qualified as
+        {namespace}local, this is what `osa.xmltypes.XMLAny` needs.
+        Elements are looked at only after ':type' was seen in the input,
+        so that large responses without xsi:type are parsed at full
+        speed. Prefixes are tracked by the namespace events of the
+        parser, which are few. Switching the events on the fly needs
+        a private method of the parser, if it is missing the response
+        is parsed by `_parse_response_pull` instead.
+
+        Parameters
+        ----------
+        f : file-like object
+            Response, read in chunks.
+
+        Returns
+        -------
+        root : xml node
+            Root of the document.
+    """
+    parser = etree.XMLParser()
+    if not hasattr(parser, '_setevents'):
+        return _parse_response_pull(f)
+    events = []
+    parser._setevents(events, ("start-ns", "end-ns"))
+    bindings = {}  # prefix -> namespace in scope
+    saved = []  # stack of (prefix, previous namespace)
+    names = {}  # xsi:type value -> qualified name for current bindings
+    typed = False  # ':type' seen, elements are reported
+    tail = b''
+    while True:
+        data = f.read(CHUNK_SIZE)
+        if data and not typed:
+            text = tail + data
+            if b':type' in text:
+                typed = True
+                parser._setevents(events, ("start-ns", "end-ns", "start"))
+            tail = text[-4:]
+        if data:
+            parser.feed(data)
+        else:
+            root = parser.close()
+        _qualify_types(events, bindings, saved, names)
+        del events[:]
+        if not data:
+            return root
+
+
+def _parse_response_pull(f):
+    """
+        The same as `parse_response` by the public etree.XMLPullParser,
+        which reports every element, Python 3.4 or newer.
+    """
+    parser = etree.XMLPullParser(("start", "start-ns", "end-ns"))
+    bindings = {}
+    saved = []
+    names = {}
+    root = None
+    while True:
+        data = f.read(CHUNK_SIZE)
+        if data:
+            parser.feed(data)
+        else:
+            parser.close()
+        events = list(parser.read_events())
+        if root is None:
+            for event, value in events:
+                if event == "start":
+                    root = value
+                    break
+        _qualify_types(events, bindings, saved, names)
+        if not data:
+            return root
+
+
 def parse_qualified_from_url(url, attr=None, wsdl_url=None):
     """
         The same as `parse_qualified`, but xml is given by its url.
@@ -11,6 +11,7 @@ from datetime import date, datetime, timedelta
 import xml.etree.cElementTree as etree
 import base64
 import sys
+import weakref
 if sys.version_info[0] > 2:
     unicode = str
 
@@ -170,6 +171,8 @@ class XMLType(object):
             # do constraints checking
             n = 0  # number of values for constraints checking
             if hasattr(val, "__iter__") and val.__class__.__name__ != "str":
+                if not hasattr(val, "__len__"):
+                    val = list(val)  # iterator or generator
                 n = len(val)
             elif val is not None:
                 n = 1
@@ -194,9 +197,15 @@ class XMLType(object):
                 if n == 0:
                     continue  # only nillables can get so far
 
-                # conversion
+                # conversion, plain values of primitive types
+                # without instances
+                codec = get_codec(child['type'])
                 for single in val:
                     if not(hasattr(single, "to_xml")):
+                        if codec is not None:
+                            etree.SubElement(element, full_child_name).text = \
+                                codec[0](child['type'], single)
+                            continue
                         single = child['type'](single)
                     single.to_xml(element, full_child_name)
                     if child["type"] is XMLAny:
@@ -243,18 +252,25 @@ class XMLType(object):
             name = name[name.find("}")+1:]
             ind = all_children_names.index(name)
 
-            # used for conversion. for primitive types we receive back built-ins
-            inst = self._children[ind]['type']()
-            # we do not distinguish xs:nil="true" explicitly here, this will have
-            # empty text in any case, this is not strict standard, but ...
-
             attrs = {}
-            if hasattr(inst, '_attributes') and inst._attributes:
-                for attr_name, attr_type in inst._attributes.iteritems():
-                    pseudo_element = AttributeWrapper(subel.get(attr_name))
-                    attrs[attr_name] = attr_type().from_xml(pseudo_element)
+            child_type = self._children[ind]['type']
+            codec = get_codec(child_type)
+            if codec is not None:
+                # primitive types are converted without instances
+                subvalue = codec[1](child_type, subel)
+            else:
+                # used for conversion
+                inst = child_type()
+                # we do not distinguish xs:nil="true" explicitly here, this will have
+                # empty text in any case, this is not strict standard, but ...
 
-            subvalue = inst.from_xml(subel)
+                if hasattr(inst, '_attributes') and inst._attributes:
+                    for attr_name, attr_type in inst._attributes.items():
+                        pseudo_element = AttributeWrapper(subel.get(attr_name))
+                        attrs[attr_name] = attr_type().from_xml(pseudo_element)
+
+                subvalue = inst.from_xml(subel)
+                del inst
 
             # removed for bug 7
             #if subvalue is None:
@@ -277,7 +293,7 @@ class XMLType(object):
                 setattr(self, name, subvalue)
                 if attrs:
                     setattr(subvalue, name + '__attrs', attrs)
-            del name, ind, inst
+            del name, ind
 
         # now all children were processed, so remove them to save memory
         element.clear()
@@ -425,67 +441,49 @@ class XMLString(XMLType, unicode):
 
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        element.text = unicode(self)
+        element.text = encode_string(self.__class__, self)
 
     def from_xml(self, element):
-        if element.text:
-            return element.text
-        else:
-            return ""
+        return decode_string(self.__class__, element)
 
 
 class XMLBase64Binary(XMLType, str):
 
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        element.text = base64.b64encode(self)
+        element.text = encode_base64(self.__class__, self)
 
     def from_xml(self, element):
-        if element.text:
-            return base64.b64decode(element.text)
-        else:
-            return ""
+        return decode_base64(self.__class__, element)
 
 
 class XMLInteger(XMLType, int):
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        element.text = repr(self)
+        element.text = encode_integer(self.__class__, self)
 
     def from_xml(self, element):
-        if element.text:
-            try:
-                return int(element.text)
-            except:
-                return long(element.text)
-        return 0
+        return decode_integer(self.__class__, element)
 
 
 class XMLDouble(XMLType, float):
 
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        element.text = repr(self)
+        element.text = encode_double(self.__class__, self)
 
     def from_xml(self, element):
-        if element.text:
-            return float(element.text)
-        return 0
+        return decode_double(self.__class__, element)
 
 
 class XMLBoolean(XMLType, str):
 
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        if self in ('True', 'true', '1'):
-            element.text = repr(True).lower()
-        else:
-            element.text = repr(False).lower()
+        element.text = encode_boolean(self.__class__, self)
 
     def from_xml(cls, element):
-        if element.text:
-            return (element.text.lower() in ['true', '1'])
-        return False
+        return decode_boolean(cls.__class__, element)
 
 
 class XMLAny(XMLType, str):
@@ -514,12 +512,10 @@ class XMLDecimal(XMLType, Decimal):
 
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        element.text = str(self)
+        element.text = encode_decimal(self.__class__, self)
 
     def from_xml(self, element):
-        if element.text:
-            return Decimal(element.text)
-        return Decimal(0)
+        return decode_decimal(self.__class__, element)
 
 
 class XMLDate(XMLType):
@@ -532,19 +528,11 @@ class XMLDate(XMLType):
 
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        element.text = self.value.isoformat()
+        element.text = encode_date(self.__class__, self)
 
     def from_xml(self, element):
         """expect ISO formatted dates"""
-        if not(element.text):
-            return date(1970, 1, 1)
-        text = element.text
-        y, m, d = text.split("-")[:3]
-        y = int(y)
-        m = int(m)
-        d = int(d[:2])
-        # ignore time zone information here
-        return  date(y, m, d)
+        return decode_date(self.__class__, element)
 
 
 class XMLDateTime(XMLType):
@@ -557,42 +545,11 @@ class XMLDateTime(XMLType):
 
     def to_xml(self, parent, name):
         element = etree.SubElement(parent, name)
-        element.text = self.value.isoformat('T')
+        element.text = encode_datetime(self.__class__, self)
 
     def from_xml(self, element):
-        if not(element.text):
-            return datetime(1970, 1, 1)
-        text = element.text
-        # this way looks a bit slow, please complain if you need
-        datestr, timestr = text.split("T",1)
-        year, month, day = datestr.split("-")
-        year = int(year)
-        month = int(month)
-        day = int(day)
-        hour, minute, second = timestr.split(":", 2)
-        hour = int(hour)
-        minute = int(minute)
-        rest = second[2:]
-        second = int(second[:2])
-        fraction = 0
-        if rest and rest[0] == ".":
-            # fraction of second
-            pos = len(rest)
-            for i in range(1,len(rest)):
-                if not rest[i].isdigit():
-                    pos = i
-                    break
-            fraction = int(float(rest[:pos])*1e6)
-            rest = rest[pos:]
-        value = datetime(year, month, day, hour, minute, second, fraction)
-        # time zone to UTC
-        if rest and (rest[0] == "+" or rest[0] == "-"):
-            zh, zm = rest.split(":",1)
-            zh = int(zh)
-            zm = int(rest[0]+zm[:2]) # add sign to minutes
-            delta = timedelta(hours = zh, minutes = zm)
-            value = value - delta
-        return value
+        return decode_datetime(self.__class__, element)
+
 
 class XMLStringEnumeration(XMLType):
     _allowedValues = []
@@ -606,18 +563,172 @@ class XMLStringEnumeration(XMLType):
     def to_xml(self, parent, name):
         # putting this check here is a hack, to allow the complex type conversion to work properly here, since
         # it creates an instance
-        if self.value not in self._allowedValues:
-            raise ValueError("Not allowed value for this enumeration: value = %s" % (self.value))
+        text = encode_enumeration(self.__class__, self)
         element = etree.SubElement(parent, name)
-        element.text = unicode(self.value)
+        element.text = text
 
     def from_xml(self, element):
-        val = ""
-        if element.text:
-            val = element.text
-        if val not in self._allowedValues:
-            raise ValueError("Not allowed value for this enumeration: value = %s" % (val))
-        return val
+        return decode_enumeration(self.__class__, element)
+
+
+# stateless conversion of primitive values, the same for plain Python
+# values as for instances of the primitive types, so that no instances
+# have to be created
+def encode_string(cls, value):
+    return unicode(value)
+
+
+def decode_string(cls, element):
+    if element.text:
+        return element.text
+    else:
+        return ""
+
+
+def encode_base64(cls, value):
+    if not isinstance(value, bytes):
+        value = str(value)
+    data = base64.b64encode(value)
+    if not isinstance(data, str):
+        data = data.decode('ascii')
+    return data
+
+
+def decode_base64(cls, element):
+    text = element.text
+    if text is not None and not isinstance(text, (str, unicode)):
+        # MTOM attachment or size of a value written to a sink, see
+        # osa.mtom and osa.download
+        return text
+    if text:
+        return base64.b64decode(text)
+    else:
+        return ""
+
+
+def encode_integer(cls, value):
+    return str(int(value))
+
+
+def decode_integer(cls, element):
+    if element.text:
+        return int(element.text)
+    return 0
+
+
+def encode_double(cls, value):
+    return repr(float(value))
+
+
+def decode_double(cls, element):
+    if element.text:
+        return float(element.text)
+    return 0
+
+
+def encode_boolean(cls, value):
+    if str(value) in ('True', 'true', '1'):
+        return 'true'
+    return 'false'
+
+
+def decode_boolean(cls, element):
+    if element.text:
+        return (element.text.lower() in ['true', '1'])
+    return False
+
+
+def encode_decimal(cls, value):
+    return str(Decimal(value))
+
+
+def decode_decimal(cls, element):
+    if element.text:
+        return Decimal(element.text)
+    return Decimal(0)
+
+
+def encode_date(cls, value):
+    if isinstance(value, XMLDate):
+        value = value.value
+    elif not isinstance(value, date):
+        value = date(2008, 11, 11)
+    return value.isoformat()
+
+
+def decode_date(cls, element):
+    if not(element.text):
+        return date(1970, 1, 1)
+    text = element.text
+    y, m, d = text.split("-")[:3]
+    y = int(y)
+    m = int(m)
+    d = int(d[:2])
+    # ignore time zone information here
+    return date(y, m, d)
+
+
+def encode_datetime(cls, value):
+    if isinstance(value, XMLDateTime):
+        value = value.value
+    elif not isinstance(value, datetime):
+        value = datetime(2008, 11, 11)
+    return value.isoformat('T')
+
+
+def decode_datetime(cls, element):
+    if not(element.text):
+        return datetime(1970, 1, 1)
+    text = element.text
+    # this way looks a bit slow, please complain if you need
+    datestr, timestr = text.split("T", 1)
+    year, month, day = datestr.split("-")
+    year = int(year)
+    month = int(month)
+    day = int(day)
+    hour, minute, second = timestr.split(":", 2)
+    hour = int(hour)
+    minute = int(minute)
+    rest = second[2:]
+    second = int(second[:2])
+    fraction = 0
+    if rest and rest[0] == ".":
+        # fraction of second
+        pos = len(rest)
+        for i in range(1, len(rest)):
+            if not rest[i].isdigit():
+                pos = i
+                break
+        fraction = int(float(rest[:pos])*1e6)
+        rest = rest[pos:]
+    value = datetime(year, month, day, hour, minute, second, fraction)
+    # time zone to UTC
+    if rest and (rest[0] == "+" or rest[0] == "-"):
+        zh, zm = rest.split(":", 1)
+        zh = int(zh)
+        zm = int(rest[0]+zm[:2])  # add sign to minutes
+        delta = timedelta(hours=zh, minutes=zm)
+        value = value - delta
+    return value
+
+
+def encode_enumeration(cls, value):
+    if isinstance(value, XMLStringEnumeration):
+        cls, value = value.__class__, value.value
+    else:
+        value = str(value)
+    if value not in cls._allowedValues:
+        raise ValueError("Not allowed value for this enumeration: value = %s" % (value))
+    return unicode(value)
+
+
+def decode_enumeration(cls, element):
+    val = ""
+    if element.text:
+        val = element.text
+    if val not in cls._allowedValues:
+        raise ValueError("Not allowed value for this enumeration: value = %s" % (val))
+    return val
 
 # a map of primitive types
 primmap = {
@@ -670,3 +781,73 @@ primmap = {
     'duration':                                 XMLString,
     '{%s}duration' % xmlnamespace.NS_XSD:        XMLString}
 XMLAny._types = primmap.copy()
+
+# primitive type -> (encode, decode, text may need escaping), see
+# get_codec
+codecs = {
+    XMLString: (encode_string, decode_string, True),
+    XMLBase64Binary: (encode_base64, decode_base64, False),
+    XMLInteger: (encode_integer, decode_integer, False),
+    XMLDouble: (encode_double, decode_double, False),
+    XMLBoolean: (encode_boolean, decode_boolean, False),
+    XMLDecimal: (encode_decimal, decode_decimal, False),
+    XMLDate: (encode_date, decode_date, False),
+    XMLDateTime: (encode_datetime, decode_datetime, False),
+    XMLStringEnumeration: (encode_enumeration, decode_enumeration, True),
+}
+# weak, so that generated types can be freed
+_codec_cache = weakref.WeakKeyDictionary()
+
+
+def _func(method):
+    return getattr(method, '__func__', method)
+
+
+def get_codec(cls):
+    """
+        Stateless conversion functions of a primitive type.
+
+        The primitive types of primmap and all classes derived from them
+        without own to_xml and from_xml, e.g. aliases made by
+        `osa.xmlschema.XMLSchemaParser.create_alias` and enumerations,
+        share the functions of their base.
+
+        Parameters
+        ----------
+        cls : class
+            Type of an element.
+
+        Returns
+        -------
+        out : tuple or None
+            (encode, decode, escape): encode(cls, value) gives the text
+            written by to_xml of cls(value), decode(cls, element) gives
+            the value returned by from_xml, escape is False if the text
+            never needs XML escaping. None if cls is not a primitive
+            type with known conversion or has attributes, e.g. a type
+            of simpleContent extension.
+    """
+    try:
+        return _codec_cache[cls]
+    except KeyError:
+        pass
+    except TypeError:  # unhashable
+        return None
+    codec = None
+    if getattr(cls, '_attributes', None):
+        # attributes are decoded by the parent, see XMLType.from_xml
+        bases = ()
+    else:
+        bases = getattr(cls, '__mro__', ())
+    for base in bases:
+        if base in codecs:
+            if _func(cls.to_xml) is _func(base.to_xml) and \
+                    _func(cls.from_xml) is _func(base.from_xml):
+                codec = codecs[base]
+            break
+    try:
+        _codec_cache[cls] = codec
+    except TypeError:  # no weak reference possible
+        pass
+    return codec
+
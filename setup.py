@@ -25,6 +25,7 @@ setup(
     url="https://bitbucket.org/sboz/osa",
     download_url="https://bitbucket.org/sboz/osa/get/v0.1.6-p6.tar.gz",
     packages=["osa",],
+    extras_require={"http2": ["h2"]},
     license="LGPLv3",
     classifiers=CLASSIFIERS,
     )
@@ -4,7 +4,11 @@
 # Licensed under LGPLv3 or later, see the COPYING file.
 
 import unittest
+import threading
+import socket
+import ssl
 import os
+import sys
 
 test_dir = os.path.abspath(os.path.dirname(__file__))
 path_join = lambda f: os.path.join(test_dir, f)
@@ -14,8 +18,226 @@ class BaseTest(unittest.TestCase):
 
     test_files = {
         'test.wsdl': path_join('test.wsdl'),
+        'ports.wsdl': path_join('ports.wsdl'),
         'test.xml': path_join('test.xml'),
         'schema.xml': path_join('schema.xml'),
         'schema2.xml': path_join('schema2.xml'),
         'schema3.xml': path_join('schema3.xml'),
+        'tls.pem': path_join('tls.pem'),
     }
+
+
+if sys.version_info[0] < 3:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+else:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+ns_hello = "de.mpg.ipp.hgw.boz.gsoap.helloworld"
+soap_response = ('<?xml version="1.0" encoding="UTF-8"?>'
+                 '<SOAP-ENV:Envelope xmlns:SOAP-ENV='
+                 '"http://schemas.xmlsoap.org/soap/envelope/" '
+                 'xmlns:ns1="%s"><SOAP-ENV:Body>%%s</SOAP-ENV:Body>'
+                 '</SOAP-ENV:Envelope>' % ns_hello)
+
+
+def echo_handler(path, headers, body):
+    """
+        Answer echoString calls of test.wsdl with the sent string.
+    """
+    text = body.decode('utf-8')
+    start = text.find('<in>') + 4
+    value = text[start:text.find('</in>')]
+    response = ('<ns1:echoStringResponse><out>%s</out>'
+                '</ns1:echoStringResponse>' % value)
+    return 200, {'Content-Type': 'text/xml'}, \
+        (soap_response % response).encode('utf-8')
+
+
+def read_chunked(rfile):
+    """
+        Read request body sent with chunked transfer encoding.
+    """
+    parts = []
+    while True:
+        line = rfile.readline()
+        if not line:
+            return None  # client gave up
+        size = int(line.split(b';')[0], 16)
+        if size == 0:
+            break
+        parts.append(rfile.read(size))
+        rfile.readline()
+    # trailer
+    while rfile.readline().strip():
+        pass
+    return b''.join(parts)
+
+
+class LocalServer(ThreadingMixIn, HTTPServer):
+    """
+        HTTP/1.1 server in a background thread for tests.
+
+        The handler is called as handler(path, headers, body) and
+        returns (status, headers, body). Number of accepted connections
+        is counted in self.connections. If certfile is given, the server
+        talks https.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, handler=echo_handler, certfile=None):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                if self.headers.get('Transfer-Encoding') == 'chunked':
+                    body = read_chunked(self.rfile)
+                    if body is None:
+                        self.close_connection = True
+                        return
+                else:
+                    length = int(self.headers.get('Content-Length', 0))
+                    body = self.rfile.read(length)
+                server.requests.append((self.path, self.headers, body))
+                status, headers, data = server.handler(self.path,
+                                                       self.headers, body)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *arg):
+                pass
+
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.handler = handler
+        self.connections = 0
+        self.requests = []
+        self.url = 'http://127.0.0.1:%d/' % self.server_address[1]
+        if certfile is not None:
+            context = ssl.SSLContext(getattr(ssl, 'PROTOCOL_TLS_SERVER',
+                                             ssl.PROTOCOL_SSLv23))
+            context.load_cert_chain(certfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+            self.url = 'https://localhost:%d/' % self.server_address[1]
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def get_request(self):
+        self.connections += 1
+        return HTTPServer.get_request(self)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.settings
+except ImportError:
+    h2 = None
+
+
+class H2Server(object):
+    """
+        HTTP/2 (h2c) server in a background thread for tests.
+
+        The handler has the same signature as for `LocalServer`. Needs
+        the h2 package. max_streams limits the number of concurrent
+        streams per connection.
+    """
+    def __init__(self, handler=echo_handler, max_streams=None):
+        self.handler = handler
+        self.max_streams = max_streams
+        self.connections = 0
+        self.requests = []
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(50)
+        self.url = 'http://127.0.0.1:%d/' % self.sock.getsockname()[1]
+        self.thread = threading.Thread(target=self._accept)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, addr = self.sock.accept()
+            except socket.error:
+                return
+            self.connections += 1
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            t = threading.Thread(target=self._serve, args=(sock,))
+            t.daemon = True
+            t.start()
+
+    def _serve(self, sock):
+        config = h2.config.H2Configuration(client_side=False,
+                                           header_encoding='utf-8')
+        conn = h2.connection.H2Connection(config=config)
+        if self.max_streams is not None:
+            conn.local_settings = h2.settings.Settings(
+                client=False, initial_values={
+                    h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS:
+                    self.max_streams})
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+        streams = {}
+        pending = {}  # stream id -> response data waiting for window
+        while True:
+            try:
+                data = sock.recv(65536)
+            except socket.error:
+                break
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    streams[event.stream_id] = [dict(event.headers), []]
+                elif isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(
+                        event.flow_controlled_length, event.stream_id)
+                    streams[event.stream_id][1].append(event.data)
+                elif isinstance(event, h2.events.StreamEnded):
+                    headers, body = streams.pop(event.stream_id)
+                    body = b''.join(body)
+                    self.requests.append((headers[':path'], headers, body))
+                    status, out_headers, out = self.handler(
+                        headers[':path'], headers, body)
+                    response = [(':status', str(status)),
+                                ('content-length', str(len(out)))]
+                    response.extend((k.lower(), v)
+                                    for k, v in out_headers.items())
+                    conn.send_headers(event.stream_id, response)
+                    pending[event.stream_id] = out
+            for stream_id in list(pending):
+                out = pending[stream_id]
+                while out:
+                    size = min(conn.local_flow_control_window(stream_id),
+                               conn.max_outbound_frame_size, len(out))
+                    if size <= 0:
+                        break
+                    conn.send_data(stream_id, out[:size])
+                    out = out[size:]
+                pending[stream_id] = out
+                if not out:
+                    conn.end_stream(stream_id)
+                    del pending[stream_id]
+            sock.sendall(conn.data_to_send())
+        sock.close()
+
+    def stop(self):
+        self.sock.close()
@@ -12,6 +12,17 @@ from test_xmlschema import TestXMLSchema
 from test_wsdl import TestWSDL
 from test_message import TestMessage
 from test_client import TestClient
+from test_pool import TestPool
+from test_transport import TestTransport
+from test_aio import TestAsync
+from test_batch import TestBatch
+from test_http2 import TestHTTP2
+from test_hedge import TestHedge
+from test_routing import TestRouting
+from test_serializer import TestSerializer
+from test_method import TestMethod
+from test_mtom import TestMTOM
+from test_download import TestDownload
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+# test_aio.py - test asyncio calls, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.routing import Router
+from tests.base import BaseTest, LocalServer, echo_handler
+import gc
+import socket
+import ssl
+import threading
+import time
+import unittest
+import weakref
+if sys.version_info >= (3, 5):
+    import asyncio
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "asyncio calls need Python 3.5")
+class TestAsync(BaseTest):
+
+    def setUp(self):
+        self.server = LocalServer()
+        self.client = Client(self.test_files['test.wsdl'])
+        self.client.service.echoString.location = self.server.url
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.client.async_transport.close()
+        self.loop.close()
+        self.server.stop()
+
+    def test_acall(self):
+        method = self.client.service.echoString
+        res = self.loop.run_until_complete(method.acall('hello'))
+        self.assertEqual(res, 'hello')
+        res = self.loop.run_until_complete(method.acall('again'))
+        self.assertEqual(res, 'again')
+        self.assertEqual(self.server.connections, 1)
+
+    def test_concurrent(self):
+        method = self.client.service.echoString
+        self.client.async_transport.limit = 4
+        calls = [self.loop.create_task(method.acall('m%d' % i))
+                 for i in range(50)]
+        res = self.loop.run_until_complete(asyncio.gather(*calls))
+        self.assertEqual(res, ['m%d' % i for i in range(50)])
+        self.assertTrue(self.server.connections <= 4)
+    def test_closed_loops(self):
+        # connections of loops closed by asyncio.run are not kept
+        method = self.client.service.echoString
+        transport = self.client.async_transport
+        loops = []
+        for i in range(5):
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            res = loop.run_until_complete(method.acall('m%d' % i))
+            self.assertEqual(res, 'm%d' % i)
+            loop.close()
+            loops.append(weakref.ref(loop))
+            del loop
+        asyncio.set_event_loop(None)
+        self.assertEqual(len(transport._idle), 1)
+        self.assertEqual(len(transport._slots), 1)
+        transport.close()
+        gc.collect()
+        self.assertEqual([ref() for ref in loops], [None] * 5)
+
+    def test_routing(self):
+        method = self.client.service.echoString
+        other = LocalServer()
+        try:
+            method.router = Router([self.server.url, other.url],
+                                   slow_factor=None)
+            for i in range(4):
+                res = self.loop.run_until_complete(method.acall('m%d' % i))
+                self.assertEqual(res, 'm%d' % i)
+            # addresses without known latency are tried first
+            self.assertTrue(len(self.server.requests) >= 1)
+            self.assertTrue(len(other.requests) >= 1)
+            self.assertEqual(len(self.server.requests) +
+                             len(other.requests), 4)
+            for endpoint in method.router.endpoints:
+                self.assertEqual(endpoint.outstanding, 0)
+                self.assertTrue(endpoint.latency is not None)
+        finally:
+            other.stop()
+
+    def test_ssl_context(self):
+        context = ssl.create_default_context()
+        client = Client(self.test_files['test.wsdl'], ssl_context=context)
+        self.assertTrue(client.async_transport.ssl_context is context)
+        client.async_transport.close()
+
+    def test_peer_close(self):
+        # server closing every connection after its response without
+        # telling the client
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(5)
+        requests = []
+
+        def serve():
+            for i in range(2):
+                conn = sock.accept()[0]
+                data = b''
+                while not data.endswith(b'</in>'):
+                    data += conn.recv(4096)
+                requests.append(data)
+                conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n'
+                             b'\r\nok')
+                conn.close()
+        thread = threading.Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+        url = 'http://127.0.0.1:%d/' % sock.getsockname()[1]
+        send = self.client.async_transport.send
+        try:
+            for i in range(2):
+                response = self.loop.run_until_complete(
+                    send(url, b'<in>x</in>', 'a'))
+                self.assertEqual(response.read(), b'ok')
+                time.sleep(0.1)
+            thread.join(5)
+            self.assertEqual(len(requests), 2)
+        finally:
+            sock.close()
+
+    def test_no_retry_timeout(self):
+        def slow(path, headers, body):
+            if len(self.server.requests) > 1:
+                time.sleep(0.5)
+            return echo_handler(path, headers, body)
+        self.server.handler = slow
+        method = self.client.service.echoString
+        self.loop.run_until_complete(method.acall('hello'))
+        self.client.async_transport.timeout = 0.2
+        # the request reached the server, it must not be sent again
+        self.assertRaises(asyncio.TimeoutError, self.loop.run_until_complete,
+                          method.acall('again'))
+        time.sleep(0.5)
+        self.assertEqual(len(self.server.requests), 2)
+
+if __name__ == '__main__':
+    unittest.main()
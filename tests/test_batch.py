@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# test_batch.py - test concurrent calls, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.batch import *
+from tests.base import BaseTest, LocalServer
+import threading
+import time
+import unittest
+
+
+class TestBatch(BaseTest):
+
+    def test_order(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def func(x):
+            with lock:
+                active.append(x)
+                peak.append(len(active))
+            time.sleep(0.001 * (x % 3))
+            with lock:
+                active.remove(x)
+            if x == 5:
+                raise ValueError("bad %d" % x)
+            return x * 2
+
+        res = BatchResult(func, range(20), 3)
+        out = list(res)
+        self.assertEqual(len(out), 20)
+        self.assertTrue(isinstance(out[5], ValueError))
+        out[5] = 10
+        self.assertEqual(out, [x * 2 for x in range(20)])
+        self.assertEqual(res.count, 20)
+        self.assertEqual(res.failures, 1)
+        self.assertTrue(max(peak) <= 3)
+        self.assertTrue(res.throughput > 0)
+
+    def test_empty(self):
+        res = BatchResult(lambda x: x, [], 2)
+        self.assertEqual(list(res), [])
+        self.assertEqual(res.count, 0)
+
+    def test_map(self):
+        server = LocalServer()
+        try:
+            client = Client(self.test_files['test.wsdl'])
+            method = client.service.echoString
+            method.location = server.url
+            items = ['a', ('b',), {'in': 'c'}] + ['x%d' % i for i in range(20)]
+            out = list(method.map(items, concurrency=4))
+            self.assertEqual(out, ['a', 'b', 'c'] +
+                             ['x%d' % i for i in range(20)])
+            self.assertTrue(server.connections <= 4)
+        finally:
+            server.stop()
+    def test_broadcast(self):
+        servers = [LocalServer() for i in range(3)]
+        try:
+            client = Client(self.test_files['test.wsdl'])
+            method = client.service.echoString
+            locations = [s.url for s in servers]
+            locations.append('http://127.0.0.1:1/')
+            out = method.broadcast(locations, 'ping', _concurrency=2)
+            self.assertEqual(sorted(out), sorted(locations))
+            for s in servers:
+                self.assertEqual(out[s.url], 'ping')
+                self.assertEqual(len(s.requests), 1)
+            self.assertTrue(isinstance(out['http://127.0.0.1:1/'],
+                                       Exception))
+            bodies = set(s.requests[0][2] for s in servers)
+            self.assertEqual(len(bodies), 1)
+        finally:
+            for s in servers:
+                s.stop()
+
+if __name__ == '__main__':
+    unittest.main()
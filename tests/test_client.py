@@ -14,8 +14,10 @@ from osa.xmltypes import *
 from tests.base import BaseTest
 import unittest
 if sys.version_info[0] < 3:
+    import urllib2 as urllib_request
     from urllib2 import urlopen, HTTPError, URLError
 else:
+    import urllib.request as urllib_request
     from urllib.request import urlopen, HTTPError, URLError
     basestring = str
 
@@ -42,6 +44,30 @@ class TestClient(BaseTest):
             self.assertTrue(hasattr(self.client.service, method))
             self.assertEqual(type(getattr(self.client.service, method)), Method)
 
+    def test_default_transport(self):
+        from osa.transport import HTTPTransport, UrllibTransport
+        self.assertTrue(isinstance(self.client.transport, HTTPTransport))
+        old = os.environ.get('http_proxy')
+        os.environ['http_proxy'] = 'http://proxy.invalid:3128'
+        try:
+            client = Client(self.test_files['test.wsdl'])
+        finally:
+            if old is None:
+                del os.environ['http_proxy']
+            else:
+                os.environ['http_proxy'] = old
+        self.assertTrue(isinstance(client.transport, UrllibTransport))
+        self.assertTrue(client.service.echoString.transport is
+                        client.transport)
+        old = getattr(urllib_request, '_opener', None)
+        urllib_request.install_opener(urllib_request.build_opener(
+            urllib_request.ProxyHandler({'http': 'http://proxy.invalid/'})))
+        try:
+            client = Client(self.test_files['test.wsdl'])
+        finally:
+            urllib_request.install_opener(old)
+        self.assertTrue(isinstance(client.transport, UrllibTransport))
+
     def test_giveMessage(self):
         try:
             urlopen("http://lxpowerboz:88")
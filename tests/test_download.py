@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# test_download.py - test streamed binary responses, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa import download
+from osa.hedge import Hedger
+from osa.message import Message
+from osa.method import Method
+from osa.transport import MemoryTransport
+from osa.xmltypes import ComplexTypeMeta, XMLBase64Binary, XMLInteger, \
+    XMLString
+from tests.base import BaseTest
+from io import BytesIO
+import base64
+import random
+import threading
+import time
+import unittest
+
+ns_test = 'test_namespace'
+
+
+class TestDownload(BaseTest):
+
+    def setUp(self):
+        Blob = ComplexTypeMeta('Blob', (), {
+            "_children": [{'name': 'name', "type": XMLString, "min": 1,
+                           "max": 1, "fullname": "name",
+                           "nillable": False},
+                          {'name': 'data', "type": XMLBase64Binary,
+                           "min": 0, "max": 'unbounded',
+                           "fullname": "{%s}data" % ns_test,
+                           "nillable": False}],
+            "_namespace": ns_test})
+        Out = ComplexTypeMeta('Out', (), {
+            "_children": [{'name': 'blob', "type": Blob, "min": 1,
+                           "max": 1, "fullname": "blob",
+                           "nillable": False},
+                          {'name': 'data', "type": XMLString, "min": 1,
+                           "max": 1, "fullname": "data",
+                           "nillable": False},
+                          {'name': 'size', "type": XMLInteger, "min": 1,
+                           "max": 1, "fullname": "size",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        In = ComplexTypeMeta('In', (), {'_children': [],
+                                        '_namespace': ns_test})
+        self.payload = bytes(bytearray(random.randint(0, 255)
+                                       for i in range(300001)))
+        self.small = b'\x00small'
+        text = base64.b64encode(self.payload).decode('ascii')
+        # wrapped lines as written by many services
+        text = '\n'.join(text[i:i + 76] for i in range(0, len(text), 76))
+        self.response = (
+            '<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/">'
+            '<s:Body><t:Out xmlns:t="test_namespace"><blob><name>a&amp;b'
+            '</name><t:data>%s</t:data><t:data/><t:data>%s</t:data></blob>'
+            '<data>not binary</data><size>7</size></t:Out></s:Body>'
+            '</s:Envelope>' % (text, base64.b64encode(self.small).decode()))
+        self.method = Method(
+            'get', Message('{%s}In' % ns_test, [], [('parameters', In)]),
+            Message('{%s}Out' % ns_test, [], [('parameters', Out)]),
+            location='memory://', transport=MemoryTransport(
+                lambda location, data, action:
+                (200, self.response.encode('utf-8'))))
+
+    def test_call(self):
+        out = self.method()
+        self.assertEqual(out.blob.data, [self.payload, '', self.small])
+        chunks = []
+        self.method.binary_sink = chunks.append
+        out = self.method()
+        self.assertEqual(b''.join(chunks), self.payload + self.small)
+        self.assertTrue(len(chunks) > 3)
+        self.assertTrue(max(len(c) for c in chunks) <=
+                        download.CHUNK_SIZE * 3 // 4)
+        self.assertEqual(out.blob.data,
+                         [len(self.payload), 0, len(self.small)])
+        self.assertEqual(out.blob.name, 'a&b')
+        self.assertEqual(out.data, 'not binary')
+        self.assertEqual(out.size, 7)
+        self.method.binary_sink = f = BytesIO()
+        self.method()
+        self.assertEqual(f.getvalue(), self.payload + self.small)
+
+    def test_concurrent(self):
+        chunks = []
+
+        def sink(data):
+            chunks.append(data)
+            time.sleep(0.001)  # let other threads run
+        self.method.binary_sink = sink
+        self.method.idempotent = True
+        self.method.hedger = Hedger(delay=0, budget=1)
+        threads = [threading.Thread(target=self.method) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # whole responses one after another, none hedged
+        self.assertEqual(b''.join(chunks),
+                         (self.payload + self.small) * 4)
+        self.assertEqual(self.method.hedger.counters['calls'], 0)
+
+    def test_decoder(self):
+        chunks = []
+        decoder = download.Base64Decoder(chunks.append)
+        text = base64.b64encode(self.payload[:1000]).decode('ascii')
+        pos = 0
+        while pos < len(text):
+            step = random.randint(0, 9)
+            decoder.feed(text[pos:pos + step] + ' \r\n')
+            pos += step
+        self.assertEqual(decoder.close(), 1000)
+        self.assertEqual(b''.join(chunks), self.payload[:1000])
+        decoder = download.Base64Decoder(chunks.append)
+        decoder.feed('YWJj' 'ZA=')
+        self.assertRaises(ValueError, decoder.close)
+        self.response = self.response.replace('</t:data></blob>',
+                                               '=</t:data></blob>')
+        self.method.binary_sink = chunks.append
+        self.assertRaises(ValueError, self.method)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# test_hedge.py - test hedged requests, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.hedge import *
+from osa.transport import MemoryTransport
+from tests.base import BaseTest, echo_handler
+import threading
+import time
+import unittest
+
+
+class TestHedge(BaseTest):
+
+    def test_hedge_wins(self):
+        slow = threading.Event()
+
+        def func(attempt):
+            if not slow.is_set():
+                slow.set()
+                time.sleep(0.5)
+                return 'slow'
+            return 'fast'
+
+        hedger = Hedger(delay=0.01, budget=1.0)
+        start = time.time()
+        self.assertEqual(hedger.call(func), 'fast')
+        self.assertTrue(time.time() - start < 0.4)
+        self.assertEqual(hedger.counters['hedged'], 1)
+        self.assertEqual(hedger.counters['hedge_wins'], 1)
+
+    def test_budget(self):
+        hedger = Hedger(delay=0.001, budget=0.5)
+        for i in range(10):
+            self.assertEqual(hedger.call(lambda a: time.sleep(0.01) or i), i)
+        self.assertEqual(hedger.counters['calls'], 10)
+        self.assertTrue(hedger.counters['hedged'] <= 5)
+        self.assertEqual(hedger.counters['hedged'] +
+                         hedger.counters['budget_denied'], 10)
+
+    def test_observed_delay(self):
+        hedger = Hedger(min_samples=5)
+        for i in range(4):
+            hedger.call(lambda a: i)
+        self.assertEqual(hedger.current_delay(), None)
+        hedger.call(lambda a: 0)
+        self.assertTrue(hedger.current_delay() is not None)
+        self.assertEqual(hedger.counters['hedged'], 0)
+
+    def test_errors(self):
+        def fail(attempt):
+            raise ValueError("bad")
+        self.assertRaises(ValueError, Hedger(delay=0.001, budget=1).call,
+                          fail)
+
+    def test_method(self):
+        calls = []
+
+        def handler(location, data, action):
+            calls.append(data)
+            if len(calls) == 1:
+                time.sleep(0.3)
+            return echo_handler(location, {}, data)[::2]
+
+        client = Client(self.test_files['test.wsdl'],
+                        transport=MemoryTransport(handler))
+        method = client.service.echoString
+        method.hedger = Hedger(delay=0.01, budget=1.0)
+        # not idempotent, no hedging
+        self.assertEqual(method('a'), 'a')
+        self.assertEqual(method.hedger.counters['calls'], 0)
+        calls[:] = []
+        method.idempotent = True
+        self.assertEqual(method('b'), 'b')
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(method.hedger.counters['hedge_wins'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
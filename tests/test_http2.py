@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# test_http2.py - test HTTP/2 transport, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa import http2
+from tests.base import BaseTest, H2Server
+import ssl
+import unittest
+
+
+@unittest.skipIf(http2.h2 is None, "h2 package is not installed")
+class TestHTTP2(BaseTest):
+
+    def setUp(self):
+        self.server = H2Server()
+        self.transport = http2.HTTP2Transport(timeout=10)
+        self.client = Client(self.test_files['test.wsdl'],
+                             transport=self.transport)
+        self.client.service.echoString.location = self.server.url
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def test_call(self):
+        method = self.client.service.echoString
+        self.assertEqual(method('h2'), 'h2')
+        big = 'x' * 200000  # more than the default flow control window
+        self.assertEqual(method(big), big)
+
+    def test_multiplexing(self):
+        method = self.client.service.echoString
+        items = ['m%d' % i for i in range(100)]
+        self.assertEqual(list(method.map(items, concurrency=16)), items)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(self.server.requests), 100)
+    def test_max_streams(self):
+        self.server.stop()
+        self.server = H2Server(max_streams=5)
+        method = self.client.service.echoString
+        method.location = self.server.url
+        self.assertEqual(method('first'), 'first')  # settings known
+        items = ['m%d' % i for i in range(200)]
+        self.assertEqual(list(method.map(items, concurrency=40)), items)
+        self.assertEqual(self.server.connections, 1)
+        conn = list(self.transport._connections.values())[0]
+        self.assertEqual(conn.streams, {})
+
+    def test_ssl_context(self):
+        context = ssl.create_default_context()
+        context.set_alpn_protocols(['http/1.1'])
+        transport = http2.HTTP2Transport(ssl_context=context)
+        private = http2._h2_context(context)
+        self.assertTrue(private is not context)
+        self.assertEqual(private.verify_mode, context.verify_mode)
+        self.assertEqual(len(private.get_ca_certs()),
+                         len(context.get_ca_certs()))
+        transport.close()
+
+if __name__ == '__main__':
+    unittest.main()
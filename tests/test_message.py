@@ -8,6 +8,7 @@ sys.path.insert(0, "../")
 from osa.xmlschema import *
 from osa.xmlparser import *
 from osa.message import *
+from osa.xmltypes import ComplexTypeMeta, XMLInteger
 from tests.base import BaseTest
 import xml.etree.cElementTree as etree
 import unittest
@@ -63,6 +64,68 @@ class TestMessage(BaseTest):
         self.assertEqual(root[0].tag, "{vostok}Name")
         self.assertEqual(len(root[0]), 2)
 
+    def test_binder(self):
+        child = lambda name, min, nillable: {
+            'name': name, 'type': XMLInteger, 'min': min, 'max': 1,
+            'fullname': name, 'nillable': nillable}
+        Args = ComplexTypeMeta('Args', (), {
+            '_children': [child('a', 1, False), child('b', 0, False),
+                          child('c', 0, True), child('class', 1, False),
+                          child('d-e', 0, False)],
+            '_namespace': 'urn:args'})
+        message = Message('{urn:args}Args', [], [('parameters', Args)])
+        bind = message.compile()
+        self.assertTrue(message._binder[2] is bind)
+        calls = [((1, 2, 3, 4, 5), {}), ((1, None, None, 4), {}),
+                 ((), {'a': 1, 'class': 4, 'd-e': 5}),
+                 ((2, 3, 4), {'a': 1}), ((1, 2, 3, 4, 5, 6), {'x': 1})]
+        for arg, kw in calls:
+            p = message.wrap(*arg, **kw)
+            self.assertTrue(isinstance(p, Args))
+            self.assertEqual(p, message._wrap(*arg, **kw))
+            for c in Args._children:
+                self.assertEqual(c['name'] in p.__dict__,
+                                 c['name'] in message._wrap(*arg,
+                                                            **kw).__dict__)
+        p = Args()
+        self.assertTrue(message.wrap(p) is p)
+        self.assertRaises(ValueError, message.wrap, 1)
+        self.assertRaises(ValueError, message.wrap, b=1, **{'class': 2})
+        self.assertRaises(ValueError, message.wrap, 1, 2, 3)
+        self.assertEqual(Message('{urn:args}None', []).wrap(1), None)
+        # a new message type is compiled on use
+        message.use_parts = [('parameters', self.types["{vostok}Name"])]
+        self.assertEqual(message.wrap('a', 'b').lastName, 'b')
+        if message.signature is not None:
+            self.assertEqual(list(message.signature.parameters),
+                             ['firstName', 'lastName'])
+            Plain = ComplexTypeMeta('Plain', (), {
+                '_children': [child('a', 1, False), child('b', 0, False),
+                              child('c', 0, True)],
+                '_namespace': 'urn:args'})
+            message.use_parts = [('parameters', Plain)]
+            params = message.signature.parameters
+            self.assertEqual(list(params), ['a', 'b', 'c'])
+            self.assertTrue(params['a'].default is params['a'].empty)
+            self.assertEqual(params['b'].default, None)
+            self.assertTrue(params['a'].annotation is XMLInteger)
+            self.assertEqual(message.compile().__signature__,
+                             message.signature)
+            # names that are not identifiers and required children
+            # after optional ones take any arguments
+            Later = ComplexTypeMeta('Later', (), {
+                '_children': [child('x', 0, False), child('y', 1, False)],
+                '_namespace': 'urn:args'})
+            for cls in (Args, Later):
+                message.use_parts = [('parameters', cls)]
+                self.assertEqual([p.kind for p in
+                                  message.signature.parameters.values()],
+                                 [params['a'].VAR_POSITIONAL,
+                                  params['a'].VAR_KEYWORD])
+            message.use_parts = [('parameters', Args)]
+            for arg, kw in calls:
+                message.signature.bind(*arg, **kw)
+
     def test_fromxml(self):
         root = etree.Element("Name")
         fn = etree.SubElement(root, "firstName")
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# test_method.py - test method calls, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.message import Message
+from osa.method import Method, PreparedCall
+from osa.serializer import Template
+from osa.transport import MemoryTransport, body_bytes
+from osa.xmltypes import ComplexTypeMeta, XMLInteger, XMLString
+from tests.base import BaseTest
+import xml.etree.cElementTree as etree
+import inspect
+import threading
+import unittest
+
+ns_test = 'test_namespace'
+
+
+class RecordingTransport(MemoryTransport):
+    """
+        Memory transport that remembers what was sent.
+    """
+    def __init__(self, handler):
+        MemoryTransport.__init__(self, handler)
+        self.sent = []
+
+    def send(self, location, data, action, headers=None):
+        data = body_bytes(data)
+        self.sent.append((data, headers))
+        return MemoryTransport.send(self, location, data, action, headers)
+
+
+def echo(location, data, action):
+    return 200, (b'<soap:Envelope xmlns:soap='
+                 b'"http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+                 b'<ns:Out xmlns:ns="test_namespace"><out>ok</out></ns:Out>'
+                 b'</soap:Body></soap:Envelope>')
+
+
+class TestMethod(BaseTest):
+
+    def setUp(self):
+        Numbers = ComplexTypeMeta('Numbers', (), {
+            "_children": [{'name': 'value', "type": XMLInteger, "min": 1,
+                           "max": 'unbounded', "fullname": "value",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        Out = ComplexTypeMeta('Out', (), {
+            "_children": [{'name': 'out', "type": XMLString, "min": 1,
+                           "max": 1, "fullname": "out",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        self.transport = RecordingTransport(echo)
+        self.method = Method(
+            'numbers', Message('{%s}Numbers' % ns_test, [],
+                               [('parameters', Numbers)]),
+            Message('{%s}Out' % ns_test, [], [('parameters', Out)]),
+            action='urn:numbers', location='memory://',
+            transport=self.transport)
+
+    def test_prepare(self):
+        prep = self.method.prepare([1, 2, 3])
+        self.assertTrue(isinstance(prep, PreparedCall))
+        self.assertEqual(prep.data, self.method._encode([1, 2, 3]))
+        self.assertEqual(prep.headers['SOAPAction'], 'urn:numbers')
+        self.assertEqual(prep(), 'ok')
+        self.assertEqual(prep(), 'ok')
+        self.assertEqual(len(self.transport.sent), 2)
+        for data, headers in self.transport.sent:
+            self.assertTrue(data is prep.data)
+            self.assertTrue(headers is prep.headers)
+        old = prep.data
+        prep.refresh([4])
+        self.assertNotEqual(prep.data, old)
+        self.assertEqual(prep.data, self.method._encode([4]))
+        self.assertEqual(prep(), 'ok')
+        self.assertTrue(self.transport.sent[-1][0] is prep.data)
+        self.assertRaises(ValueError, self.method.prepare, [])
+
+    def test_concurrent(self):
+        prep = self.method.prepare([1, 2, 3])
+        results = []
+
+        def run():
+            for i in range(20):
+                results.append(prep())
+
+        threads = [threading.Thread(target=run) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ['ok'] * 80)
+        self.assertEqual(len(self.transport.sent), 80)
+
+    @unittest.skipIf(not hasattr(inspect, 'signature'),
+                     "inspect.signature needs Python 3.3")
+    def test_signature(self):
+        # the class is inspected as usual
+        self.assertTrue('input' in inspect.signature(Method).parameters)
+        client = Client(self.test_files['test.wsdl'],
+                        transport=MemoryTransport(None))
+        # the signature accepts the calls the method accepts
+        for method, arg in ((client.service.sayHello, (None, 2)),
+                            (client.service.echoString, ('x', ))):
+            inspect.signature(method).bind(*arg)
+        params = inspect.signature(client.service.giveMessage).parameters
+        self.assertEqual(list(params), [])
+
+    def test_template(self):
+        client = Client(self.test_files['test.wsdl'],
+                        transport=MemoryTransport(None))
+        method = client.service.sayHello
+        person = client.types.Person()
+        person.age, person.height, person.weight = 30, 180, 80
+        person.name = client.types.Name()
+        person.name.firstName = u'a<b \xe4\u20ac "x"'
+        person.name.lastName = '&c>'
+        template = method.template(person=person).template
+        self.assertTrue(isinstance(template, Template))
+        self.assertEqual(template.variables, ['times'])
+        for times in (1, 20):
+            self.assertEqual(template.serialize(times),
+                             method._encode(person, times))
+            self.assertEqual(template.serialize(times=times),
+                             method._encode(person, times))
+        template = method.template(times=5).template
+        for arg in (person, None):
+            self.assertEqual(template.serialize(arg),
+                             method._encode(arg, 5))
+        chunks = []
+        template.serialize(person, _sink=chunks.append, _chunk_size=1)
+        self.assertEqual(b''.join(chunks), method._encode(person, 5))
+        template = method.template().template
+        self.assertEqual(template.serialize(person, 2),
+                         method._encode(person, 2))
+        self.assertRaises(TypeError, method.template, age=3)
+        self.assertRaises(TypeError, template.serialize, age=3)
+        template = method.template(person=person, times=3).template
+        self.assertEqual(template.serialize(), method._encode(person, 3))
+        self.assertEqual(len(template.texts), 1)
+
+    def test_template_call(self):
+        tmpl = self.method.template()
+        self.assertEqual(tmpl([1, 2]), 'ok')
+        self.assertEqual(self.transport.sent[-1][0],
+                         self.method._encode([1, 2]))
+        self.assertRaises(ValueError, tmpl, [])
+        self.method.streaming = True
+        self.assertEqual(tmpl(value=[3]), 'ok')
+        self.assertEqual(self.transport.sent[-1][0],
+                         self.method._encode([3]))
+
+    def test_header(self):
+        Session = ComplexTypeMeta('Session', (), {
+            "_children": [{'name': 'token', "type": XMLString, "min": 1,
+                           "max": 1, "fullname": "{urn:session}token",
+                           "nillable": False}],
+            "_namespace": 'urn:session'})
+        session = Session()
+        session.token = 'a&b'
+        extra = etree.Element('{urn:extra}Trace')
+        extra.text = '7'
+        self.method.set_header(session, extra)
+        data = self.method._encode([1])
+        self.assertTrue(self.method._header[1] is not None)
+        self.assertTrue(self.method._header_text() is self.method._header[1])
+        root = etree.fromstring(data)
+        self.assertEqual(root[0].tag,
+                         '{http://schemas.xmlsoap.org/soap/envelope/}Header')
+        self.assertEqual(root[1][0][0].text, '1')
+        blocks = root[0]
+        self.assertEqual(blocks[0][0].tag, '{urn:session}token')
+        self.assertEqual(Session().from_xml(blocks[0]).token, 'a&b')
+        self.assertEqual(blocks[1].tag, '{urn:extra}Trace')
+        # blocks changed in place are serialized again
+        session.token = 'c'
+        self.assertEqual(etree.fromstring(self.method._encode([1]))[0][0][0]
+                         .text, 'c')
+        text = self.method._header_text()
+        self.assertTrue(self.method._header_text() is text)
+        extra.set('id', 'x')
+        self.assertTrue('id="x"' in self.method._header_text())
+        self.method.set_header(session)
+        self.assertEqual(etree.fromstring(self.method._encode([1]))[0][0][0]
+                         .text, 'c')
+        template = self.method.template()
+        self.assertEqual(template.template.serialize(
+            [2], _header=self.method._header_text()),
+            self.method._encode([2]))
+        self.method.set_header()
+        self.assertEqual(len(etree.fromstring(self.method._encode([1]))), 1)
+
+        def reply(location, data, action):
+            return 200, (b'<e:Envelope xmlns:e="http://schemas.xmlsoap.org/'
+                         b'soap/envelope/"><e:Header><s:Session '
+                         b'xmlns:s="urn:session"><s:token>new</s:token>'
+                         b'</s:Session></e:Header><e:Body><ns:Out '
+                         b'xmlns:ns="test_namespace"><out>ok</out></ns:Out>'
+                         b'</e:Body></e:Envelope>')
+        self.method.transport = MemoryTransport(reply)
+        self.assertEqual(self.method([1]), 'ok')
+        header = self.method.last_header
+        self.assertTrue(header._element is False)
+        self.assertEqual(len(header), 1)
+        self.assertEqual(header.get(Session).token, 'new')
+        self.assertEqual(header.get(Session.__class__('Other', (), {
+            '_children': [], '_namespace': 'urn:session'})), None)
+        self.method.transport = self.transport
+        self.method([1])
+        self.assertEqual(len(self.method.last_header), 0)
+        self.assertEqual(self.method.last_header.get(Session), None)
+
+        # response headers of concurrent calls are kept per thread
+        def reply_token(location, data, action):
+            value = etree.fromstring(data).find('.//value').text
+            code, body = reply(location, data, action)
+            return code, body.replace(b'>new<',
+                                      ('>%s<' % value).encode('ascii'))
+        self.method.transport = MemoryTransport(reply_token)
+        errors = []
+
+        def run(value):
+            for i in range(50):
+                self.method([value])
+                if self.method.last_header.get(Session).token != str(value):
+                    errors.append(value)
+
+        threads = [threading.Thread(target=run, args=(i, ))
+                   for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.method.last_header), 0)
+
+    def test_client_header(self):
+        client = Client(self.test_files['test.wsdl'],
+                        transport=MemoryTransport(None))
+        name = client.types.Name()
+        name.firstName, name.lastName = 'a', 'b'
+        client.set_header(name)
+        for data in (client.service.sayHello._encode(None, 1),
+                     client.service.testMe._encode()):
+            root = etree.fromstring(data)
+            self.assertEqual(root[0][0].tag, '{%s}Name' % name._namespace)
+            self.assertEqual(root[0][0][0].text, 'a')
+
+
+if __name__ == '__main__':
+    unittest.main()
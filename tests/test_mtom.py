@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# test_mtom.py - test MTOM/XOP messages, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa import mtom
+from osa.message import Message
+from osa.method import Method
+from osa.pool import ConnectionPool
+from osa.transport import HTTPTransport
+from osa.xmltypes import ComplexTypeMeta, XMLBase64Binary, XMLInteger, \
+    XMLString
+from tests.base import BaseTest, LocalServer
+from io import BytesIO
+import xml.etree.cElementTree as etree
+import array
+import base64
+import random
+import unittest
+
+ns_test = 'test_namespace'
+envelope = ('<e:Envelope xmlns:e="http://schemas.xmlsoap.org/soap/envelope/"'
+            ' xmlns:xop="http://www.w3.org/2004/08/xop/include"><e:Body>'
+            '<ns:Out xmlns:ns="test_namespace">%s</ns:Out></e:Body>'
+            '</e:Envelope>')
+
+
+def split(body, boundary):
+    """
+        Parts of a multipart message as (headers, content).
+    """
+    parts = []
+    for part in body.split(b'\r\n--' + boundary)[:-1]:
+        if part.startswith(b'--' + boundary):
+            part = part[len(boundary) + 4:]  # first part
+        else:
+            part = part[2:]
+        head, content = part.split(b'\r\n\r\n', 1)
+        parts.append((head.decode('latin-1'), content))
+    return parts
+
+
+def mtom_handler(path, headers, body):
+    """
+        MTOM service answering with the sent data reversed as an
+        attachment and its size.
+    """
+    content_type = headers['Content-Type']
+    if not content_type.startswith('multipart/related'):
+        data = base64.b64decode(etree.fromstring(body).find('.//data').text)
+        return 200, {'Content-Type': 'text/xml'}, \
+            (envelope % ('<data>%s</data><size>%d</size>' % (
+                base64.b64encode(data[::-1]).decode('ascii'),
+                len(data)))).encode('utf-8')
+    boundary = content_type.split('boundary="', 1)[1].split('"')[0]
+    parts = split(body, boundary.encode('ascii'))
+    root = etree.fromstring(parts[0][1])
+    href = root.find('.//data/{%s}Include' % mtom.NS_XOP).get('href')
+    for head, content in parts[1:]:
+        if 'Content-ID: <%s>' % href[4:] in head:
+            data = content
+    out = (envelope % ('<data><xop:Include href="cid:out%40osa.test"/>'
+                       '</data><size>' + str(len(data)) + '</size>'))
+    answer = ('--b\r\nContent-Type: application/xop+xml; type="text/xml"'
+              '\r\nContent-ID: <main>\r\n\r\n').encode('ascii') + \
+        out.encode('utf-8') + \
+        b'\r\n--b\r\nContent-ID: <out@osa.test>\r\n\r\n' + data[::-1] + \
+        b'\r\n--b--\r\n'
+    return 200, {'Content-Type': 'multipart/related; type="application/'
+                 'xop+xml"; boundary="b"; start="<main>"'}, answer
+
+
+class TestMTOM(BaseTest):
+
+    def setUp(self):
+        Upload = ComplexTypeMeta('Upload', (), {
+            "_children": [{'name': 'name', "type": XMLString, "min": 1,
+                           "max": 1, "fullname": "name",
+                           "nillable": False},
+                          {'name': 'data', "type": XMLBase64Binary,
+                           "min": 1, "max": 1, "fullname": "data",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        Out = ComplexTypeMeta('Out', (), {
+            "_children": [{'name': 'data', "type": XMLBase64Binary,
+                           "min": 1, "max": 1, "fullname": "data",
+                           "nillable": False},
+                          {'name': 'size', "type": XMLInteger, "min": 1,
+                           "max": 1, "fullname": "size",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        self.server = LocalServer(mtom_handler)
+        self.transport = HTTPTransport(ConnectionPool(size=2))
+        self.method = Method(
+            'upload', Message('{%s}Upload' % ns_test, [],
+                              [('parameters', Upload)]),
+            Message('{%s}Out' % ns_test, [], [('parameters', Out)]),
+            action='urn:upload', location=self.server.url,
+            transport=self.transport)
+        # data looking like MIME structure
+        self.payload = b'\r\n--b\r\n\r\n' + bytes(bytearray(
+            random.randint(0, 255) for i in range(100000))) + b'\r\n--'
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.stop()
+
+    def check(self, out, sent):
+        self.assertTrue(isinstance(out.data, memoryview))
+        self.assertEqual(out.data.tobytes(), self.payload[::-1])
+        self.assertEqual(out.size, len(self.payload))
+        # raw data on the wire, no base64 text
+        body = self.server.requests[-1][2]
+        self.assertTrue(len(body) < len(self.payload) + 2000)
+        self.assertTrue(self.payload in body)
+        self.assertEqual(self.server.requests[-1][1]['SOAPAction'],
+                         'urn:upload')
+        self.assertEqual(len(self.server.requests), sent)
+
+    def test_call(self):
+        self.method.mtom = True
+        self.check(self.method('a', self.payload), 1)
+        self.check(self.method('a', bytearray(self.payload)), 2)
+        self.check(self.method(data=memoryview(self.payload), name='b'), 3)
+        self.method.streaming = True
+        self.check(self.method('a', BytesIO(self.payload)), 4)
+        self.check(self.method.template(name='t')(self.payload), 5)
+        self.method.streaming = False
+        self.check(self.method.template()('t', BytesIO(self.payload)), 6)
+        prep = self.method.prepare('a', self.payload)
+        self.check(prep(), 7)
+        self.check(prep(), 8)
+        self.assertTrue(prep.headers['Content-Type'].startswith(
+            'multipart/related; type="application/xop+xml"'))
+
+    @unittest.skipIf(sys.version_info[0] < 3,
+                     "arrays have no memoryview in Python 2")
+    def test_items(self):
+        # buffers of wider items are sent by their bytes
+        self.method.mtom = True
+        values = array.array('d', [1, 2, 3])
+        self.payload = values.tobytes()
+        for streaming in (False, True):
+            self.method.streaming = streaming
+            out = self.method('a', memoryview(values))
+            self.assertEqual(out.data.tobytes(), self.payload[::-1])
+            self.assertEqual(out.size, 24)
+
+    def test_plain(self):
+        out = self.method('a', self.payload)
+        self.assertEqual(out.data, self.payload[::-1])
+        content_type = self.server.requests[-1][1]['Content-Type']
+        self.assertTrue(content_type.startswith('text/xml'))
+        # plain responses are accepted with MTOM as well
+        self.method.mtom = True
+        self.assertEqual(mtom.parse(BytesIO(self.method._encode(
+            'a', self.payload))).find('.//data').text,
+            base64.b64encode(self.payload).decode('ascii'))
+
+    def test_unpack(self):
+        body = (b'\r\n--x\r\nContent-Type: text/xml\r\n\r\n<a/>'
+                b'\r\n--x\r\ncontent-id:  <1%40y>\r\n\r\n\r\n--'
+                b'\r\n--x\r\nContent-ID: <2>\r\n\r\n'
+                b'\r\n--x--\r\n')
+        root, parts = mtom.unpack(body)
+        self.assertEqual(root.tobytes(), b'<a/>')
+        self.assertEqual(sorted(parts), ['1%40y', '2'])
+        self.assertEqual(parts['1%40y'].tobytes(), b'\r\n--')
+        self.assertEqual(parts['2'].tobytes(), b'')
+        self.assertRaises(RuntimeError, mtom.unpack, b'--x\r\n\r\n<a/>')
+        root = etree.fromstring(envelope % (
+            '<data><xop:Include href="cid:1@y"/></data>'
+            '<data>x<xop:Include href="cid:1%40y"/></data>'))
+        mtom.include(root, {'1@y': memoryview(b'z')})
+        for data in root.findall('.//data'):
+            self.assertEqual(len(data), 0)
+            self.assertEqual(data.text.tobytes(), b'z')
+        root = etree.fromstring(envelope % (
+            '<data><xop:Include href="cid:2@y"/></data>'))
+        self.assertRaises(RuntimeError, mtom.include, root, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# test_pool.py - test ConnectionPool class, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.pool import *
+from tests.base import BaseTest, LocalServer, echo_handler
+import socket
+import ssl
+import threading
+import time
+import unittest
+
+
+class TestPool(BaseTest):
+
+    def setUp(self):
+        self.server = LocalServer()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_keep_alive(self):
+        client = Client(self.test_files['test.wsdl'])
+        client.service.echoString.location = self.server.url
+        for i in range(5):
+            self.assertEqual(client.service.echoString('msg %d' % i),
+                             'msg %d' % i)
+        self.assertEqual(len(self.server.requests), 5)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(len(client.transport.pool._idle), 1)
+
+    def test_idle_timeout(self):
+        pool = ConnectionPool(idle_timeout=-1)
+        for i in range(2):
+            response = pool.request(self.server.url, b'x', {})
+            self.assertEqual(response.code, 200)
+            response.read()
+            response.close()
+        self.assertEqual(self.server.connections, 2)
+
+    def test_size(self):
+        pool = ConnectionPool(size=1)
+        responses = [pool.request(self.server.url, b'<in>x</in>', {})
+                     for i in range(3)]
+        for response in responses:
+            response.read()
+            response.close()
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(sum(len(v) for v in pool._idle.values()), 1)
+
+    def test_stale_reconnect(self):
+        pool = ConnectionPool()
+        response = pool.request(self.server.url, b'<in>x</in>', {})
+        response.read()
+        response.close()
+        # server drops the kept alive connection
+        for used, conn in list(pool._idle.values())[0]:
+            conn.sock.close()
+        response = pool.request(self.server.url, b'<in>y</in>', {})
+        self.assertEqual(response.code, 200)
+        self.assertTrue(response.read().find(b'<out>y</out>') != -1)
+        response.close()
+        self.assertEqual(self.server.connections, 2)
+
+    def test_peer_close(self):
+        # server closing every connection after its response without
+        # telling the client
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(5)
+        requests = []
+
+        def serve():
+            for i in range(2):
+                conn = sock.accept()[0]
+                data = b''
+                while not data.endswith(b'</in>'):
+                    data += conn.recv(4096)
+                requests.append(data)
+                conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n'
+                             b'\r\nok')
+                conn.close()
+        thread = threading.Thread(target=serve)
+        thread.daemon = True
+        thread.start()
+        url = 'http://127.0.0.1:%d/' % sock.getsockname()[1]
+        pool = ConnectionPool()
+        try:
+            for i in range(2):
+                response = pool.request(url, b'<in>x</in>', {})
+                self.assertEqual(response.read(), b'ok')
+                response.close()
+                time.sleep(0.1)
+            thread.join(5)
+            self.assertEqual(len(requests), 2)
+        finally:
+            sock.close()
+
+    def test_no_retry_timeout(self):
+        def slow(path, headers, body):
+            if len(self.server.requests) > 1:
+                time.sleep(0.5)
+            return echo_handler(path, headers, body)
+        self.server.handler = slow
+        pool = ConnectionPool(timeout=0.2)
+        response = pool.request(self.server.url, b'<in>x</in>', {})
+        response.read()
+        response.close()
+        # the request reached the server, it must not be sent again
+        self.assertRaises(socket.timeout, pool.request, self.server.url,
+                          b'<in>y</in>', {})
+        time.sleep(0.6)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_tls_resumption(self):
+        server = LocalServer(certfile=self.test_files['tls.pem'])
+        try:
+            context = ssl.create_default_context(
+                cafile=self.test_files['tls.pem'])
+            pool = ConnectionPool(idle_timeout=-1, ssl_context=context)
+            for i in range(3):
+                # the idle timeout forces a new connection for every call
+                response = pool.request(server.url, b'<in>tls</in>', {})
+                self.assertEqual(response.code, 200)
+                self.assertTrue(response.read().find(b'<out>tls</out>') != -1)
+                response.close()
+            self.assertEqual(server.connections, 3)
+            self.assertEqual(sum(pool.handshakes.values()), 3)
+            if hasattr(ssl, 'SSLSession'):
+                self.assertEqual(pool.handshakes['resumed'], 2)
+        finally:
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
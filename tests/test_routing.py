@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# test_routing.py - test routing across service ports, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.routing import *
+from osa.transport import MemoryTransport
+from tests.base import BaseTest, echo_handler
+import unittest
+
+
+class TestRouting(BaseTest):
+
+    def test_least_outstanding(self):
+        router = Router(['a', 'b', 'c'], policy='least_outstanding')
+        e = [router.acquire() for i in range(3)]
+        self.assertEqual(sorted(x.location for x in e), ['a', 'b', 'c'])
+        router.release(e[1], 0.1)
+        self.assertEqual(router.acquire().location, e[1].location)
+
+    def test_ewma(self):
+        router = Router(['a', 'b'], slow_factor=None)
+        for i in range(10):
+            for loc, latency in (('a', 0.1), ('b', 0.01)):
+                e = [x for x in router.endpoints if x.location == loc][0]
+                e.outstanding += 1
+                router.release(e, latency)
+        picks = [router.acquire().location for i in range(12)]
+        self.assertEqual(picks[0], 'b')
+        # outstanding requests make the fast address busy
+        self.assertTrue('a' in picks)
+
+    def test_failure(self):
+        router = Router(['a', 'b'], penalty=60)
+        e = router.acquire()
+        router.release(e, ok=False)
+        for i in range(5):
+            other = router.acquire()
+            self.assertNotEqual(other.location, e.location)
+            router.release(other, 0.01)
+        e.down_until = 1  # penalty is over
+        router.endpoints[0].latency = router.endpoints[1].latency = 0.01
+        self.assertTrue(e in [router.acquire() for i in range(2)])
+
+    def test_slow(self):
+        router = Router(['a', 'b'], slow_factor=5)
+        a, b = router.endpoints
+        for e, latency in ((a, 0.01), (b, 1.0)):
+            e.outstanding += 1
+            router.release(e, latency)
+        self.assertTrue(b.down_until > 0)
+        self.assertEqual([router.acquire() for i in range(3)], [a] * 3)
+
+    def test_client(self):
+        seen = []
+
+        def handler(location, data, action):
+            seen.append(location)
+            if location.find(':88/') != -1:
+                raise IOError("down")
+            return echo_handler(location, {}, data)[::2]
+
+        single = Client(self.test_files['test.wsdl'])
+        self.assertEqual(single.service.echoString.router, None)
+        client = Client(self.test_files['ports.wsdl'],
+                        transport=MemoryTransport(handler))
+        method = client.service.echoString
+        self.assertTrue(method.router is client.service.sayHello.router)
+        results = []
+        for i in range(6):
+            try:
+                results.append(method('x'))
+            except IOError:
+                pass
+        self.assertEqual(results, ['x'] * 5)
+        self.assertEqual(len([s for s in seen if s.find(':88/') != -1]), 1)
+        # explicit location switches routing off
+        method.location = 'http://pinned/'
+        self.assertEqual(method.router, None)
+        self.assertEqual(method('y'), 'y')
+        self.assertEqual(seen[-1], 'http://pinned/')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+# test_serializer.py - test incremental serialization, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.message import Message
+from osa.method import Method
+from osa.serializer import *
+from osa.transport import HTTPTransport, MemoryTransport
+from osa.xmlnamespace import NS_SOAP_ENV
+from osa.xmltypes import *
+from tests.base import BaseTest, LocalServer, echo_handler
+from datetime import date, datetime
+import xml.etree.cElementTree as etree
+from io import BytesIO
+import array
+import base64
+import gc
+import random
+import weakref
+import unittest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ns_test = 'test_namespace'
+
+
+def as_tuple(element):
+    return (element.tag, sorted(element.attrib.items()),
+            element.text or '', [as_tuple(e) for e in element])
+
+
+class TestSerializer(BaseTest):
+
+    def setUp(self):
+        self.Numbers = ComplexTypeMeta('Numbers', (), {
+            "_children": [{'name': 'value', "type": XMLInteger, "min": 1,
+                           "max": 'unbounded', "fullname": "value",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        self.message = Message('{%s}Numbers' % ns_test, [],
+                               [('parameters', self.Numbers)])
+        Out = ComplexTypeMeta('Out', (), {
+            "_children": [{'name': 'out', "type": XMLString, "min": 1,
+                           "max": 1, "fullname": "out",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        self.output = Message('{%s}Out' % ns_test, [],
+                              [('parameters', Out)])
+
+    def tree_envelope(self, message, *arg):
+        env = etree.Element('{%s}Envelope' % NS_SOAP_ENV)
+        body = etree.SubElement(env, '{%s}Body' % NS_SOAP_ENV)
+        message.to_xml(*arg, _body=body)
+        return etree.tostring(env)
+
+    def test_wire_format(self):
+        client = Client(self.test_files['test.wsdl'],
+                        transport=MemoryTransport(None))
+        method = client.service.sayHello
+        person = client.types.Person()
+        person.age, person.height, person.weight = 30, 180, 80
+        person.name = client.types.Name()
+        person.name.firstName = u'a<b \xe4\u20ac "x"\n'
+        person.name.lastName = '&c>'
+        for arg in ((person, 2), (None, 3)):
+            self.assertEqual(write_envelope(method.input.wrap(*arg)),
+                             self.tree_envelope(method.input, *arg))
+        method = client.service.testMe
+        self.assertEqual(write_envelope(method.input.wrap()),
+                         self.tree_envelope(method.input))
+
+        Color = type('Color', (XMLStringEnumeration, ),
+                     {'_allowedValues': ['red', 'green']})
+        kinds = [('i', XMLInteger, 5), ('d', XMLDouble, 0.1),
+                 ('b', XMLBoolean, True), ('n', XMLDecimal, '1.50'),
+                 ('t', XMLDate, date(2013, 1, 2)),
+                 ('dt', XMLDateTime, datetime(2013, 1, 2, 3, 4, 5)),
+                 ('c', Color, 'green'), ('e', XMLString, ''),
+                 ('a', XMLAny, XMLInteger(3))]
+        children = [{'name': k, 'type': t, 'min': 0, 'max': 'unbounded',
+                     'fullname': '{%s}%s' % (ns_test, k), 'nillable': True}
+                    for k, t, v in kinds]
+        All = ComplexTypeMeta('All', (), {'_children': children,
+                                          '_namespace': 'other'})
+        message = Message('{other}All', [], [('parameters', All)])
+        values = [v for k, t, v in kinds]
+        self.assertEqual(write_envelope(message.wrap(*values)),
+                         self.tree_envelope(message, *values))
+        values[0] = [1, XMLInteger(2), 3.0]
+        values[2] = None
+        self.assertEqual(write_envelope(message.wrap(*values)),
+                         self.tree_envelope(message, *values))
+        values[6] = 'blue'
+        self.assertRaises(ValueError, write_envelope, message.wrap(*values))
+
+    def test_generated(self):
+        client = Client(self.test_files['test.wsdl'],
+                        transport=MemoryTransport(None))
+        person = client.types.Person()
+        person.age, person.height, person.weight = 30, 180, [80]
+        person.name = client.types.Name()
+        person.name.firstName = u'a<b \xe4\u20ac'
+        person.name.lastName = '&c>'
+        Derived = ComplexTypeMeta('Derived', (client.types.Name, ), {
+            '_children': [], '_namespace': person.name._namespace})
+        derived = Derived()
+        derived.firstName, derived.lastName = 'd', ''
+
+        def write(children, obj):
+            tag = '{%s}%s' % (obj._namespace, obj.__class__.__name__)
+            writer = XMLWriter()
+            writer.start(tag)
+            children(writer, obj, tag)
+            writer.end()
+            return writer.getvalue()
+
+        for obj in (person, person.name, derived,
+                    client.service.sayHello.input.wrap(person, 2),
+                    client.service.sayHello.input.wrap(None, 2)):
+            self.assertEqual(write(write_children, obj),
+                             write(interpret_children, obj))
+        person.name = derived
+        self.assertEqual(write(write_children, person),
+                         write(interpret_children, person))
+        person.age = [1, 2]
+        self.assertRaises(ValueError, write, write_children, person)
+        person.age = None
+        self.assertRaises(ValueError, write, write_children, person)
+        # switching generation off applies to compiled types as well
+        from osa import serializer
+        interpreted = []
+
+        def interpret(writer, obj, tag):
+            interpreted.append(obj)
+            interpret_children(writer, obj, tag)
+        person.age = 30
+        expected = write(interpret_children, person)
+        serializer.generate, serializer.interpret_children = False, interpret
+        try:
+            self.assertEqual(write(write_children, person), expected)
+        finally:
+            serializer.generate = True
+            serializer.interpret_children = interpret_children
+        self.assertTrue(interpreted[0] is person)
+        self.assertTrue(interpreted[1] is person.name)
+        self.assertEqual(len(interpreted), 2)
+
+    def test_attrib(self):
+        # white space in attribute values survives parsing
+        value = u'x\ty\rz\n"a"&<'
+        self.assertEqual(escape_attrib(value),
+                         'x&#09;y&#13;z&#10;&quot;a&quot;&amp;&lt;')
+        elem = etree.Element('{%s}block' % ns_test, id=value)
+        writer = XMLWriter()
+        writer.element(elem)
+        self.assertEqual(etree.fromstring(writer.getvalue()).get('id'),
+                         value)
+
+    def test_free(self):
+        # caches do not keep generated types alive, recursive ones too
+        from osa import download
+        Node = ComplexTypeMeta('Node', (), {
+            '_children': [{'name': 'value', 'type': XMLInteger, 'min': 1,
+                           'max': 1, 'fullname': 'value',
+                           'nillable': False}],
+            '_namespace': ns_test})
+        Node._children.append({'name': 'next', 'type': Node, 'min': 0,
+                               'max': 1, 'fullname': 'next',
+                               'nillable': False})
+        Alias = type('Alias', (XMLInteger, ), {'_namespace': ns_test})
+        node = Node()
+        node.value, node.next = 1, Node()
+        node.next.value, node.next.next = 2, None
+        self.assertTrue(b'<value>2</value>' in write_envelope(node))
+        self.assertTrue(get_codec(Alias) is not None)
+        download.children(Node)
+        refs = [weakref.ref(Node), weakref.ref(Alias)]
+        del Node, Alias, node
+        gc.collect()
+        self.assertEqual([ref() for ref in refs], [None, None])
+
+    def test_envelope(self):
+        client = Client(self.test_files['test.wsdl'],
+                        transport=MemoryTransport(None))
+        method = client.service.sayHello
+        person = client.types.Person()
+        person.age, person.height, person.weight = 30, 180, 80
+        for arg in ((person, 2), (None, 3)):
+            self.assertEqual(as_tuple(etree.fromstring(method._encode(*arg))),
+                             as_tuple(etree.fromstring(
+                                 self.tree_envelope(method.input, *arg))))
+        envelope = method._envelope()
+        self.assertTrue(method._envelope() is envelope)
+        data = method._encode(None, 3).decode('ascii')
+        self.assertTrue(data.startswith(envelope.head))
+        self.assertTrue(data.endswith(envelope.tail))
+        self.assertEqual(data[len(envelope.head):-len(envelope.tail)],
+                         '<person xsi:nil="true" /><times>3</times>')
+        method = client.service.testMe
+        self.assertEqual(as_tuple(etree.fromstring(method._encode())),
+                         as_tuple(etree.fromstring(
+                             self.tree_envelope(method.input))))
+
+    def test_default_namespace(self):
+        qualified = lambda name, type, max=1: {
+            'name': name, 'type': type, 'min': 0, 'max': max,
+            'fullname': '{urn:a}%s' % name, 'nillable': True}
+        Inner = ComplexTypeMeta('Inner', (), {
+            '_children': [{'name': 'x', 'type': XMLInteger, 'min': 1,
+                           'max': 1, 'fullname': 'x', 'nillable': False},
+                          qualified('y', XMLInteger)],
+            '_namespace': 'urn:a'})
+        Outer = ComplexTypeMeta('Outer', (), {
+            '_children': [qualified('value', XMLInteger, 'unbounded'),
+                          qualified('inner', Inner),
+                          qualified('none', XMLString),
+                          {'name': 'other', 'type': XMLString, 'min': 0,
+                           'max': 1, 'fullname': '{urn:b}other',
+                           'nillable': False}],
+            '_namespace': 'urn:a'})
+        self.assertEqual(dominant_namespace(Outer), 'urn:a')
+        self.assertEqual(dominant_namespace(self.Numbers), None)
+        message = Message('{urn:a}Outer', [], [('parameters', Outer)])
+        method = Method('outer', message, None)
+        inner = Inner()
+        inner.x, inner.y = 1, 2
+        args = ([1, 2, 3], inner, None, 'b')
+        data = method._encode(*args)
+        self.assertEqual(as_tuple(etree.fromstring(data)),
+                         as_tuple(etree.fromstring(
+                             self.tree_envelope(message, *args))))
+        self.assertTrue(data.find(b' xmlns="urn:a"') != -1)
+        self.assertTrue(data.find(b'<value>1</value>') != -1)
+        self.assertTrue(data.find(b'<inner><x xmlns="">1</x><y>2</y></inner>')
+                        != -1)
+        self.assertTrue(len(data) < len(self.tree_envelope(message, *args)))
+
+    def test_generator(self):
+        chunks = []
+        values = (i for i in range(5000))
+        write_envelope(self.message.wrap(values), chunks.append, 100)
+        self.assertTrue(len(chunks) > 10)
+        root = etree.fromstring(b''.join(chunks))
+        numbers = root[0][0]
+        self.assertEqual(numbers.tag, '{%s}Numbers' % ns_test)
+        self.assertEqual(len(numbers), 5000)
+        self.assertEqual(numbers[4999].text, '4999')
+        # the tree path accepts generators as well
+        body = etree.Element('body')
+        self.message.to_xml((i for i in range(3)), _body=body)
+        self.assertEqual(len(body[0]), 3)
+
+    def test_arrays(self):
+        Signal = ComplexTypeMeta('Signal', (), {
+            "_children": [{'name': 'value', "type": XMLDouble, "min": 0,
+                           "max": 'unbounded', "fullname": "value",
+                           "nillable": False},
+                          {'name': 'time', "type": XMLInteger, "min": 2,
+                           "max": 5, "fullname": "time",
+                           "nillable": False},
+                          {'name': 'flag', "type": XMLBoolean, "min": 0,
+                           "max": 'unbounded', "fullname": "flag",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        message = Message('{%s}Signal' % ns_test, [],
+                          [('parameters', Signal)])
+        envelope = Envelope(message)
+        values = [i / 3. for i in range(-5, 10000)] + [1e22, 1e-7]
+        times = [1, 2, 3, 10 ** 12]
+        expected = envelope.serialize(message.wrap(values, times, [1, 0]))
+        arrays = [(array.array('d', values), array.array('l', times),
+                   array.array('b', [1, 0]))]
+        if sys.version_info[0] > 2:
+            # arrays have no buffer interface for memoryview in python 2
+            arrays.append((memoryview(array.array('d', values)),
+                           memoryview(array.array('l', times)),
+                           [True, False]))
+        for arg in arrays:
+            self.assertEqual(envelope.serialize(message.wrap(*arg)),
+                             expected)
+            self.assertEqual(write_envelope(message.wrap(*arg)),
+                             write_envelope(message.wrap(values, times,
+                                                         [1, 0])))
+            chunks = []
+            envelope.serialize(message.wrap(*arg), chunks.append, 100)
+            self.assertTrue(len(chunks) > 10)
+            self.assertEqual(b''.join(chunks), expected)
+        # integer values of a double child are written as doubles
+        self.assertEqual(
+            envelope.serialize(message.wrap(array.array('i', [1, 2]),
+                                            times)),
+            envelope.serialize(message.wrap([1.0, 2.0], times)))
+        self.assertRaises(ValueError, envelope.serialize,
+                          message.wrap([], array.array('l', range(6))))
+        self.assertRaises(ValueError, envelope.serialize,
+                          message.wrap([], array.array('l', [1])))
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        values = numpy.linspace(-1, 1, 1001)
+        for arg in (values, values.astype(numpy.float32),
+                    numpy.arange(100)):
+            self.assertEqual(write_envelope(self.message.wrap(
+                arg.astype(numpy.int64))),
+                write_envelope(self.message.wrap(
+                    [int(v) for v in arg])))
+        out = Message('{%s}Out' % ns_test, [], [('parameters',
+                      ComplexTypeMeta('Out', (), {
+                          "_children": [{'name': 'x', "type": XMLDouble,
+                                         "min": 0, "max": 'unbounded',
+                                         "fullname": "x",
+                                         "nillable": False}],
+                          "_namespace": ns_test}))])
+        for arg in (values, values.astype(numpy.float32), values[::3]):
+            self.assertEqual(write_envelope(out.wrap(arg)),
+                             write_envelope(out.wrap(
+                                 [float(v) for v in arg])))
+
+    def test_base64(self):
+        Blob = ComplexTypeMeta('Blob', (), {
+            "_children": [{'name': 'data', "type": XMLBase64Binary,
+                           "min": 0, "max": 'unbounded', "fullname": "data",
+                           "nillable": False}],
+            "_namespace": ns_test})
+        message = Message('{%s}Blob' % ns_test, [], [('parameters', Blob)])
+        envelope = Envelope(message)
+
+        class Trickle(object):
+            """
+                File returning a few bytes per read.
+            """
+            def __init__(self, data):
+                self.data = BytesIO(data)
+
+            def read(self, size):
+                return self.data.read(random.randint(1, 7))
+
+        payload = bytes(bytearray(random.randint(0, 255)
+                                  for i in range(3 * BASE64_CHUNK + 2)))
+        for value in (payload, bytearray(payload), memoryview(payload),
+                      BytesIO(payload), Trickle(payload[:1000])):
+            data = envelope.serialize(message.wrap(value))
+            if isinstance(value, Trickle):
+                self.assertEqual(etree.fromstring(data)[0][0][0].text,
+                                 base64.b64encode(payload[:1000]).decode())
+                continue
+            root = etree.fromstring(data)
+            self.assertEqual(len(root[0][0]), 1)
+            self.assertEqual(base64.b64decode(root[0][0][0].text), payload)
+        chunks = []
+        envelope.serialize(message.wrap([BytesIO(payload), b'', b'ab']),
+                           chunks.append)
+        self.assertTrue(max(len(c) for c in chunks) <= 4 * BASE64_CHUNK / 3)
+        root = etree.fromstring(b''.join(chunks))
+        self.assertEqual([base64.b64decode(e.text or '')
+                          for e in root[0][0]], [payload, b'', b'ab'])
+        self.assertEqual(write_envelope(message.wrap(BytesIO(b'xyz'))),
+                         write_envelope(message.wrap(b'xyz')))
+
+    def test_occurs(self):
+        self.Numbers._children[0]['max'] = 2
+        self.assertRaises(ValueError, write_envelope,
+                          self.message.wrap(i for i in range(3)))
+        self.assertRaises(ValueError, write_envelope,
+                          self.message.wrap(i for i in range(0)))
+
+    def test_streaming(self):
+        received = []
+
+        def handler(path, headers, body):
+            received.append(body)
+            return echo_handler(path, headers, b'<in>ok</in>')
+
+        server = LocalServer(handler)
+        try:
+            transport = HTTPTransport()
+            method = Method('numbers', self.message, self.output,
+                            action='', location=server.url,
+                            transport=transport)
+            method.streaming = True
+            method.chunk_size = 50
+            self.assertEqual(method(i for i in range(1000)), 'ok')
+            self.assertEqual(method(i for i in range(10)), 'ok')
+            transport.close()
+        finally:
+            server.stop()
+        self.assertEqual(server.requests[0][1].get('Transfer-Encoding'),
+                         'chunked')
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(etree.fromstring(received[0])[0][0]), 1000)
+        self.assertEqual(len(etree.fromstring(received[1])[0][0]), 10)
+        self.assertEqual(method.last_stats.request_size, len(received[1]))
+
+    def test_failed_stream(self):
+        def values():
+            yield 1
+            raise KeyError('broken input')
+
+        server = LocalServer()
+        try:
+            method = Method('numbers', self.message, None,
+                            action='', location=server.url,
+                            transport=HTTPTransport())
+            method.streaming = True
+            self.assertRaises(KeyError, method, values())
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# test_transport.py - test transports, part of osa.
+# Copyright 2013 Sergey Bozhenkov, boz at ipp.mpg.de
+# Licensed under LGPLv3 or later, see the COPYING file.
+
+import sys
+sys.path.insert(0, "../")
+from osa.client import Client
+from osa.transport import *
+from tests.base import BaseTest, LocalServer, echo_handler
+import io
+import threading
+import unittest
+import zlib
+if sys.version_info[0] < 3:
+    from urllib2 import HTTPError
+else:
+    from urllib.request import HTTPError
+
+
+class TestTransport(BaseTest):
+
+    def test_memory(self):
+        sent = []
+
+        def handler(location, data, action):
+            sent.append((location, data, action))
+            return echo_handler(location, {}, data)[::2]
+
+        transport = MemoryTransport(handler)
+        client = Client(self.test_files['test.wsdl'], transport=transport)
+        self.assertTrue(client.transport is transport)
+        self.assertTrue(client.service.sayHello.transport is transport)
+        self.assertEqual(client.service.echoString('hi'), 'hi')
+        self.assertEqual(len(sent), 1)
+        self.assertEqual(sent[0][0], client.service.echoString.location)
+        self.assertEqual(sent[0][2], '')
+        self.assertTrue(sent[0][1].find(b'<in>hi</in>') != -1)
+
+    def test_fault(self):
+        fault = ('<SOAP-ENV:Fault><faultcode>SOAP-ENV:Client</faultcode>'
+                 '<faultstring>4u!</faultstring></SOAP-ENV:Fault>')
+        from tests.base import soap_response
+        transport = MemoryTransport(
+            lambda l, d, a: (500, (soap_response % fault).encode()))
+        client = Client(self.test_files['test.wsdl'], transport=transport)
+        try:
+            client.service.faultyThing()
+        except RuntimeError as e:
+            self.assertFalse(str(e).find('4u!') == -1)
+        else:
+            self.fail("no fault raised")
+        transport.handler = lambda l, d, a: (404, b'')
+        self.assertRaises(RuntimeError, client.service.faultyThing)
+        # 500 without a fault
+        for data in (b'crashed', (soap_response % '').encode()):
+            transport.handler = lambda l, d, a: (500, data)
+            try:
+                client.service.faultyThing()
+            except HTTPError as e:
+                self.assertEqual(e.code, 500)
+                self.assertEqual(e.read(), data)
+            else:
+                self.fail("no error raised")
+
+    def test_http(self):
+        server = LocalServer()
+        try:
+            for transport in (HTTPTransport(), UrllibTransport()):
+                client = Client(self.test_files['test.wsdl'],
+                                transport=transport)
+                client.service.echoString.location = server.url
+                self.assertEqual(client.service.echoString('x'), 'x')
+                transport.close()
+        finally:
+            server.stop()
+    def test_decoded(self):
+        body = b'<a>' + b'0' * 2000000 + b'</a>'
+        c = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        for encoding, data in (('gzip', c.compress(body) + c.flush()),
+                               ('deflate', zlib.compress(body)[2:-4]),
+                               ('identity', body)):
+            raw = io.BytesIO(data)
+            raw.code = 200
+            stats = CallStats()
+            response = DecodedResponse(raw, encoding, stats)
+            parts = [response.read(1000)]
+            # compressed input waits, nothing decompressed is kept
+            self.assertEqual(response._buffer, b'')
+            while parts[-1]:
+                parts.append(response.read(1000))
+            self.assertEqual(set(map(len, parts[:-2])), set([1000]))
+            self.assertEqual(b''.join(parts), body)
+            self.assertEqual(stats.response_size, len(body))
+            self.assertEqual(stats.response_wire_size, len(data))
+            raw.seek(0)
+            response = DecodedResponse(raw, encoding, CallStats())
+            self.assertEqual(response.read(3), b'<a>')
+            self.assertEqual(response.read(), body[3:])
+            self.assertEqual(response.read(), b'')
+
+    def test_compression(self):
+        def handler(path, headers, body):
+            if headers.get('Content-Encoding') == 'gzip':
+                body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            code, out_headers, data = echo_handler(path, headers, body)
+            encoding = headers.get('Accept-Encoding', '')
+            if encoding.find('gzip') != -1:
+                c = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                data = c.compress(data) + c.flush()
+                out_headers['Content-Encoding'] = 'gzip'
+            elif encoding.find('deflate') != -1:
+                data = zlib.compress(data)[2:-4]  # raw deflate
+                out_headers['Content-Encoding'] = 'deflate'
+            return code, out_headers, data
+
+        server = LocalServer(handler)
+        try:
+            transport = HTTPTransport(compress_threshold=1000)
+            client = Client(self.test_files['test.wsdl'], transport=transport)
+            method = client.service.echoString
+            method.location = server.url
+            msg = 'abc' * 1000
+            self.assertEqual(method(msg), msg)
+            self.assertEqual(server.requests[-1][1]['Content-Encoding'],
+                             'gzip')
+            stats = method.last_stats
+            self.assertTrue(stats.request_ratio > 10)
+            self.assertTrue(stats.response_ratio > 10)
+            self.assertTrue(stats.response_size > len(msg))
+            # small request stays uncompressed
+            self.assertEqual(method('x'), 'x')
+            self.assertEqual(server.requests[-1][1].get('Content-Encoding'),
+                             None)
+            self.assertEqual(method.last_stats.request_ratio, 1.0)
+            transport.accept_encoding = 'deflate'
+            self.assertEqual(method(msg), msg)
+            self.assertTrue(method.last_stats.response_ratio > 10)
+            transport.accept_encoding = None
+            self.assertEqual(method(msg), msg)
+            self.assertEqual(method.last_stats.response_ratio, 1.0)
+            # stats are kept per thread
+            stats = method.last_stats
+            thread = threading.Thread(target=method, args=('y', ))
+            thread.start()
+            thread.join()
+            self.assertTrue(method.last_stats is stats)
+        finally:
+            server.stop()
+
+if __name__ == '__main__':
+    unittest.main()
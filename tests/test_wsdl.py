@@ -14,6 +14,7 @@ import xml.etree.cElementTree as etree
 import unittest
 
 wsdl_url = 'test.wsdl'
+ports_url = 'ports.wsdl'
 ns1 = "de.mpg.ipp.hgw.boz.gsoap.helloworld"
 ns2 = "de.mpg.ipp.hgw.boz.gsoap.helloworld.types"
 
@@ -139,3 +140,16 @@ class TestWSDL(unittest.TestCase):
             b = bs[n]
             self.assertTrue(s is b)
             self.assertEqual(s.location, "http://lxpowerboz:88/services/cpp/HelloWorldService")
+            self.assertEqual(s.locations,
+                             ["http://lxpowerboz:88/services/cpp/HelloWorldService"])
+
+    def test_get_services_ports(self):
+        w = WSDLParser(ports_url)
+        types = w.get_types()
+        ss = w.get_services(w.get_bindings(w.get_operations(
+            w.get_messages(types))))
+        s = ss["HelloWorldService"]["echoString"]
+        self.assertEqual(s.location, "http://lxpowerboz:88/services/cpp/HelloWorldService")
+        self.assertEqual(s.locations,
+                         ["http://lxpowerboz:88/services/cpp/HelloWorldService",
+                          "http://lxpowerboz:89/services/cpp/HelloWorldService"])
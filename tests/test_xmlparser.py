@@ -5,12 +5,27 @@
 
 import sys
 sys.path.insert(0, "../")
+from osa import xmlparser
 from osa.xmlparser import *
+from osa.xmltypes import XMLAny
 from tests.base import BaseTest
+from io import BytesIO
 import xml.etree.cElementTree as etree
 import unittest
 
 
+class Trickle(object):
+    """
+        File returning a few bytes per read.
+    """
+    def __init__(self, data, size):
+        self.data = BytesIO(data)
+        self.size = size
+
+    def read(self, size):
+        return self.data.read(self.size)
+
+
 class TestXMLParser(BaseTest):
 
     def test_ns_attr_parsing(self):
@@ -18,3 +33,40 @@ class TestXMLParser(BaseTest):
                                         attr=["a"])
         self.assertEqual(root.get("bok"), "ns:round")
         self.assertEqual(root[0].get("a"), "{39kingdom}angry")
+
+    def test_parse_response(self):
+        xsi = 'http://www.w3.org/2001/XMLSchema-instance'
+        doc = ('<e:Envelope xmlns:e="urn:e" xmlns:xsi="%s" xmlns:a="urn:a">'
+               '<e:Body type="a:t"><v xsi:type="a:x">1</v>'
+               '<w xmlns:a="urn:b" xmlns="urn:d"><v xsi:type="a:x"/>'
+               '<v xsi:type="y"/><v xmlns="" xsi:type="y"/></w>'
+               '<v xsi:type="a:x"/><v xsi:type="y"/><v xsi:type="c:z"/>'
+               '</e:Body></e:Envelope>' % xsi).encode('ascii')
+        XSI_TYPE = '{%s}type' % xsi
+        expected = ['{urn:a}x', '{urn:b}x', '{urn:d}y', 'y', '{urn:a}x',
+                    'y', 'c:z']
+        plain = (b'<e:Envelope xmlns:e="urn:e"><e:Body><a type="x:y">1'
+                 b'</a><b>2</b></e:Body></e:Envelope>')
+        parsers = [parse_response]
+        if hasattr(etree, 'XMLPullParser'):
+            # used if the parser has no private _setevents
+            parsers.append(xmlparser._parse_response_pull)
+        for parse in parsers:
+            for size in (1, 3, 4, 7, 1000):
+                root = parse(Trickle(doc, size))
+                self.assertEqual([v.get(XSI_TYPE) for v in root.iter()
+                                  if v.get(XSI_TYPE)], expected)
+                # other attributes are left as they are
+                self.assertEqual(root[0].get('type'), 'a:t')
+            self.assertEqual(etree.tostring(parse(BytesIO(plain))),
+                             etree.tostring(etree.fromstring(plain)))
+        self.assertEqual(qualify('{urn:a}x', {'': 'urn:b'}), '{urn:a}x')
+        # anyType values are decoded by their type
+        any_value = parse_response(BytesIO(
+            ('<a xmlns:xsi="%s" xmlns:xs="http://www.w3.org/2001/XMLSchema"'
+             ' xsi:type="xs:double">2.5</a>' % xsi).encode('ascii')))
+        self.assertEqual(XMLAny().from_xml(any_value), 2.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
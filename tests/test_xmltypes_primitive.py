@@ -78,29 +78,29 @@ class TestPrimitive(BaseTest):
 
         element.text = "2012-01-31T10:00:00.538"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,31, 10, 0, 0, 538000))
+        self.assertEqual(value, datetime(2012, 1, 31, 10, 0, 0, 538000))
         element.text = "2012-01-30T10:00:00"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,30, 10, 0, 0))
+        self.assertEqual(value, datetime(2012, 1, 30, 10, 0, 0))
         element.text = "2012-01-20T10:00:00UTC"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,20, 10, 0, 0))
+        self.assertEqual(value, datetime(2012, 1, 20, 10, 0, 0))
         element.text = "2012-01-10T10:00:00Z"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,10, 10, 0, 0))
+        self.assertEqual(value, datetime(2012, 1, 10, 10, 0, 0))
         # with time zone - bug 9
         element.text = "2012-01-31T10:00:00.538+02:30"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,31, 7, 30, 0, 538000))
+        self.assertEqual(value, datetime(2012, 1, 31, 7, 30, 0, 538000))
         element.text = "2012-01-30T01:00:00+01:30"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,29, 23, 30, 0))
+        self.assertEqual(value, datetime(2012, 1, 29, 23, 30, 0))
         element.text = "2012-01-31T10:00:00.538-02:30"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,31, 12, 30, 0, 538000))
+        self.assertEqual(value, datetime(2012, 1, 31, 12, 30, 0, 538000))
         element.text = "2012-01-31T10:00:00-01:00"
         value = XMLDateTime().from_xml(element)
-        self.assertEqual(value, datetime(2012,01,31, 11, 00, 0))
+        self.assertEqual(value, datetime(2012, 1, 31, 11, 00, 0))
 
     def test_date(self):
         x = datetime.now()
@@ -122,17 +122,17 @@ class TestPrimitive(BaseTest):
 
         element.text = "2013-01-31UTC"
         value = XMLDate().from_xml(element)
-        self.assertEqual(value, date(2013,01,31))
+        self.assertEqual(value, date(2013, 1, 31))
         element.text = "2013-02-11Z"
         value = XMLDate().from_xml(element)
-        self.assertEqual(value, date(2013,02,11))
+        self.assertEqual(value, date(2013, 2, 11))
         # with time zone - bug 9
         element.text = "2012-01-31+06:00"
         value = XMLDate().from_xml(element)
-        self.assertEqual(value, date(2012,01,31))
+        self.assertEqual(value, date(2012, 1, 31))
         element.text = "2012-02-20-04:00"
         value = XMLDate().from_xml(element)
-        self.assertEqual(value, date(2012,02,20))
+        self.assertEqual(value, date(2012, 2, 20))
 
     def test_integer(self):
         integer = XMLInteger(12)
@@ -240,3 +240,57 @@ class TestPrimitive(BaseTest):
         v = inst.from_xml(element)
         self.assertEqual(v.__class__.__name__, "str")
         self.assertEqual(v, "10.0")
+
+    def test_codecs(self):
+        Color = type('Color', (XMLStringEnumeration, ),
+                     {'_allowedValues': ['red', 'green']})
+        values = [(XMLString, u'a<b'), (XMLInteger, 5), (XMLDouble, 0.1),
+                  (XMLBoolean, True), (XMLDecimal, '1.50'),
+                  (XMLDate, datetime(2013, 1, 2).date()),
+                  (XMLDateTime, datetime(2013, 1, 2, 3, 4, 5)),
+                  (Color, 'green')]
+        for cls, value in values:
+            codec = get_codec(cls)
+            self.assertTrue(codec is not None)
+            encode, decode, escape = codec
+            element = etree.Element('test')
+            cls(value).to_xml(element, 'value')
+            element = element[0]
+            self.assertEqual(encode(cls, value), element.text)
+            self.assertEqual(decode(cls, element), cls().from_xml(element))
+        # base64Binary instances are str, bytes are encoded by the codec
+        encode, decode, escape = get_codec(XMLBase64Binary)
+        self.assertEqual(encode(XMLBase64Binary, b'data'), 'ZGF0YQ==')
+        element = etree.Element('value')
+        element.text = 'ZGF0YQ=='
+        self.assertEqual(decode(XMLBase64Binary, element), b'data')
+        self.assertEqual(XMLBase64Binary().from_xml(element), b'data')
+
+        # aliases share the codec of the primitive type
+        Alias = type('Alias', (XMLInteger, ), {'_namespace': ns_test})
+        self.assertTrue(get_codec(Alias) is get_codec(XMLInteger))
+        self.assertTrue(get_codec(Color) is get_codec(XMLStringEnumeration))
+        self.assertRaises(ValueError, get_codec(Color)[0], Color, 'blue')
+        # no codec for own conversion, any and complex types
+        Own = type('Own', (XMLInteger, ),
+                   {'to_xml': lambda self, parent, name: None})
+        self.assertEqual(get_codec(Own), None)
+        self.assertEqual(get_codec(XMLAny), None)
+        Complex = ComplexTypeMeta('Complex', (), {'_children': []})
+        self.assertEqual(get_codec(Complex), None)
+        # nor for simple content with attributes
+        Label = ComplexTypeMeta('Label', (XMLString, ), {
+            '_children': [], '_namespace': ns_test,
+            '_attributes': {'lang': XMLString}})
+        self.assertEqual(get_codec(Label), None)
+        Labels = ComplexTypeMeta('Labels', (), {
+            '_children': [{'name': 'label', 'type': Label, 'min': 0,
+                           'max': 'unbounded', 'fullname': 'label',
+                           'nillable': False}],
+            '_namespace': ns_test})
+        labels = Labels().from_xml(etree.fromstring(
+            '<Labels><label lang="en">a</label><label lang="de">b</label>'
+            '</Labels>'))
+        self.assertEqual(labels.label, ['a', 'b'])
+        self.assertEqual(labels.label__attrs, [{'lang': 'en'},
+                                               {'lang': 'de'}])